@@ -0,0 +1,257 @@
+import argparse
+import importlib
+import json
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import yaml
+
+# Scaling benchmarks for every stage of the thoughtseed lifecycle.
+#
+#     python benchmarks/run_benchmarks.py --output results.json
+#     python benchmarks/run_benchmarks.py --stages pagerank louvain --sizes 1000 5000 --edge-mode knn --output knn.json
+#     python benchmarks/run_benchmarks.py --stages add_edges_to_graph normalize_weights --build-processes 4 --graph-backend csr --output parallel.json
+#     python benchmarks/run_benchmarks.py --compare baseline.json results.json
+#
+# Every (stage, n) measurement runs in a fresh subprocess, so peak RSS belongs to that stage alone and a crash or
+# timeout only loses one data point. Stages are measured at increasing n; once the time predicted for the next size,
+# including building its inputs (extrapolated from the last two sizes, quadratic after the first), exceeds --budget
+# seconds, the larger sizes are recorded as skipped. Compare mode exits non-zero when a stage got slower than --threshold times the baseline.
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_SIZES = [100, 1000, 5000, 20000]
+
+# Modules thought_lifecycle only imports on first use, inside the stages. Workers import them before measuring so a
+# stage's time doesn't include a one-off import (scipy.stats alone takes about 0.4 s).
+LAZY_MODULES = ['scipy.stats', 'scipy.sparse', 'community', 'leidenalg', 'igraph', 'concurrent.futures', 'multiprocessing.shared_memory',
+                'thought_lifecycle.parallel_build']
+
+def make_config(n, args):
+    from thought_lifecycle.config import FeatureConfig, ThoughtseedNetworkConfig
+
+    with open(args.config, 'r') as f:
+        config_data = yaml.safe_load(f)
+    network_config = dict(config_data['ThoughtseedNetworkConfig'], num_thoughtseeds=n, seed=0, edge_mode=args.edge_mode, graph_backend=args.graph_backend,
+                          build_processes=args.build_processes)
+    return ThoughtseedNetworkConfig(network_config, FeatureConfig(config_data['FeatureConfig']))
+
+def build_network(n, args, stages):
+    # Network with the given construction stages done, in order: generate, nodes, edges, normalize
+    from thought_lifecycle.thoughtseed_network import ThoughtseedNetwork
+
+    network = ThoughtseedNetwork(make_config(n, args))
+    steps = {'generate': network.generate_thoughtseeds, 'nodes': network.add_nodes_to_graph,
+             'edges': network.add_edges_to_graph, 'normalize': network.normalize_weights}
+    for stage in stages:
+        steps[stage]()
+    return network
+
+def build_analytics(n, args):
+    from thought_lifecycle.thoughtseed_network_analytics import ThoughtseedNetworkAnalytics
+
+    return ThoughtseedNetworkAnalytics(build_network(n, args, ['generate', 'nodes', 'edges', 'normalize']))
+
+def setup_describe_community(n, args):
+    analytics = build_analytics(n, args)
+    analytics.detect_communities('louvain', seed=0)
+    community_index = analytics.get_community_index()
+    largest = community_index.top_k(1)[0]
+    return lambda: analytics.describe_community(community_index.members(largest))
+
+def setup_orchestrate(n, args, batch):
+    from thought_lifecycle.thoughtpool import ThoughtPoolAssigner, ThoughtSproutOrchestrator, ThoughtsproutTracker
+
+    network = build_network(n, args, ['generate'])
+    orchestrator = ThoughtSproutOrchestrator(ThoughtPoolAssigner(network.config.feature_config), ThoughtsproutTracker())
+    if batch:
+        return lambda: orchestrator.orchestrate_batch(network.thoughtseeds)
+    return lambda: orchestrator.orchestrate(network.thoughtseeds)
+
+def setup_pool_cold_start(n, args):
+    # The pool-only pipeline as a fresh interpreter runs it: start Python, import thought_lifecycle.thoughtpool, load a
+    # columnar store of n thoughtseeds and orchestrate them into pools. Only the population is stored; the pipeline
+    # never reads the edges.
+    directory = tempfile.TemporaryDirectory()
+    path = os.path.join(directory.name, 'network')
+    build_network(n, args, ['generate']).save_state(path, format='columnar')
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = ("from thought_lifecycle.thoughtpool import ThoughtSproutManager; "
+            f"ThoughtSproutManager({os.path.abspath(args.config)!r}, {path!r}, tracker_capacity=1024).run()")
+
+    def work():
+        subprocess.run([sys.executable, '-c', code], cwd=root, stdout=subprocess.DEVNULL, check=True)
+        directory.cleanup()
+    return work
+
+def setup_stage(stage, n, args):
+    # Everything a stage needs is built here, outside the measurement; the returned callable is the measured work
+    if stage == 'generate_thoughtseeds':
+        network = build_network(n, args, [])
+        return network.generate_thoughtseeds
+    if stage == 'add_edges_to_graph':
+        return build_network(n, args, ['generate', 'nodes']).add_edges_to_graph
+    if stage == 'normalize_weights':
+        return build_network(n, args, ['generate', 'nodes', 'edges']).normalize_weights
+    if stage == 'pagerank':
+        return build_analytics(n, args).calculate_pagerank
+    if stage in ('louvain', 'leiden'):
+        analytics = build_analytics(n, args)
+        return lambda: analytics.detect_communities(stage, seed=0)
+    if stage == 'describe_community':
+        return setup_describe_community(n, args)
+    if stage == 'orchestrate':
+        return setup_orchestrate(n, args, batch=False)
+    if stage == 'orchestrate_batch':
+        return setup_orchestrate(n, args, batch=True)
+    if stage == 'pool_cold_start':
+        return setup_pool_cold_start(n, args)
+    raise ValueError(f"Unknown stage: {stage}")
+
+STAGES = ['generate_thoughtseeds', 'add_edges_to_graph', 'normalize_weights', 'pagerank', 'louvain', 'leiden',
+          'describe_community', 'orchestrate', 'orchestrate_batch', 'pool_cold_start']
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def run_worker(args):
+    # Measure one stage at one size in this process and write the measurement to args.result_file
+    # Import everything up front, including the lazily imported backends, so neither the measured work nor the setup
+    # time used to predict larger sizes includes import time
+    import thought_lifecycle.thoughtseed_network_analytics, thought_lifecycle.thoughtpool
+    for module in LAZY_MODULES:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            pass  # Optional backend that is not installed; only the stages using it fail
+    start_setup = time.perf_counter()
+    work = setup_stage(args.stage, args.n, args)
+    setup_time = time.perf_counter() - start_setup
+    setup_peak = peak_rss_mb()
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    work()
+    wall, cpu = time.perf_counter() - start_wall, time.process_time() - start_cpu
+    peak = peak_rss_mb()
+    with open(args.result_file, 'w') as f:
+        json.dump({'wall_time': wall, 'cpu_time': cpu, 'peak_rss_mb': peak, 'peak_rss_increase_mb': peak - setup_peak, 'setup_time': setup_time}, f)
+
+def measure(stage, n, args, timeout):
+    # Run one measurement in a subprocess; returns a result row
+    row = {'stage': stage, 'n': n}
+    with tempfile.TemporaryDirectory() as directory:
+        result_file = os.path.join(directory, 'result.json')
+        command = [sys.executable, os.path.abspath(__file__), '--worker', stage, str(n), '--result-file', result_file,
+                   '--config', args.config, '--edge-mode', args.edge_mode, '--graph-backend', args.graph_backend,
+                   '--build-processes', str(args.build_processes)]
+        try:
+            completed = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return dict(row, status='timeout')
+        if completed.returncode != 0:
+            error = completed.stderr.strip().splitlines()
+            return dict(row, status='failed', error=error[-1] if error else f"exit status {completed.returncode}")
+        with open(result_file, 'r') as f:
+            return dict(row, status='ok', **json.load(f))
+
+def predict_time(measured, n):
+    # Extrapolate the wall time at size n from the (n, wall time) pairs measured so far: quadratic growth after one
+    # size, then the growth exponent between the last two sizes (clamped to 1..3)
+    last_n, last_time = measured[-1]
+    exponent = 2.0
+    if len(measured) > 1:
+        previous_n, previous_time = measured[-2]
+        if previous_time > 0 and last_time > 0:
+            exponent = min(3.0, max(1.0, math.log(last_time / previous_time) / math.log(last_n / previous_n)))
+    return last_time * (n / last_n) ** exponent
+
+def run_suite(args):
+    results = []
+    for stage in args.stages:
+        measured = []
+        skipping = False
+        for n in sorted(args.sizes):
+            if not skipping and measured:
+                skipping = predict_time(measured, n) > args.budget
+            if skipping:
+                row = {'stage': stage, 'n': n, 'status': 'skipped'}
+            else:
+                row = measure(stage, n, args, timeout=args.timeout)
+                if row['status'] == 'ok':
+                    measured.append((n, row['setup_time'] + row['wall_time']))
+                else:
+                    skipping = True
+            results.append(row)
+            print(json.dumps(row), flush=True)
+    return results
+
+def metadata():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    import numpy, scipy, networkx
+    return {'commit': commit, 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+            'platform': platform.platform(), 'numpy': numpy.__version__, 'scipy': scipy.__version__, 'networkx': networkx.__version__}
+
+def compare(baseline_path, current_path, threshold, min_difference=0.01):
+    # Print the wall time ratio of every (stage, n) measured in both files; returns the regressed rows. Slowdowns of
+    # less than min_difference seconds are timer noise and never count as regressions.
+    with open(baseline_path, 'r') as f:
+        baseline = {(row['stage'], row['n']): row for row in json.load(f)['results'] if row['status'] == 'ok'}
+    with open(current_path, 'r') as f:
+        current = {(row['stage'], row['n']): row for row in json.load(f)['results'] if row['status'] == 'ok'}
+
+    regressions = []
+    for key in sorted(set(baseline) & set(current)):
+        ratio = current[key]['wall_time'] / max(baseline[key]['wall_time'], 1e-9)
+        memory_ratio = current[key]['peak_rss_mb'] / max(baseline[key]['peak_rss_mb'], 1e-9)
+        regressed = ratio > threshold and current[key]['wall_time'] - baseline[key]['wall_time'] > min_difference
+        flag = ' REGRESSION' if regressed else ''
+        print(f"{key[0]:>22} n={key[1]:<7} time {baseline[key]['wall_time']:.4f}s -> {current[key]['wall_time']:.4f}s ({ratio:.2f}x), "
+              f"peak RSS {memory_ratio:.2f}x{flag}")
+        if regressed:
+            regressions.append(key)
+    for key in sorted(set(baseline) - set(current)):
+        print(f"{key[0]:>22} n={key[1]:<7} measured in the baseline only")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the thoughtseed lifecycle stages at increasing scale")
+    parser.add_argument('--stages', nargs='+', default=STAGES, choices=STAGES)
+    parser.add_argument('--sizes', nargs='+', type=int, default=DEFAULT_SIZES)
+    parser.add_argument('--config', default='test_config.yaml')
+    parser.add_argument('--edge-mode', default='complete', choices=['complete', 'knn', 'threshold'])
+    parser.add_argument('--graph-backend', default='networkx', choices=['networkx', 'csr'])
+    parser.add_argument('--build-processes', type=int, default=1, help="Worker processes for generation and edge construction")
+    parser.add_argument('--budget', type=float, default=60.0, help="Skip sizes predicted to take longer than this many seconds")
+    parser.add_argument('--timeout', type=float, default=600.0, help="Abandon a single measurement after this many seconds")
+    parser.add_argument('--output', help="JSON file for the results")
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'), help="Compare two result files instead of running")
+    parser.add_argument('--threshold', type=float, default=1.25, help="Slowdown factor reported as a regression by --compare")
+    parser.add_argument('--min-difference', type=float, default=0.01, help="Smallest slowdown in seconds reported as a regression")
+    parser.add_argument('--worker', nargs=2, metavar=('STAGE', 'N'), help=argparse.SUPPRESS)
+    parser.add_argument('--result-file', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        args.stage, args.n = args.worker[0], int(args.worker[1])
+        run_worker(args)
+        return
+    if args.compare:
+        sys.exit(1 if compare(args.compare[0], args.compare[1], args.threshold, args.min_difference) else 0)
+
+    settings = {'edge_mode': args.edge_mode, 'graph_backend': args.graph_backend, 'build_processes': args.build_processes, 'budget': args.budget, 'sizes': sorted(args.sizes)}
+    results = run_suite(args)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'metadata': metadata(), 'settings': settings, 'results': results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
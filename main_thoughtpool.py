@@ -4,7 +4,7 @@ from thought_lifecycle.thoughtpool import LoadThoughtseedNetwork, ThoughtPoolAss
 from thought_lifecycle.config import FeatureConfig
 
 def main():
-    manager = ThoughtSproutManager('test_config.yaml', 'thoughtseed_network.pkl')
+    manager = ThoughtSproutManager('test_config.yaml', 'thoughtseed_network')
     manager.run()
 
 if __name__ == "__main__":
@@ -1,6 +1,5 @@
+import argparse
 import random
-import seaborn as sns
-import matplotlib.pyplot as plt
 import yaml
 import os
 
@@ -8,9 +7,41 @@ from thought_lifecycle.thoughtseed_network import ThoughtseedNetwork
 from thought_lifecycle.thoughtseed_network_analytics import ThoughtseedNetworkAnalytics
 from thought_lifecycle.config import FeatureConfig, ThoughtseedNetworkConfig
 
+def plot_energy_levels(energy_levels, plot, plot_file):
+    # Histogram of the energy levels: shown in a window, written to plot_file, or skipped. seaborn and matplotlib are only
+    # imported when a plot is drawn, and file output uses the non-interactive Agg backend so it works without a display.
+    if plot == 'none':
+        return
+    import matplotlib
+    if plot == 'file':
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    sns.histplot(energy_levels, bins=10, kde=True)
+    plt.title('Distribution of Energy Levels')
+    plt.xlabel('Energy Level')
+    plt.ylabel('Density')
+    if plot == 'file':
+        plt.savefig(plot_file)
+        plt.close()
+        print(f"Energy level histogram written to {plot_file}")
+    else:
+        plt.show()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build a thoughtseed network, detect its communities and save both")
+    parser.add_argument('--config', default='test_config.yaml')
+    parser.add_argument('--plot', default='show', choices=['show', 'file', 'none'],
+                        help="Show the energy level histogram, write it to --plot-file, or skip it")
+    parser.add_argument('--plot-file', default='energy_levels.png')
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+
     # Load the configuration file
-    with open('test_config.yaml', 'r') as f:
+    with open(args.config, 'r') as f:
         config = yaml.safe_load(f)
 
     # Memory network configuration
@@ -36,12 +67,8 @@ def main():
     network_analytics.perform_analysis_and_print_communities(algorithm='louvain')
 
     # Describe communities of size 3 or more
-    community_ids = set(network_analytics.communities.values())
-    for community_id in community_ids:
-        community_nodes = [node for node, id in network_analytics.communities.items() if id == community_id]
-        community_properties = network_analytics.describe_community(community_nodes)
-        if community_properties is not None:
-            print(f"Community {community_id}: {community_properties}")
+    for community_id, community_properties in network_analytics.describe_communities().items():
+        print(f"Community {community_id}: {community_properties}")
 
     # Count the number of communities of size 3 or more
     large_communities = network_analytics.count_large_communities()
@@ -49,18 +76,13 @@ def main():
 
     # Plot the distribution of energy levels
     energy_levels = [thoughtseed.energy_level for thoughtseed in thoughtseed_network.thoughtseeds]
-
-    sns.histplot(energy_levels, bins=10, kde=True)
-    plt.title('Distribution of Energy Levels')
-    plt.xlabel('Energy Level')
-    plt.ylabel('Density')
-    plt.show()
+    plot_energy_levels(energy_levels, args.plot, args.plot_file)
 
     # Save the state of the ThoughtseedNetwork object
-    thoughtseed_network.save_state('thoughtseed_network.pkl')
+    thoughtseed_network.save_state('thoughtseed_network', format='columnar')
 
     # Save the state of the ThoughtseedNetworkAnalytics object
-    network_analytics.save_state('thoughtseed_network_analytics.pkl')
+    network_analytics.save_state('thoughtseed_network_analytics', format='columnar')
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,68 @@
+import yaml
+import unittest
+import numpy as np
+from thought_lifecycle.thoughtseed import sigmoid
+from thought_lifecycle.thoughtseed_network import ThoughtseedNetwork
+from thought_lifecycle.energy_propagation import EnergyPropagation
+from thought_lifecycle.config import ThoughtseedNetworkConfig, FeatureConfig
+
+class TestEnergyPropagation(unittest.TestCase):
+    def setUp(self):
+        with open('test_config.yaml', 'r') as f:
+            config_data = yaml.safe_load(f)
+
+        feature_config = FeatureConfig(config_data['FeatureConfig'])
+        self.thoughtseed_network_config = ThoughtseedNetworkConfig(config_data['ThoughtseedNetworkConfig'], feature_config)
+        self.thoughtseed_network_config.num_thoughtseeds = 300
+        self.thoughtseed_network_config.edge_mode = 'knn'
+        self.network = ThoughtseedNetwork(self.thoughtseed_network_config)
+        self.network.initialize()
+
+    def test_matches_dense_simulation(self):
+        engine = EnergyPropagation.from_network(self.network, decay=0.2, full_update_fraction=0.05)
+        rng = np.random.default_rng(0)
+        initial_energy = rng.normal(0, 2, len(self.network.thoughtseeds))
+        stimulus = rng.normal(0, 0.1, len(initial_energy))
+        energy, active, events = engine.run(initial_energy, 100, stimulus)
+
+        # Straightforward dense reference
+        weights = engine.adjacency.toarray()
+        expected_energy = initial_energy.copy()
+        expected_active = sigmoid(expected_energy) > 0.8
+        expected_events = []
+        for step in range(100):
+            expected_energy = 0.8 * expected_energy + engine.coupling * (weights @ expected_active) + stimulus
+            new_active = sigmoid(expected_energy) > 0.8
+            expected_events.extend((step, i, new_active[i]) for i in np.flatnonzero(new_active != expected_active))
+            expected_active = new_active
+
+        np.testing.assert_allclose(energy, expected_energy, rtol=1e-9, atol=1e-9)
+        np.testing.assert_array_equal(active, expected_active)
+        self.assertGreater(len(events), 0)
+        self.assertEqual(list(zip(events.steps.tolist(), events.ids.tolist(), events.activated.tolist())), expected_events)
+        self.assertEqual(events.active_counts(int((sigmoid(initial_energy) > 0.8).sum()))[-1], active.sum())
+
+    def test_first_activation(self):
+        engine = EnergyPropagation.from_network(self.network, decay=1.0)
+        energy = np.full(len(self.network.thoughtseeds), -5.0)
+        stimulus = np.zeros(len(energy))
+        stimulus[7] = 10.0
+        energy, active, events = engine.run(energy, 5, stimulus)
+        first = events.first_activation(len(energy))
+        self.assertEqual(first[7], 0)
+        self.assertTrue(active[7])
+        self.assertEqual(events.activations_per_step()[0], 1)
+
+    def test_run_population_writes_back(self):
+        engine = EnergyPropagation.from_network(self.network)
+        engine.run_population(self.network.thoughtseeds, 10)
+        np.testing.assert_array_equal(self.network.thoughtseeds.activation_status, sigmoid(self.network.thoughtseeds.energy_level) > 0.8)
+
+    def test_invalid_parameters(self):
+        with self.assertRaises(ValueError):
+            EnergyPropagation.from_network(self.network, decay=1.5)
+        with self.assertRaises(ValueError):
+            EnergyPropagation.from_network(self.network, threshold=1.0)
+
+if __name__ == '__main__':
+    unittest.main()
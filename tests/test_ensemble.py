@@ -0,0 +1,68 @@
+import os
+import json
+import tempfile
+import unittest
+from thought_lifecycle.ensemble import expand_runs, load_spec, run_ensemble, run_replica, aggregate_results, load_results
+
+class TestEnsemble(unittest.TestCase):
+    def setUp(self):
+        self.spec = {
+            'base': 'test_config.yaml',
+            'replicas': 2,
+            'sweep': {
+                'FeatureConfig.Valence.parameters.sigma': [0.1, 0.3],
+                'ThoughtseedNetworkConfig.num_thoughtseeds': [120],
+            },
+        }
+
+    def test_expand_runs(self):
+        runs = expand_runs(load_spec(self.spec))
+        self.assertEqual(len(runs), 4)
+        self.assertEqual(len({run['run_id'] for run in runs}), 4)
+        self.assertEqual(runs[2]['config']['FeatureConfig']['Valence']['parameters']['sigma'], 0.3)
+        self.assertEqual(runs[0]['config']['analysis']['resolution'], 1.125)
+        with self.assertRaises(ValueError):
+            expand_runs(load_spec(dict(self.spec, sweep={'FeatureConfig.Unknown.weight': [1]})))
+
+    def test_run_ids_cover_seed_and_base_config(self):
+        run_ids = {run['run_id'] for run in expand_runs(load_spec(self.spec))}
+        reseeded = {run['run_id'] for run in expand_runs(load_spec(dict(self.spec, seed=99)))}
+        spec = load_spec(self.spec)
+        spec['base']['ThoughtseedNetworkConfig']['edge_mode'] = 'knn'
+        rebased = {run['run_id'] for run in expand_runs(spec)}
+        self.assertFalse(run_ids & reseeded)
+        self.assertFalse(run_ids & rebased)
+        self.assertEqual({run['run_id'] for run in expand_runs(load_spec(self.spec))}, run_ids)
+
+    def test_replicas_are_reproducible(self):
+        run = expand_runs(load_spec(self.spec))[1]
+        first, second = run_replica(run), run_replica(run)
+        self.assertEqual(first['status'], 'ok')
+        for summary in (first, second):
+            del summary['timings']
+        self.assertEqual(first, second)
+
+    def test_run_and_resume(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output_path = os.path.join(directory, 'ensemble.jsonl')
+            results = run_ensemble(self.spec, output_path, max_workers=2)
+            self.assertEqual([result['status'] for result in results], ['ok'] * 4)
+            self.assertEqual(results[0]['num_thoughtseeds'], 120)
+
+            table = aggregate_results(results)
+            self.assertEqual(len(table), 2)
+            self.assertEqual(table[0]['replicas'], 2)
+
+            # Finished runs are not repeated; a failed one is
+            with open(output_path, 'r') as f:
+                lines = f.readlines()
+            failed = dict(json.loads(lines[0]), status='failed')
+            with open(output_path, 'a') as f:
+                f.write(json.dumps(failed) + '\n')
+            run_ensemble(self.spec, output_path, max_workers=2)
+            with open(output_path, 'r') as f:
+                self.assertEqual(len(f.readlines()), 6)
+            self.assertEqual(load_results(output_path)[failed['run_id']]['status'], 'ok')
+
+if __name__ == '__main__':
+    unittest.main()
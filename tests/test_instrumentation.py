@@ -0,0 +1,75 @@
+import os
+import io
+import json
+import yaml
+import tempfile
+import unittest
+import contextlib
+from thought_lifecycle import instrumentation
+from thought_lifecycle.instrumentation import InMemorySink, JsonLinesSink, get_instrumentation
+from thought_lifecycle.thoughtseed_network import ThoughtseedNetwork
+from thought_lifecycle.thoughtpool import ThoughtSproutManager
+from thought_lifecycle.config import ThoughtseedNetworkConfig, FeatureConfig
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        with open('test_config.yaml', 'r') as f:
+            config_data = yaml.safe_load(f)
+
+        feature_config = FeatureConfig(config_data['FeatureConfig'])
+        self.config = ThoughtseedNetworkConfig(dict(config_data['ThoughtseedNetworkConfig'], num_thoughtseeds=200, seed=0), feature_config)
+
+    def tearDown(self):
+        instrumentation.disable()
+
+    def test_disabled_by_default(self):
+        self.assertFalse(get_instrumentation().enabled)
+        with get_instrumentation().stage('anything') as stage:
+            stage.count(seeds=1)
+        self.assertIs(get_instrumentation().stage('other'), get_instrumentation().stage('anything'))
+
+    def test_initialize_stages(self):
+        sink = InMemorySink()
+        instrumentation.enable(sink, trace_memory=True, labels={'run': 'test'})
+        network = ThoughtseedNetwork(self.config)
+        network.initialize()
+
+        stages = [record['stage'] for record in sink.records]
+        self.assertEqual(stages, ['generate_thoughtseeds', 'add_nodes_to_graph', 'add_edges_to_graph', 'normalize_weights', 'initialize'])
+        edges = sink.by_stage('add_edges_to_graph')[0]
+        self.assertEqual(edges['edges'], 200 * 199 // 2)
+        self.assertEqual(edges['run'], 'test')
+        self.assertGreater(edges['peak_allocated'], 0)
+        initialize = sink.by_stage('initialize')[0]
+        self.assertEqual(initialize['seeds'], 200)
+        self.assertGreaterEqual(initialize['wall_time'], sum(record['wall_time'] for record in sink.records[:-1]))
+        self.assertGreaterEqual(initialize['peak_allocated'], edges['peak_allocated'])
+
+    def test_errors_are_recorded(self):
+        sink = InMemorySink()
+        instrumentation.enable(sink)
+        with self.assertRaises(ValueError):
+            with get_instrumentation().stage('failing'):
+                raise ValueError("boom")
+        self.assertEqual(sink.records[0]['error'], "ValueError: boom")
+
+    def test_manager_run_to_json_lines(self):
+        network = ThoughtseedNetwork(self.config)
+        network.initialize()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'network')
+            network.save_state(path, format='columnar')
+            sink = JsonLinesSink(os.path.join(directory, 'metrics.jsonl'))
+            instrumentation.enable(sink)
+            with contextlib.redirect_stdout(io.StringIO()):
+                ThoughtSproutManager('test_config.yaml', path).run()
+            sink.close()
+            with open(sink.path, 'r') as f:
+                records = [json.loads(line) for line in f]
+        stages = {record['stage']: record for record in records}
+        self.assertEqual(stages['load_config_and_thoughtseeds']['seeds'], 200)
+        self.assertEqual(stages['orchestrate_thoughtsprouts']['sprouts'], stages['thoughtsprout_manager']['sprouts'])
+        self.assertGreaterEqual(stages['orchestrate_thoughtsprouts']['pools'], 5)
+
+if __name__ == '__main__':
+    unittest.main()
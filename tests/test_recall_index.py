@@ -0,0 +1,84 @@
+import yaml
+import unittest
+import numpy as np
+from thought_lifecycle.thoughtseed import ThoughtseedGenerator, hamming_distances
+from thought_lifecycle.recall_index import RecallIndex
+from thought_lifecycle.config import FeatureConfig, ThoughtseedNetworkConfig
+
+class TestRecallIndex(unittest.TestCase):
+    def setUp(self):
+        with open('test_config.yaml', 'r') as f:
+            config_data = yaml.safe_load(f)
+
+        feature_config = FeatureConfig(config_data['FeatureConfig'])
+        self.config = ThoughtseedNetworkConfig(dict(config_data['ThoughtseedNetworkConfig'], num_thoughtseeds=2000, seed=3), feature_config)
+        self.generator = ThoughtseedGenerator(self.config)
+        self.population = self.generator.generate_thoughtseeds()
+        self.index = RecallIndex(self.population, min_rebuild_size=100)
+
+    def brute_force_patterns(self, cue, k):
+        distances = hamming_distances(self.population.memory_pattern, cue).astype(np.int64)
+        order = np.lexsort((np.arange(len(distances)), distances))[:k]
+        return order, distances[order]
+
+    def brute_force_features(self, point, k):
+        matrix = np.column_stack([self.population.features[feature] for feature in self.index.features])
+        distances = np.sqrt(((matrix - point) ** 2).sum(axis=1))
+        order = np.argsort(distances, kind='stable')[:k]
+        return order, distances[order]
+
+    def test_pattern_queries_match_brute_force(self):
+        rng = np.random.default_rng(1)
+        cues = list(rng.integers(0, 2**32, size=20, dtype=np.uint32)) + [self.population.memory_pattern[5]]
+        ids, distances = self.index.query_pattern(cues, k=7)
+        self.assertEqual(ids.shape, (21, 7))
+        for row, cue in enumerate(cues):
+            expected_ids, expected_distances = self.brute_force_patterns(cue, 7)
+            np.testing.assert_array_equal(distances[row], expected_distances)
+            np.testing.assert_array_equal(ids[row], expected_ids)
+        self.assertEqual(distances[-1][0], 0)
+
+        wide_index = RecallIndex(self.population, substring_bits=16)
+        wide_ids, wide_distances = wide_index.query_pattern(cues, k=7)
+        np.testing.assert_array_equal(wide_ids, ids)
+        np.testing.assert_array_equal(wide_distances, distances)
+
+        ids, distances = self.index.query_pattern(self.population[9].memory_pattern, k=3)
+        self.assertEqual(ids.shape, (3,))
+        self.assertEqual(distances[0], 0)
+
+    def test_feature_queries_match_brute_force(self):
+        rng = np.random.default_rng(2)
+        points = rng.random((10, len(self.index.features)))
+        ids, distances = self.index.query_features(points, k=5)
+        for row, point in enumerate(points):
+            expected_ids, expected_distances = self.brute_force_features(point, 5)
+            np.testing.assert_array_equal(ids[row], expected_ids)
+            np.testing.assert_allclose(distances[row], expected_distances)
+
+        point = {feature: 0.5 for feature in self.index.features}
+        ids, distances = self.index.query_features(point, k=4)
+        np.testing.assert_array_equal(ids, self.brute_force_features(np.full(len(self.index.features), 0.5), 4)[0])
+
+    def test_incremental_insertion(self):
+        self.population.extend(self.generator.generate_thoughtseeds(50))
+        self.index.update()
+        self.assertEqual(len(self.index.buffer), 50)
+        self.assertEqual(len(self.index), 2050)
+
+        cue = self.population.memory_pattern[2030]
+        ids, distances = self.index.query_pattern(cue, k=5)
+        np.testing.assert_array_equal(ids, self.brute_force_patterns(cue, 5)[0])
+        point = self.index.feature_matrix(np.array([2040]))[0]
+        ids, distances = self.index.query_features(point, k=5)
+        np.testing.assert_array_equal(ids, self.brute_force_features(point, 5)[0])
+
+        # A large enough batch of new thoughtseeds triggers a rebuild
+        self.population.extend(self.generator.generate_thoughtseeds(300))
+        self.index.update()
+        self.assertEqual((self.index.num_indexed, len(self.index.buffer)), (2350, 0))
+        ids, distances = self.index.query_pattern(cue, k=5)
+        np.testing.assert_array_equal(ids, self.brute_force_patterns(cue, 5)[0])
+
+if __name__ == '__main__':
+    unittest.main()
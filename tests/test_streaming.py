@@ -0,0 +1,50 @@
+import yaml
+import unittest
+from thought_lifecycle.streaming import StreamingPipeline
+from thought_lifecycle.thoughtseed import ThoughtseedGenerator
+from thought_lifecycle.thoughtpool import ThoughtPoolAssigner, ThoughtSproutOrchestrator, ThoughtsproutTracker
+from thought_lifecycle.config import FeatureConfig, ThoughtseedNetworkConfig
+
+class FailingOrchestrator(ThoughtSproutOrchestrator):
+    def assign_batch(self, sprouts, key_codes):
+        raise ValueError("assignment failed")
+
+class TestStreamingPipeline(unittest.TestCase):
+    def setUp(self):
+        with open('test_config.yaml', 'r') as f:
+            config_data = yaml.safe_load(f)
+
+        self.feature_config = FeatureConfig(config_data['FeatureConfig'])
+        network_config = dict(config_data['ThoughtseedNetworkConfig'], num_thoughtseeds=2050, seed=4, generation_shard_size=50)
+        self.config = ThoughtseedNetworkConfig(network_config, self.feature_config)
+
+    def test_matches_batch_orchestration(self):
+        assigner = ThoughtPoolAssigner(self.feature_config)
+        tracker = ThoughtsproutTracker()
+        thoughtsprouts = ThoughtSproutOrchestrator(assigner, tracker).orchestrate_batch(ThoughtseedGenerator(self.config).generate_thoughtseeds())
+
+        pipeline = StreamingPipeline.from_config(self.config, queue_depth=1)
+        streamed_tracker = pipeline.run()
+        self.assertEqual((pipeline.num_generated, pipeline.num_chunks), (2050, 41))
+        self.assertEqual(pipeline.num_sprouts, len(thoughtsprouts))
+        self.assertEqual([sprout.energy_level for sprout in streamed_tracker.thoughtsprouts], [sprout.energy_level for sprout in thoughtsprouts])
+        for pool_key, pools in assigner.thought_pools.items():
+            self.assertEqual([[sprout.energy_level for sprout in pool.thoughtsprouts] for pool in pools],
+                             [[sprout.energy_level for sprout in pool.thoughtsprouts] for pool in pipeline.thoughtpool_assigner.thought_pools[pool_key]])
+
+    def test_backpressure_bounds_chunks_in_flight(self):
+        pipeline = StreamingPipeline.from_config(self.config, tracker_capacity=100, queue_depth=1)
+        tracker = pipeline.run()
+        self.assertEqual(tracker.count, pipeline.num_sprouts)
+        self.assertLessEqual(pipeline.max_chunks_in_flight, pipeline.queue_depth + 2)
+
+    def test_stage_errors_are_raised(self):
+        orchestrator = FailingOrchestrator(ThoughtPoolAssigner(self.feature_config), ThoughtsproutTracker())
+        pipeline = StreamingPipeline(ThoughtseedGenerator(self.config), orchestrator, queue_depth=1)
+        with self.assertRaises(ValueError):
+            pipeline.run()
+        with self.assertRaises(ValueError):
+            StreamingPipeline(ThoughtseedGenerator(self.config), orchestrator, queue_depth=0)
+
+if __name__ == '__main__':
+    unittest.main()
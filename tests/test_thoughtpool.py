@@ -0,0 +1,125 @@
+import os
+import sys
+import yaml
+import tempfile
+import unittest
+import subprocess
+import statistics
+import numpy as np
+from thought_lifecycle.thoughtpool import Thoughtsprout, ThoughtPoolAssigner, ThoughtSproutOrchestrator, ThoughtsproutTracker, RunningStats
+from thought_lifecycle.thoughtseed import ThoughtseedGenerator
+from thought_lifecycle.config import FeatureConfig, ThoughtseedNetworkConfig
+from thought_lifecycle.thoughtseed_network import ThoughtseedNetwork
+
+class TestThoughtPoolAssigner(unittest.TestCase):
+    def setUp(self):
+        with open('test_config.yaml', 'r') as f:
+            config_data = yaml.safe_load(f)
+
+        self.feature_config = FeatureConfig(config_data['FeatureConfig'])
+        self.network_config = ThoughtseedNetworkConfig(config_data['ThoughtseedNetworkConfig'], self.feature_config)
+        self.assigner = ThoughtPoolAssigner(self.feature_config)
+
+    def make_sprout(self, valence, energy_level):
+        feature_values = {'Complexity': 0.5, 'Valence': valence, 'Manifestation Strength': 0.5, 'Activation Threshold': 0.5}
+        return Thoughtsprout(feature_values, '0' * 32, energy_level, 0)
+
+    def test_running_stats(self):
+        values = [0.3, 1.5, -2.0, 0.7, 0.7]
+        stats = RunningStats()
+        for value in values:
+            stats.add(value)
+        self.assertEqual((stats.count, stats.min, stats.max), (5, -2.0, 1.5))
+        self.assertAlmostEqual(stats.mean, statistics.mean(values))
+        self.assertAlmostEqual(stats.std_dev(), statistics.stdev(values))
+
+    def test_fills_pools_in_order(self):
+        energies = np.linspace(0, 1, 20)
+        for energy_level in energies:
+            self.assertEqual(self.assigner.assign_to_pool(self.make_sprout(self.assigner.mean_valence, energy_level)), 'neutral')
+
+        pools = self.assigner.thought_pools['neutral']
+        pool_sizes = [len(pool.thoughtsprouts) for pool in pools]
+        self.assertEqual(pool_sizes, [7, 7, 6])
+        self.assertEqual(self.assigner.open_pools['neutral'], [2])
+
+        mean_size, std_dev_size = self.assigner.pool_size_stats('neutral')
+        self.assertAlmostEqual(mean_size, statistics.mean(pool_sizes))
+        self.assertAlmostEqual(std_dev_size, statistics.stdev(pool_sizes))
+        self.assertAlmostEqual(self.assigner.energy_stats['neutral'].std_dev(), statistics.stdev(energies))
+
+    def test_orchestrate_adjusts_energy_before_pooling(self):
+        self.network_config.num_thoughtseeds = 500
+        thoughtseeds = ThoughtseedGenerator(self.network_config).generate_thoughtseeds()
+        tracker = ThoughtsproutTracker()
+        ThoughtSproutOrchestrator(self.assigner, tracker).orchestrate(thoughtseeds)
+
+        self.assertEqual(len(tracker.thoughtsprouts), sum(thoughtseed.is_activated() for thoughtseed in thoughtseeds))
+        self.assertEqual(sum(self.assigner.pool_size_totals.values()), len(tracker.thoughtsprouts))
+        for pools in self.assigner.thought_pools.values():
+            for pool in pools:
+                energies = [sprout.energy_level for sprout in pool.thoughtsprouts]
+                self.assertEqual(energies, sorted(energies))
+
+    def test_orchestrate_batch_matches_orchestrate(self):
+        self.network_config.num_thoughtseeds = 500
+        population = ThoughtseedGenerator(self.network_config).generate_thoughtseeds()
+        population.energy_level[:5] = [0.0, 1.386, 1.387, 3.0, -1.0]  # Around sigmoid(x) = 0.8
+        copy = population.take(np.arange(len(population)))
+
+        tracker = ThoughtsproutTracker()
+        ThoughtSproutOrchestrator(self.assigner, tracker).orchestrate(copy)
+        batch_assigner = ThoughtPoolAssigner(self.feature_config)
+        batch_tracker = ThoughtsproutTracker()
+        thoughtsprouts = ThoughtSproutOrchestrator(batch_assigner, batch_tracker).orchestrate_batch(population)
+
+        np.testing.assert_array_equal(population.activation_status, copy.activation_status)
+        self.assertEqual(len(thoughtsprouts), len(tracker.thoughtsprouts))
+        self.assertEqual([sprout.energy_level for sprout in thoughtsprouts], [sprout.energy_level for sprout in tracker.thoughtsprouts])
+        self.assertEqual(len(set(sprout.time_activated for sprout in thoughtsprouts)), 1)
+        for pool_key, pools in self.assigner.thought_pools.items():
+            batch_pools = batch_assigner.thought_pools[pool_key]
+            self.assertEqual([[sprout.energy_level for sprout in pool.thoughtsprouts] for pool in pools],
+                             [[sprout.energy_level for sprout in pool.thoughtsprouts] for pool in batch_pools])
+
+    def test_bounded_tracker(self):
+        self.network_config.num_thoughtseeds = 500
+        population = ThoughtseedGenerator(self.network_config).generate_thoughtseeds()
+        tracker = ThoughtsproutTracker()
+        ThoughtSproutOrchestrator(self.assigner, tracker).orchestrate(population.take(np.arange(len(population))))
+        bounded_tracker = ThoughtsproutTracker(capacity=10)
+        ThoughtSproutOrchestrator(ThoughtPoolAssigner(self.feature_config), bounded_tracker).orchestrate_batch(population)
+
+        self.assertEqual(bounded_tracker.count, len(tracker.thoughtsprouts))
+        self.assertIsNone(bounded_tracker.thoughtsprouts)
+        recent = bounded_tracker.recent()
+        self.assertEqual(len(recent['energy_level']), 10)
+        self.assertEqual(recent['energy_level'].tolist(), [sprout.energy_level for sprout in tracker.thoughtsprouts[-10:]])
+        self.assertEqual(recent['memory_pattern'].tolist(), [sprout.packed_memory_pattern for sprout in tracker.thoughtsprouts[-10:]])
+        energies = [sprout.energy_level for sprout in tracker.thoughtsprouts]
+        self.assertAlmostEqual(bounded_tracker.energy_stats.mean, statistics.mean(energies))
+        self.assertAlmostEqual(bounded_tracker.energy_stats.std_dev(), statistics.stdev(energies))
+        self.assertEqual(sum(energy_stats.count for timestamp_stats, energy_stats in bounded_tracker.pool_stats.values()), bounded_tracker.count)
+        for pool_key, (timestamp_stats, energy_stats) in bounded_tracker.pool_stats.items():
+            self.assertEqual(energy_stats.count, self.assigner.energy_stats[pool_key].count)
+            self.assertAlmostEqual(energy_stats.mean, self.assigner.energy_stats[pool_key].mean)
+
+    def test_pool_pipeline_cold_start(self):
+        # A fresh interpreter running the pool-only pipeline over a columnar store must not import the graph, community
+        # detection, scipy.stats or process pool modules
+        self.network_config.num_thoughtseeds = 200
+        network = ThoughtseedNetwork(self.network_config)
+        network.generate_thoughtseeds()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'network')
+            network.save_state(path, format='columnar')
+            code = ("import sys; from thought_lifecycle.thoughtpool import ThoughtSproutManager; "
+                    f"ThoughtSproutManager('test_config.yaml', {path!r}).run(); "
+                    "print('heavy modules:', *sorted(module for module in sys.modules if module in ('scipy.stats', 'concurrent.futures.process') or "
+                    "module.split('.')[0] in ('networkx', 'community', 'leidenalg', 'igraph', 'matplotlib', 'multiprocessing')))")
+            completed = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+        self.assertIn('thoughtsprouts', completed.stdout)
+        self.assertEqual(completed.stdout.splitlines()[-1], 'heavy modules:')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,8 @@
 import yaml
 import unittest
-from thought_lifecycle.thoughtseed import Thoughtseed, sigmoid
-from thought_lifecycle.config import FeatureConfig
+import numpy as np
+from thought_lifecycle.thoughtseed import Thoughtseed, ThoughtseedGenerator, ThoughtseedPopulation, sigmoid, popcount, hamming_distances, _BYTE_POPCOUNT
+from thought_lifecycle.config import FeatureConfig, ThoughtseedNetworkConfig
 
 class TestThoughtseed(unittest.TestCase):
     def setUp(self):
@@ -43,5 +44,127 @@ class TestThoughtseed(unittest.TestCase):
         self.assertEqual(activity, 0)
         self.assertEqual(emotion, 0)
 
+class TestThoughtseedPopulation(unittest.TestCase):
+    def setUp(self):
+        features = {'Complexity': [0.25, 0.5, 0.75], 'Valence': [0.1, 0.5, 0.9]}
+        self.population = ThoughtseedPopulation(features, [0, 1, 2 ** 32 - 1])
+
+    def test_views_share_population_rows(self):
+        thoughtseed = self.population[1]
+        self.assertEqual(thoughtseed.feature_values['Complexity'], 0.5)
+        self.assertEqual(thoughtseed.memory_pattern, '0' * 31 + '1')
+        thoughtseed.energy_level += 1.0
+        thoughtseed.feature_values['Valence'] = 0.2
+        self.assertEqual(self.population.energy_level[1], 1.5)
+        self.assertEqual(self.population.features['Valence'][1], 0.2)
+        self.assertEqual(self.population[-1].memory_pattern, '1' * 32)
+
+    def test_sequence_protocol(self):
+        self.assertEqual(len(self.population), 3)
+        self.assertEqual([ts.index for ts in self.population], [0, 1, 2])
+        self.assertEqual(len(self.population[1:]), 2)
+        with self.assertRaises(IndexError):
+            self.population[3]
+
+    def test_take(self):
+        subset = self.population.take([2, 0])
+        self.assertEqual(list(subset.features['Valence']), [0.9, 0.1])
+        subset[0].energy_level = 2.0
+        self.assertEqual(self.population.energy_level[2], 0.5)
+
+    def test_empty(self):
+        population = ThoughtseedPopulation.empty(['Complexity', 'Valence'])
+        self.assertEqual(len(population), 0)
+        self.assertEqual(list(population.features), ['Complexity', 'Valence'])
+
+class TestMemoryPatterns(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.patterns = rng.integers(0, 2**32, size=200, dtype=np.uint32)
+        feature_values = [{'Valence': 0.5}] * len(self.patterns)
+        self.population = ThoughtseedPopulation.from_records(feature_values, self.patterns)
+
+    def test_decode_matches_string_decoding(self):
+        location, time_slot, activity, emotion = self.population.decode_memory_patterns()
+        for i, thoughtseed in enumerate(self.population):
+            bits = thoughtseed.memory_pattern
+            expected = (int(bits[16:24], 2), int(bits[24:], 2), int(bits[:8], 2), int(bits[8:16], 2))
+            self.assertEqual(thoughtseed.decode_memory_pattern(), expected)
+            self.assertEqual((location[i], time_slot[i], activity[i], emotion[i]), expected)
+
+    def test_popcount_lookup_table(self):
+        values = self.patterns
+        expected = np.array([bin(int(value)).count('1') for value in values])
+        np.testing.assert_array_equal(popcount(values), expected)
+        table_counts = _BYTE_POPCOUNT[values.view(np.uint8)].reshape(-1, 4).sum(axis=1)
+        np.testing.assert_array_equal(table_counts, expected)
+
+    def test_hamming_distances(self):
+        cue = '1' * 16 + '0' * 16
+        distances = self.population.hamming_distances(cue)
+        self.assertEqual(distances.shape, (200,))
+        self.assertEqual(distances[3], self.population[3].hamming_distance(cue))
+        batch = hamming_distances(self.patterns, self.patterns[:5])
+        self.assertEqual(batch.shape, (5, 200))
+        np.testing.assert_array_equal(np.diag(batch[:, :5]), np.zeros(5))
+        self.assertEqual(batch[1, 7], self.population[1].hamming_distance(self.population[7]))
+
+class TestThoughtseedGenerator(unittest.TestCase):
+    def setUp(self):
+        with open('test_config.yaml', 'r') as f:
+            self.config_data = yaml.safe_load(f)
+        self.feature_config = FeatureConfig(self.config_data['FeatureConfig'])
+
+    def make_generator(self, generation_mode, num_thoughtseeds, **options):
+        network_config = dict(self.config_data['ThoughtseedNetworkConfig'], generation_mode=generation_mode, num_thoughtseeds=num_thoughtseeds, **options)
+        return ThoughtseedGenerator(ThoughtseedNetworkConfig(network_config, self.feature_config))
+
+    def assert_same_population(self, first, second):
+        for feature in self.feature_config.features:
+            np.testing.assert_array_equal(first.features[feature], second.features[feature])
+        np.testing.assert_array_equal(first.memory_pattern, second.memory_pattern)
+        np.testing.assert_array_equal(first.energy_level, second.energy_level)
+
+    def test_seed_reproducibility(self):
+        for generation_mode in ('batch', 'sequential'):
+            first = self.make_generator(generation_mode, 300, seed=42).generate_thoughtseeds()
+            second = self.make_generator(generation_mode, 300, seed=42).generate_thoughtseeds()
+            self.assert_same_population(first, second)
+        other = self.make_generator('batch', 300, seed=43).generate_thoughtseeds()
+        self.assertFalse(np.array_equal(first.energy_level, other.energy_level))
+
+    def test_parallel_generation_matches_serial(self):
+        serial = self.make_generator('batch', 1000, seed=7, generation_shard_size=128).generate_thoughtseeds()
+        parallel = self.make_generator('batch', 1000, seed=7, generation_shard_size=128, build_processes=3).generate_thoughtseeds()
+        self.assertEqual(len(parallel), 1000)
+        self.assert_same_population(serial, parallel)
+
+    def test_generate_thoughtseeds_batch(self):
+        thoughtseeds = self.make_generator('batch', 500).generate_thoughtseeds()
+        self.assertEqual(len(thoughtseeds), 500)
+        for thoughtseed in thoughtseeds:
+            self.assertEqual(list(thoughtseed.feature_values), list(self.feature_config.features))
+            self.assertTrue(0 <= thoughtseed.feature_values['Valence'] <= 1)
+            self.assertEqual(len(thoughtseed.memory_pattern), 32)
+            location, time_slot, activity, emotion = thoughtseed.decode_memory_pattern()
+            self.assertEqual(activity, int(255 * thoughtseed.feature_values['Complexity']))
+            self.assertEqual(emotion, int(255 * thoughtseed.feature_values['Valence']))
+
+    def test_batch_matches_sequential_distribution(self):
+        batch = self.make_generator('batch', 4000).generate_thoughtseeds()
+        sequential = self.make_generator('sequential', 4000).generate_thoughtseeds()
+        for feature in self.feature_config.features:
+            batch_values = np.array([ts.feature_values[feature] for ts in batch])
+            sequential_values = np.array([ts.feature_values[feature] for ts in sequential])
+            self.assertAlmostEqual(batch_values.mean(), sequential_values.mean(), delta=0.03)
+            self.assertAlmostEqual(batch_values.std(), sequential_values.std(), delta=0.03)
+        batch_energy = np.array([ts.energy_level for ts in batch])
+        sequential_energy = np.array([ts.energy_level for ts in sequential])
+        self.assertAlmostEqual(batch_energy.mean(), sequential_energy.mean(), delta=0.1)
+
+    def test_unknown_generation_mode(self):
+        with self.assertRaises(ValueError):
+            self.make_generator('parallel', 10).generate_thoughtseeds()
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
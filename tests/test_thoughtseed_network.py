@@ -1,7 +1,16 @@
+import copy
+import os
+import pickle
+import tempfile
 import unittest
 import networkx as nx
+import numpy as np
 import yaml
-from thought_lifecycle.thoughtseed_network import ThoughtseedNetwork
+from thought_lifecycle.thoughtseed import Thoughtseed
+from thought_lifecycle.thoughtseed_network import ThoughtseedNetwork, compute_edge_weights
+from thought_lifecycle.graph_backend import CSRGraph
+from thought_lifecycle.network_store import load_population
+from thought_lifecycle.parallel_build import balanced_row_tiles, iter_parallel_edge_blocks, pairs_before_rows
 from thought_lifecycle.config import ThoughtseedNetworkConfig, FeatureConfig
 
 class TestThoughtseedNetwork(unittest.TestCase):
@@ -40,6 +49,152 @@ class TestThoughtseedNetwork(unittest.TestCase):
         expected_edges = self.thoughtseed_network_config.num_thoughtseeds * (self.thoughtseed_network_config.num_thoughtseeds - 1) // 2
         self.assertEqual(self.thoughtseed_network.graph.number_of_edges(), expected_edges)
 
+    def test_edge_weights_match_scalar_rule(self):
+        self.thoughtseed_network.config.num_thoughtseeds = 150
+        self.thoughtseed_network.config.edge_block_size = 1000
+        self.thoughtseed_network.generate_thoughtseeds()
+        self.thoughtseed_network.add_nodes_to_graph()
+        self.thoughtseed_network.add_edges_to_graph()
+        self.assertEqual(self.thoughtseed_network.graph.number_of_edges(), 150 * 149 // 2)
+        thoughtseeds = self.thoughtseed_network.thoughtseeds
+        for u, v, data in self.thoughtseed_network.graph.edges(data=True):
+            valence_weight, complexity_weight = self.thoughtseed_network.assign_edge_weights(thoughtseeds[u], thoughtseeds[v])
+            self.assertEqual(data['valence_weight'], valence_weight)
+            self.assertAlmostEqual(data['complexity_weight'], complexity_weight, places=12)
+
+    def test_compute_edge_weights_covers_all_valence_bands(self):
+        self.thoughtseed_network_config.feature_config.features['Valence'].parameters['sigma'] = 0.1
+        valences = np.linspace(0, 1, 21)
+        thoughtseeds = [Thoughtseed({'Valence': valence, 'Complexity': valence / 2}, 0) for valence in valences]
+        valence_weights, complexity_weights = compute_edge_weights(valences[:, None], valences[None, :], valences[:, None] / 2, valences[None, :] / 2, 0.5, 0.1)
+        self.assertEqual(set(np.unique(valence_weights)), {0, 1, 5, 12, 16})
+        for i, ts1 in enumerate(thoughtseeds):
+            for j, ts2 in enumerate(thoughtseeds):
+                valence_weight, complexity_weight = self.thoughtseed_network.assign_edge_weights(ts1, ts2)
+                self.assertEqual(valence_weights[i, j], valence_weight)
+                self.assertAlmostEqual(complexity_weights[i, j], complexity_weight, places=12)
+
+    def build_small_network(self, edge_mode, num_thoughtseeds=200, **options):
+        self.thoughtseed_network_config.num_thoughtseeds = num_thoughtseeds
+        self.thoughtseed_network_config.edge_mode = edge_mode
+        for name, value in options.items():
+            setattr(self.thoughtseed_network_config, name, value)
+        self.thoughtseed_network.initialize()
+        return self.thoughtseed_network
+
+    def test_weight_extremes_match_complete_graph(self):
+        self.thoughtseed_network_config.feature_config.features['Valence'].parameters['sigma'] = 0.15
+        network = self.build_small_network('complete')
+        for attribute in ('valence_weight', 'complexity_weight'):
+            values = [data[attribute] for u, v, data in network.graph.edges(data=True)]
+            self.assertEqual(network.weight_extremes[attribute], (min(values), max(values)))
+
+    def test_signed_complexity_extremes_and_knn(self):
+        # A normal Complexity takes negative values, where the square is not monotonic
+        self.thoughtseed_network_config.feature_config.features['Complexity'].distribution = 'normal'
+        self.thoughtseed_network_config.feature_config.features['Complexity'].parameters = {'mu': 0, 'sigma': 1}
+        complete = self.build_small_network('complete')
+        self.assertLess(complete.thoughtseeds.features['Complexity'].min(), 0)
+        values = [data['complexity_weight'] for u, v, data in complete.graph.edges(data=True)]
+        self.assertEqual(complete.weight_extremes['complexity_weight'], (min(values), max(values)))
+
+        knn_config = copy.copy(self.thoughtseed_network_config)
+        knn_config.edge_mode, knn_config.edge_k, knn_config.edge_block_size = 'knn', 5, 1000
+        network = ThoughtseedNetwork(knn_config)
+        network.thoughtseeds = complete.thoughtseeds
+        network.add_nodes_to_graph()
+        network.add_edges_to_graph()
+        network.normalize_weights()
+        for node in range(0, 200, 10):
+            expected = sorted((data['weight'] for data in complete.graph[node].values()), reverse=True)[:5]
+            selected = sorted((data['weight'] for data in network.graph[node].values()), reverse=True)[:5]
+            self.assertEqual(selected, expected)
+
+    def test_knn_edge_mode(self):
+        network = self.build_small_network('knn', edge_k=5, edge_block_size=1000)
+        self.assertEqual(network.graph.number_of_nodes(), 200)
+        self.assertLessEqual(network.graph.number_of_edges(), 200 * 5)
+        self.assertTrue(all(degree >= 5 for node, degree in network.graph.degree()))
+        self.assertTrue(all(0 <= data['weight'] <= 1 for u, v, data in network.graph.edges(data=True)))
+        # The k-th heaviest edge of every thoughtseed must be as heavy as the k-th heaviest edge of the complete graph
+        complete_config = copy.copy(self.thoughtseed_network_config)
+        complete_config.edge_mode = 'complete'
+        complete = ThoughtseedNetwork(complete_config)
+        complete.thoughtseeds = network.thoughtseeds
+        complete.add_nodes_to_graph()
+        complete.add_edges_to_graph()
+        complete.normalize_weights()
+        for node in range(0, 200, 10):
+            expected = sorted((data['weight'] for data in complete.graph[node].values()), reverse=True)[:5]
+            selected = sorted((data['weight'] for data in network.graph[node].values()), reverse=True)[:5]
+            self.assertEqual(selected, expected)
+
+    def test_threshold_edge_mode(self):
+        network = self.build_small_network('threshold', edge_threshold=0.4, edge_block_size=1000)
+        complete_config = copy.copy(self.thoughtseed_network_config)
+        complete_config.edge_mode = 'complete'
+        complete = ThoughtseedNetwork(complete_config)
+        complete.thoughtseeds = network.thoughtseeds
+        complete.add_nodes_to_graph()
+        complete.add_edges_to_graph()
+        complete.normalize_weights()
+        expected = {(u, v): data['weight'] for u, v, data in complete.graph.edges(data=True) if data['weight'] > 0.4}
+        self.assertEqual({(u, v): data['weight'] for u, v, data in network.graph.edges(data=True)}, expected)
+
+    def test_parallel_build_matches_serial(self):
+        for edge_mode in ('complete', 'threshold'):
+            serial_config = copy.copy(self.thoughtseed_network_config)
+            serial_config.num_thoughtseeds, serial_config.edge_mode, serial_config.seed = 300, edge_mode, 5
+            serial_config.edge_block_size, serial_config.graph_backend = 1000, 'csr'
+            parallel_config = copy.copy(serial_config)
+            parallel_config.build_processes = 3
+            serial = ThoughtseedNetwork(serial_config)
+            serial.initialize()
+            parallel = ThoughtseedNetwork(parallel_config)
+            parallel.initialize()
+            self.assertGreater(len(parallel.edges), 0)
+            for column in ('source', 'target', 'valence_weight', 'complexity_weight', 'weight'):
+                np.testing.assert_array_equal(parallel.edges.column(column), serial.edges.column(column))
+            self.assertEqual(parallel.graph.number_of_edges(), serial.graph.number_of_edges())
+
+    def test_signed_complexity_weights_in_range(self):
+        self.thoughtseed_network_config.feature_config.features['Complexity'].distribution = 'normal'
+        self.thoughtseed_network_config.feature_config.features['Complexity'].parameters = {'mu': 0, 'sigma': 1}
+        upper = self.thoughtseed_network_config.valence_mix + self.thoughtseed_network_config.complexity_mix
+        for edge_mode, build_processes in (('complete', 1), ('threshold', 1), ('complete', 2), ('threshold', 2)):
+            network = self.build_small_network(edge_mode, num_thoughtseeds=150, edge_threshold=0.3, edge_block_size=1000,
+                                               build_processes=build_processes, graph_backend='csr')
+            self.assertGreater(len(network.edges), 0)
+            self.assertGreaterEqual(network.edges.weight.min(), 0)
+            self.assertLessEqual(network.edges.weight.max(), upper + 1e-12)
+
+        # Closed-form extremes that do not bracket the edges are not used
+        network.weight_extremes = {'valence_weight': (0, 1), 'complexity_weight': (0.0, 0.01)}
+        network.normalize_weights()
+        self.assertLessEqual(network.edges.weight.max(), upper + 1e-12)
+
+    def test_balanced_row_tiles(self):
+        tiles = balanced_row_tiles(1000, 8)
+        self.assertEqual((tiles[0][0], tiles[-1][1]), (0, 999))
+        self.assertTrue(all(stop == start for (_, stop), (start, _) in zip(tiles[:-1], tiles[1:])))
+        pairs_before = np.append(pairs_before_rows(1000), 1000 * 999 // 2)
+        pairs = [pairs_before[stop] - pairs_before[start] for start, stop in tiles]
+        self.assertEqual(len(tiles), 8)
+        self.assertLess(max(pairs) - min(pairs), 1000)
+        self.assertEqual(balanced_row_tiles(1, 4), [])
+
+    def test_parallel_build_frees_shared_memory(self):
+        self.thoughtseed_network_config.num_thoughtseeds = 300
+        self.thoughtseed_network_config.edge_block_size = 1000
+        self.thoughtseed_network.generate_thoughtseeds()
+        self.thoughtseed_network.weight_extremes = self.thoughtseed_network.compute_weight_extremes()
+        shared = set(os.listdir('/dev/shm')) if os.path.isdir('/dev/shm') else None
+        edge_blocks = iter_parallel_edge_blocks(self.thoughtseed_network, 2)
+        next(edge_blocks)
+        edge_blocks.close()  # Stop after one tile; the other tiles' blocks must still be freed
+        if shared is not None:
+            self.assertEqual(set(os.listdir('/dev/shm')) - shared, set())
+
     def test_normalize_weights(self):
         self.thoughtseed_network.generate_thoughtseeds()
         self.thoughtseed_network.add_nodes_to_graph()
@@ -48,5 +203,161 @@ class TestThoughtseedNetwork(unittest.TestCase):
         weights = [data['weight'] for u, v, data in self.thoughtseed_network.graph.edges(data=True)]
         self.assertTrue(all(0 <= weight <= 1 for weight in weights))  # All weights should be between 0 and 1 after normalization
 
+    def test_normalize_weights_matches_edge_scan(self):
+        network = self.build_small_network('complete', num_thoughtseeds=100)
+        edges = list(network.graph.edges(data=True))
+        max_valence_weight = max(data['valence_weight'] for u, v, data in edges)
+        min_valence_weight = min(data['valence_weight'] for u, v, data in edges)
+        max_complexity_weight = max(data['complexity_weight'] for u, v, data in edges)
+        min_complexity_weight = min(data['complexity_weight'] for u, v, data in edges)
+        for u, v, data in edges:
+            normalized_valence_weight = (data['valence_weight'] - min_valence_weight) / (max_valence_weight - min_valence_weight)
+            normalized_complexity_weight = (data['complexity_weight'] - min_complexity_weight) / (max_complexity_weight - min_complexity_weight)
+            self.assertAlmostEqual(data['weight'], 0.7 * normalized_valence_weight + 0.3 * normalized_complexity_weight, places=12)
+
+    def test_reweight_existing_network(self):
+        network = self.build_small_network('complete', num_thoughtseeds=100)
+        network.normalize_weights(valence_mix=0.0, complexity_mix=1.0)
+        complexity_weights = network.edges.complexity_weight
+        expected = (complexity_weights - complexity_weights.min()) / (complexity_weights.max() - complexity_weights.min())
+        np.testing.assert_allclose(network.edges.weight, expected)
+        self.assertEqual(network.graph[0][1]['weight'], network.edges.weight[0])
+
+    def test_normalize_weights_on_graph_edges(self):
+        self.thoughtseed_network.graph.add_edge(0, 1, valence_weight=1, complexity_weight=0.25)
+        self.thoughtseed_network.graph.add_edge(1, 2, valence_weight=5, complexity_weight=0.5)
+        self.thoughtseed_network.normalize_weights()
+        self.assertEqual(len(self.thoughtseed_network.edges), 2)
+        self.assertEqual(self.thoughtseed_network.graph[1][2]['weight'], 1.0)
+        self.assertEqual(self.thoughtseed_network.graph[0][1]['weight'], 0.0)
+
+    def test_csr_graph_backend(self):
+        self.thoughtseed_network_config.graph_backend = 'csr'
+        self.thoughtseed_network = ThoughtseedNetwork(self.thoughtseed_network_config)
+        network = self.build_small_network('complete', num_thoughtseeds=100)
+        self.assertIsInstance(network.graph, CSRGraph)
+        self.assertEqual(network.graph.number_of_nodes(), 100)
+        self.assertEqual(network.graph.number_of_edges(), 100 * 99 // 2)
+        self.assertTrue(np.all((network.edges.weight >= 0) & (network.edges.weight <= 1)))
+        adjacency = network.graph.adjacency()
+        self.assertEqual((adjacency != adjacency.T).nnz, 0)
+        np.testing.assert_array_equal(network.graph.degree(), np.full(100, 99))
+
+        nx_graph = network.graph.to_networkx()
+        self.assertEqual(nx_graph.number_of_edges(), 100 * 99 // 2)
+        self.assertEqual(nx_graph.nodes[5]['feature_values']['Valence'], network.thoughtseeds.features['Valence'][5])
+        self.assertAlmostEqual(nx_graph[3][7]['weight'], adjacency[3, 7])
+        self.assertEqual(network.graph.to_igraph().ecount(), 100 * 99 // 2)
+        self.assertEqual(sorted(network.graph.subgraph([2, 4, 8]).edges()), [(2, 4), (2, 8), (4, 8)])
+
+    def test_add_thoughtseeds_matches_full_normalization(self):
+        network = self.build_small_network('complete', num_thoughtseeds=100)
+        new_ids = network.add_thoughtseeds(20)
+        np.testing.assert_array_equal(new_ids, np.arange(100, 120))
+        self.assertEqual(len(network.thoughtseeds), 120)
+        self.assertEqual(network.graph.number_of_edges(), 120 * 119 // 2)
+        self.assertEqual(len(network.edges), 120 * 119 // 2)
+        self.assertEqual(network.weight_extremes, network.compute_weight_extremes())
+
+        network.ensure_normalized()
+        self.assertFalse(network.weights_stale)
+        weights = {(u, v): data['weight'] for u, v, data in network.graph.edges(data=True)}
+        network.normalize_weights()
+        for u, v, data in network.graph.edges(data=True):
+            self.assertAlmostEqual(weights[(u, v)], data['weight'])
+
+    def test_incremental_normalization_with_edge_extremes(self):
+        # An edge added to the graph directly lies outside the closed-form extremes, so the edges' own extremes are used
+        network = self.build_small_network('knn', num_thoughtseeds=100, edge_k=5)
+        u, v = next((u, v) for u in range(100) for v in range(u + 1, 100) if not network.graph.has_edge(u, v))
+        network.graph.add_edge(u, v, valence_weight=0, complexity_weight=50.0)
+        network.normalize_weights()
+        for change in (lambda: network.add_thoughtseeds(10), lambda: network.remove_thoughtseeds([u])):
+            change()
+            network.ensure_normalized()
+            weights = {(i, j): data['weight'] for i, j, data in network.graph.edges(data=True)}
+            self.assertLessEqual(max(weights.values()), 1)
+            network.normalize_weights()
+            for i, j, data in network.graph.edges(data=True):
+                self.assertAlmostEqual(weights[(i, j)], data['weight'])
+
+    def test_add_thoughtseeds_knn(self):
+        network = self.build_small_network('knn', num_thoughtseeds=100, edge_k=5)
+        num_edges = network.graph.number_of_edges()
+        network.add_thoughtseeds(10)
+        self.assertEqual(network.graph.number_of_nodes(), 110)
+        self.assertGreater(network.graph.number_of_edges(), num_edges)
+        for i in range(100, 110):
+            self.assertGreaterEqual(network.graph.degree(i), 5)
+
+    def test_remove_thoughtseeds(self):
+        network = self.build_small_network('complete', num_thoughtseeds=50)
+        valence = network.thoughtseeds.features['Valence'].copy()
+        weight = network.graph[10][20]['weight']
+        mapping = network.remove_thoughtseeds([0, 5, 49])
+        self.assertEqual(len(network.thoughtseeds), 47)
+        self.assertEqual(network.graph.number_of_edges(), 47 * 46 // 2)
+        self.assertEqual(mapping[5], -1)
+        self.assertEqual(mapping[10], 8)
+        self.assertEqual(network.thoughtseeds.features['Valence'][8], valence[10])
+        self.assertEqual(network.graph[mapping[10]][mapping[20]]['weight'], weight)
+
+    def test_load_legacy_pickle(self):
+        # Network pickled by the list-of-objects implementation, with thoughtseed 3 activated
+        network = ThoughtseedNetwork.load_state(os.path.join(os.path.dirname(__file__), 'fixtures', 'baseline_network.pickle'))
+        self.assertEqual(len(network.thoughtseeds), 12)
+        self.assertEqual(network.config.edge_mode, 'complete')
+        for i, thoughtseed in enumerate(network.thoughtseeds):
+            self.assertEqual(dict(thoughtseed.feature_values), dict(network.graph.nodes[i]['feature_values']))
+            self.assertEqual(thoughtseed.memory_pattern, network.graph.nodes[i]['memory_pattern'])
+        self.assertEqual(network.thoughtseeds.activation_status.tolist(), [i == 3 for i in range(12)])
+        weights = {(u, v): data['weight'] for u, v, data in network.graph.edges(data=True)}
+        network.normalize_weights()
+        self.assertEqual(len(network.edges), 66)
+        for (u, v), weight in weights.items():
+            self.assertAlmostEqual(network.graph[u][v]['weight'], weight)
+
+        # Current pickles still round-trip through the slots
+        network.generate_thoughtseeds()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'network.pickle')
+            network.save_state(path)
+            loaded = ThoughtseedNetwork.load_state(path)
+        self.assertEqual(loaded.thoughtseeds.energy_level.tolist(), network.thoughtseeds.energy_level.tolist())
+        thoughtseed = pickle.loads(pickle.dumps(network.thoughtseeds[7]))
+        self.assertEqual((thoughtseed.index, thoughtseed.memory_pattern), (7, network.thoughtseeds[7].memory_pattern))
+
+    def test_columnar_state_round_trip(self):
+        network = self.build_small_network('knn', num_thoughtseeds=100)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'network')
+            network.save_state(path, format='columnar')
+            loaded = ThoughtseedNetwork.load_state(path)
+            self.assertFalse(loaded.thoughtseeds.energy_level.flags.owndata)  # Backed by the memory-mapped file
+            np.testing.assert_array_equal(loaded.thoughtseeds.energy_level, network.thoughtseeds.energy_level)
+            np.testing.assert_array_equal(loaded.thoughtseeds.memory_pattern, network.thoughtseeds.memory_pattern)
+            self.assertEqual(loaded.config.edge_mode, 'knn')
+            self.assertEqual(loaded.weight_extremes, network.weight_extremes)
+            self.assertEqual(sorted(loaded.graph.edges(data=True)), sorted(network.graph.edges(data=True)))
+
+            # Copy-on-write mapping: changes to a loaded population never reach the files
+            population = load_population(path, features=['Valence'])
+            self.assertEqual(list(population.features), ['Valence'])
+            population[0].energy_level += 1
+            self.assertEqual(load_population(path).energy_level[0], network.thoughtseeds.energy_level[0])
+
+    def test_columnar_reload_continues_random_stream(self):
+        network = self.build_small_network('knn', num_thoughtseeds=50, seed=7)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'network')
+            network.save_state(path, format='columnar')
+            loaded = ThoughtseedNetwork.load_state(path)
+            loaded.add_thoughtseeds(5)
+        network.add_thoughtseeds(5)
+        valence = loaded.thoughtseeds.features['Valence']
+        self.assertFalse(np.array_equal(valence[50:55], valence[0:5]))
+        # Growing the reloaded network draws the same thoughtseeds as growing the original one
+        np.testing.assert_array_equal(valence, network.thoughtseeds.features['Valence'])
+
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
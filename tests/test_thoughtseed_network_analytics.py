@@ -1,9 +1,16 @@
+import os
+import tempfile
 import yaml
 import unittest
+from collections import Counter
 import networkx as nx
+import numpy as np
 from thought_lifecycle.thoughtseed_network import ThoughtseedNetwork
-from thought_lifecycle.thoughtseed_network_analytics import ThoughtseedNetworkAnalytics
+from thought_lifecycle.thoughtseed_network_analytics import CommunityIndex, ThoughtseedNetworkAnalytics
 from thought_lifecycle.config import ThoughtseedNetworkConfig, FeatureConfig
+from thought_lifecycle.community_sweep import partition_cache
+from thought_lifecycle.graph_backend import as_networkx
+import community as community_louvain
 
 
 class TestThoughtseedNetworkAnalytics(unittest.TestCase):
@@ -25,6 +32,61 @@ class TestThoughtseedNetworkAnalytics(unittest.TestCase):
         self.analytics.calculate_pagerank()
         self.assertIsInstance(self.analytics.pagerank, dict)
 
+    def test_pagerank_and_degree_centrality_match_networkx(self):
+        self.network.config.num_thoughtseeds = 200
+        self.network.config.edge_mode = 'knn'
+        self.network.initialize()
+        self.analytics.calculate_pagerank()
+        expected = nx.pagerank(self.network.graph, alpha=0.85)
+        for node, rank in expected.items():
+            self.assertAlmostEqual(self.analytics.pagerank[node], rank, places=6)
+        self.assertEqual(self.analytics.pagerank_array[7], self.analytics.pagerank[7])
+
+        self.analytics.calculate_degree_centrality()
+        self.assertEqual(self.analytics.degree_centrality, nx.degree_centrality(self.network.graph))
+        self.analytics.calculate_degree_centrality(weighted=True)
+        strength = dict(self.network.graph.degree(weight='weight'))
+        self.assertAlmostEqual(self.analytics.degree_centrality[3], strength[3] / 199)
+
+    def test_pagerank_follows_network_changes(self):
+        self.network.config.num_thoughtseeds = 200
+        self.network.config.edge_mode = 'knn'
+        for graph_backend in ('networkx', 'csr'):
+            self.network.config.graph_backend = graph_backend
+            network = ThoughtseedNetwork(self.network.config)
+            network.initialize()
+            analytics = ThoughtseedNetworkAnalytics(network)
+            analytics.calculate_pagerank()
+
+            # Re-weight, then grow the network; every run must rank the current edges
+            network.normalize_weights(0.0, 1.0)
+            analytics.calculate_pagerank()
+            expected = nx.pagerank(as_networkx(network.graph), alpha=0.85)
+            self.assertAlmostEqual(analytics.pagerank[0], expected[0], places=6)
+            network.add_thoughtseeds(10)
+            analytics.calculate_pagerank()
+            for _ in range(2):
+                self.assertEqual(len(analytics.pagerank_array), 210)
+                graph = as_networkx(network.graph)
+                expected = nx.pagerank(graph, alpha=0.85)
+                for node, rank in expected.items():
+                    self.assertAlmostEqual(analytics.pagerank[node], rank, places=6)
+                # A new thoughtseed with its neighbourhood
+                star = [209] + list(graph[209])
+                self.assert_matches_networkx(analytics.describe_community(star), graph.subgraph(star))
+                network.remove_thoughtseeds([0, 1, 2, 3, 4])
+                network.add_thoughtseeds(5)
+                analytics.calculate_pagerank()
+
+    def test_pagerank_warm_start(self):
+        self.network.config.num_thoughtseeds = 200
+        self.network.config.edge_mode = 'knn'
+        self.network.initialize()
+        self.analytics.calculate_pagerank(tol=1e-10, max_iter=500)
+        cold_iterations = self.analytics.pagerank_iterations
+        self.analytics.calculate_pagerank(tol=1e-10, max_iter=500, warm_start=self.analytics.pagerank_array)
+        self.assertLess(self.analytics.pagerank_iterations, cold_iterations)
+
     def test_detect_communities(self):
         self.analytics.detect_communities()
         self.assertIsInstance(self.analytics.communities, dict)
@@ -39,11 +101,149 @@ class TestThoughtseedNetworkAnalytics(unittest.TestCase):
         community_description = self.analytics.describe_community(community_nodes)
         self.assertIsInstance(community_description, dict)
 
+    def assert_matches_networkx(self, description, community):
+        self.assertEqual(description['size'], community.number_of_nodes())
+        self.assertEqual(description['density'], nx.density(community))
+        self.assertEqual(description['diameter'], nx.diameter(community))
+        self.assertAlmostEqual(description['average_path_length'], nx.average_shortest_path_length(community), places=12)
+
+    def test_describe_community_methods(self):
+        self.network.config.num_thoughtseeds = 300
+        self.network.config.edge_mode = 'knn'
+        self.network.config.edge_k = 4
+        self.network.initialize()
+        graph = self.network.graph
+        # A triangle is complete, a node with its neighbourhood is near-complete, a BFS tree region needs a search
+        triangle = next(([u, v, w] for u, v in graph.edges for w in set(graph[u]) & set(graph[v])), None)
+        star = [0] + list(graph[0])
+        component = max(nx.connected_components(graph), key=len)
+        region = list(nx.bfs_tree(graph, next(iter(component)), depth_limit=3))
+        for nodes, method in ((triangle, 'complete'), (star, None), (region, 'bfs')):
+            if nodes is None:
+                continue
+            description = self.analytics.describe_community(nodes)
+            if method is not None:
+                self.assertEqual(description['method'], method)
+            self.assert_matches_networkx(description, graph.subgraph(nodes))
+
+    def test_describe_community_sampled(self):
+        self.network.config.num_thoughtseeds = 300
+        self.network.config.edge_mode = 'knn'
+        self.network.config.edge_k = 4
+        self.network.rng = np.random.default_rng(3)
+        self.network.initialize()
+        component = list(max(nx.connected_components(self.network.graph), key=len))
+        description = self.analytics.describe_community(component, max_exact_size=50, num_sources=40)
+        self.assertEqual(description['method'], 'sampled')
+        community = self.network.graph.subgraph(component)
+        lower, upper = description['diameter_bounds']
+        self.assertTrue(lower <= nx.diameter(community) <= upper)
+        # The standard error is a sampling estimate, not a bound: on hub-dominated components it understates the error,
+        # so the average is checked against the exact one with a relative tolerance
+        average_path_length = nx.average_shortest_path_length(community)
+        self.assertGreaterEqual(description['average_path_length_stderr'], 0)
+        self.assertLess(abs(description['average_path_length'] - average_path_length), 0.05 * average_path_length)
+
+    def test_describe_communities(self):
+        self.network.config.num_thoughtseeds = 300
+        self.network.initialize()
+        self.analytics.detect_communities()
+        descriptions = self.analytics.describe_communities(max_workers=2)
+        for community_id, description in descriptions.items():
+            nodes = [node for node, id in self.analytics.communities.items() if id == community_id]
+            self.assert_matches_networkx(description, self.network.graph.subgraph(nodes))
+        self.assertEqual(len(descriptions), self.analytics.count_large_communities())
+
+    def test_community_index(self):
+        communities = {0: 4, 1: 2, 2: 4, 3: 7, 4: 4, 5: 2, 6: 9}
+        index = CommunityIndex.from_partition(communities)
+        self.assertEqual(len(index), 4)
+        self.assertEqual(index.members(4).tolist(), [0, 2, 4])
+        self.assertEqual(index.size(2), 2)
+        self.assertEqual(index.community_of(3), 7)
+        self.assertEqual(index.large_communities(2).tolist(), [2, 4])
+        self.assertEqual(index.count_large_communities(), 1)
+        self.assertEqual(index.top_k(2).tolist(), [4, 2])
+        self.assertEqual(dict((community_id, members.tolist()) for community_id, members in index.items()), {2: [1, 5], 4: [0, 2, 4], 7: [3], 9: [6]})
+
+    def test_community_index_skips_unassigned_nodes(self):
+        # Nodes 0, 2, 4 and 6 are missing from the partition and get id -1, which is not a community
+        index = CommunityIndex.from_partition({1: 3, 3: 3, 5: 8, 7: 3})
+        self.assertEqual(index.community_ids.tolist(), [3, 8])
+        self.assertEqual(index.sizes.tolist(), [3, 1])
+        self.assertEqual(index.members(3).tolist(), [1, 3, 7])
+        self.assertEqual(index.community_of(0), -1)
+        self.assertEqual(index.count_large_communities(), 1)
+        self.assertEqual(index.top_k(5).tolist(), [3, 8])
+        self.assertEqual([community_id for community_id, members in index.items()], [3, 8])
+
     def test_count_large_communities(self):
         self.network.initialize()
         self.analytics.detect_communities()
         large_communities = self.analytics.count_large_communities()
         self.assertIsInstance(large_communities, int)
 
+    def test_sweep_communities(self):
+        self.network.config.num_thoughtseeds = 150
+        self.network.config.edge_mode = 'knn'
+        self.network.initialize()
+        partition_cache.clear()
+        results = self.analytics.sweep_communities('louvain', resolutions=(0.5, 1.0), seeds=(1, 2), max_workers=2)
+        self.assertEqual([(result['resolution'], result['seed']) for result in results], [(0.5, 1), (0.5, 2), (1.0, 1), (1.0, 2)])
+        for result in results:
+            communities = dict(enumerate(result['membership'].tolist()))
+            self.assertAlmostEqual(result['modularity'], community_louvain.modularity(communities, self.network.graph), places=6)
+        self.assertEqual(len(partition_cache), 4)
+
+        # Repeated queries come from the cache, and the serial path gives the same partitions as the pool
+        self.assertIs(self.analytics.sweep_communities('louvain', resolutions=(1.0,), seeds=(2,))[0], results[3])
+        partition_cache.clear()
+        serial = self.analytics.sweep_communities('louvain', resolutions=(0.5, 1.0), seeds=(1, 2), max_workers=1)
+        for result, serial_result in zip(results, serial):
+            self.assertEqual(result['membership'].tolist(), serial_result['membership'].tolist())
+
+        leiden = self.analytics.sweep_communities('leiden', resolutions=(1.0,), seeds=(0,), max_workers=1)[0]
+        self.assertEqual(len(leiden['membership']), 150)
+
+    def test_columnar_state_round_trip(self):
+        self.network.config.num_thoughtseeds = 100
+        self.network.initialize()
+        self.analytics.perform_analysis_and_print_communities()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'analytics')
+            self.analytics.save_state(path, format='columnar')
+            self.assertFalse(os.path.exists(os.path.join(path, 'edges')))
+            loaded = ThoughtseedNetworkAnalytics.load_state(path, self.network)
+            self.assertEqual(loaded.communities, self.analytics.communities)
+            self.assertEqual(loaded.pagerank, self.analytics.pagerank)
+            self.assertEqual(loaded.count_large_communities(), self.analytics.count_large_communities())
+            with self.assertRaises(ValueError):
+                ThoughtseedNetworkAnalytics.load_state(path)
+
+    def test_load_legacy_pickle(self):
+        # Analytics of a 12 thoughtseed network pickled by the dict-based implementation after centrality, PageRank and
+        # louvain community detection
+        analytics = ThoughtseedNetworkAnalytics.load_state(os.path.join(os.path.dirname(__file__), 'fixtures', 'baseline_analytics.pickle'))
+        self.assertEqual(sorted(Counter(analytics.communities.values()).values()), [2, 2, 4, 4])
+        self.assertEqual(analytics.count_large_communities(), 2)
+        pagerank = analytics.pagerank
+        analytics.calculate_pagerank()
+        for node, rank in pagerank.items():
+            self.assertAlmostEqual(analytics.pagerank[node], rank, places=6)
+        degree_centrality = analytics.degree_centrality
+        analytics.calculate_degree_centrality()
+        self.assertEqual(analytics.degree_centrality, degree_centrality)
+        self.assertEqual(analytics.describe_community(range(12))['size'], 12)
+
+    def test_csr_backend_communities(self):
+        self.network.config.graph_backend = 'csr'
+        self.network.config.num_thoughtseeds = 200
+        network = ThoughtseedNetwork(self.network.config)
+        network.initialize()
+        analytics = ThoughtseedNetworkAnalytics(network)
+        for algorithm in ('louvain', 'leiden'):
+            analytics.detect_communities(algorithm)
+            self.assertEqual(sorted(analytics.communities), list(range(200)))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,86 @@
+import os
+import networkx as nx
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from scipy.sparse.csgraph import shortest_path
+
+# Unweighted adjacency matrix of the current worker process, set once by the pool initializer
+_worker_adjacency = None
+
+def profile_community(adjacency, max_exact_size=2000, num_sources=64, seed=0):
+    # Size, density, diameter and average shortest path length of a community given its unweighted CSR adjacency matrix.
+    # Complete and near-complete communities are answered analytically: when every two non-adjacent nodes have more
+    # neighbours in total than there are other nodes, they must share one, so the diameter is 2 and the average path
+    # length follows from the edge count. Other communities use BFS from every node up to max_exact_size nodes, and BFS
+    # from num_sources sampled nodes beyond that, reporting bounds on the diameter and a standard error on the average.
+    # That standard error is the usual estimate from the spread of the sampled sources' mean distances, not a guarantee:
+    # when a few hubs dominate the distances and few of them are sampled, the actual error can be several times larger.
+    size = adjacency.shape[0]
+    degrees = np.diff(adjacency.indptr)
+    num_edges = int(degrees.sum()) // 2
+    num_pairs = size * (size - 1) // 2
+    properties = {
+        'size': size,
+        'density': num_edges / (size * (size - 1)) * 2,
+    }
+
+    if num_edges == num_pairs:
+        properties.update(diameter=1, average_path_length=1.0, method='complete')
+    elif 2 * degrees.min() > size - 2:
+        properties.update(diameter=2, average_path_length=(num_edges + 2 * (num_pairs - num_edges)) / num_pairs, method='near_complete')
+    elif size <= max_exact_size:
+        distances = shortest_path(adjacency, directed=False, unweighted=True)
+        if np.isinf(distances).any():
+            raise nx.NetworkXError("Found infinite path length because the graph is not connected")
+        properties.update(diameter=int(distances.max()), average_path_length=float(distances.sum() / (size * (size - 1))), method='bfs')
+    else:
+        rng = np.random.default_rng(seed)
+        sources = rng.choice(size, size=min(num_sources, size), replace=False)
+        distances = shortest_path(adjacency, directed=False, unweighted=True, indices=sources)
+        if np.isinf(distances).any():
+            raise nx.NetworkXError("Found infinite path length because the graph is not connected")
+        eccentricities = distances.max(axis=1)
+        mean_distances = distances.sum(axis=1) / (size - 1)
+        # Standard error of the sampled mean, with the finite population correction for sampling sources without replacement
+        standard_error = mean_distances.std(ddof=1) / np.sqrt(len(sources)) * np.sqrt(1 - len(sources) / size) if len(sources) > 1 else float('inf')
+        properties.update(diameter=int(eccentricities.max()), average_path_length=float(mean_distances.mean()), method='sampled',
+                          diameter_bounds=(int(eccentricities.max()), int(min(2 * eccentricities.min(), size - 1))),
+                          average_path_length_stderr=float(standard_error))
+    return properties
+
+def needs_search(adjacency):
+    # Whether profile_community has to run a breadth-first search for this community
+    size = adjacency.shape[0]
+    return 2 * np.diff(adjacency.indptr).min() <= size - 2
+
+def _init_worker(adjacency):
+    global _worker_adjacency
+    _worker_adjacency = adjacency
+
+def _profile_worker_task(task):
+    nodes, max_exact_size, num_sources, seed = task
+    return profile_community(_worker_adjacency[nodes][:, nodes], max_exact_size, num_sources, seed)
+
+def profile_communities(adjacency, communities, max_exact_size=2000, num_sources=64, seed=0, max_workers=None):
+    # Profile many communities given as {community_id: node index array}. Communities that can be answered analytically
+    # are handled in this process; the ones needing a search are spread over a process pool that receives the adjacency
+    # matrix once per worker.
+    profiles = {}
+    searches = []
+    for community_id, nodes in communities.items():
+        community_adjacency = adjacency[nodes][:, nodes]
+        if needs_search(community_adjacency):
+            searches.append((community_id, nodes))
+        else:
+            profiles[community_id] = profile_community(community_adjacency, max_exact_size, num_sources, seed)
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(searches))
+    tasks = [(nodes, max_exact_size, num_sources, seed) for community_id, nodes in searches]
+    if max_workers <= 1:
+        results = [profile_community(adjacency[nodes][:, nodes], max_exact_size, num_sources, seed) for nodes, *_ in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(adjacency,)) as executor:
+            results = list(executor.map(_profile_worker_task, tasks))
+    for (community_id, nodes), properties in zip(searches, results):
+        profiles[community_id] = properties
+    return {community_id: profiles[community_id] for community_id in communities}
@@ -0,0 +1,117 @@
+import hashlib
+import os
+import networkx as nx
+import numpy as np
+import scipy.sparse as sp
+from concurrent.futures import ProcessPoolExecutor
+
+# Partitions already computed, keyed by (graph fingerprint, algorithm, resolution, seed)
+partition_cache = {}
+
+# Graph of the current worker process, set once by the pool initializer and shared by all tasks of that worker
+_worker_graph = None
+
+def graph_fingerprint(adjacency):
+    # Content hash of a sparse adjacency matrix, used to recognise the same graph across sweeps
+    adjacency = sp.csr_array(adjacency)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.int64(adjacency.shape[0]).tobytes())
+    for array in (adjacency.indptr, adjacency.indices, adjacency.data):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+def modularity(adjacency, membership):
+    # Weighted Newman modularity (resolution 1) of a partition given as a community id per node
+    adjacency = sp.coo_array(adjacency)
+    total_weight = adjacency.data.sum()
+    if total_weight == 0:
+        return 0.0
+    intra_weight = adjacency.data[membership[adjacency.row] == membership[adjacency.col]].sum()
+    community_strength = np.bincount(membership, weights=adjacency.sum(axis=1), minlength=membership.max() + 1)
+    return float(intra_weight / total_weight - np.sum((community_strength / total_weight) ** 2))
+
+class SweepGraph:
+    # Edge arrays of the upper triangle of an adjacency matrix. The networkx and igraph graphs the community algorithms
+    # need are built from them once, on first use, in whichever process runs the partitions.
+    def __init__(self, num_nodes, sources, targets, weights):
+        self.num_nodes = num_nodes
+        self.sources = sources
+        self.targets = targets
+        self.weights = weights
+        self._graphs = {}
+
+    @classmethod
+    def from_adjacency(cls, adjacency):
+        upper = sp.triu(sp.coo_array(adjacency), k=1).tocoo()
+        return cls(adjacency.shape[0], upper.row.astype(np.int32), upper.col.astype(np.int32), upper.data)
+
+    def adjacency(self):
+        return sp.coo_array((np.concatenate([self.weights, self.weights]), (np.concatenate([self.sources, self.targets]), np.concatenate([self.targets, self.sources]))),
+                            shape=(self.num_nodes, self.num_nodes))
+
+    def networkx(self):
+        if 'networkx' not in self._graphs:
+            graph = nx.Graph()
+            graph.add_nodes_from(range(self.num_nodes))
+            graph.add_weighted_edges_from(zip(self.sources.tolist(), self.targets.tolist(), self.weights.tolist()))
+            self._graphs['networkx'] = graph
+        return self._graphs['networkx']
+
+    def igraph(self):
+        if 'igraph' not in self._graphs:
+            import igraph as ig
+            graph = ig.Graph(n=self.num_nodes, edges=np.column_stack([self.sources, self.targets]).tolist())
+            graph.es['weight'] = self.weights.tolist()
+            self._graphs['igraph'] = graph
+        return self._graphs['igraph']
+
+    def partition(self, algorithm, resolution, seed):
+        # Run one weighted community detection and return the community id of every node
+        if algorithm == 'louvain':
+            import community as community_louvain
+            communities = community_louvain.best_partition(self.networkx(), resolution=resolution, random_state=seed)
+            membership = np.array([communities[node] for node in range(self.num_nodes)], dtype=np.int32)
+        elif algorithm == 'leiden':
+            import leidenalg
+            partition = leidenalg.find_partition(self.igraph(), leidenalg.RBConfigurationVertexPartition, weights='weight',
+                                                 resolution_parameter=resolution, seed=seed)
+            membership = np.asarray(partition.membership, dtype=np.int32)
+        else:
+            raise ValueError(f"Unknown algorithm: {algorithm}")
+        return membership
+
+def _init_worker(sweep_graph):
+    global _worker_graph
+    _worker_graph = sweep_graph
+
+def _run_worker_task(task):
+    algorithm, resolution, seed = task
+    return _worker_graph.partition(algorithm, resolution, seed)
+
+def sweep_communities(adjacency, algorithm='louvain', resolutions=(1.0,), seeds=(0,), max_workers=None):
+    # Detect communities for every (resolution, seed) combination across a process pool. The graph is handed to each
+    # worker once through the pool initializer instead of being pickled with every task, and finished partitions are
+    # cached by graph fingerprint and parameters so that repeated sweeps return immediately.
+    fingerprint = graph_fingerprint(adjacency)
+    tasks = [(algorithm, resolution, seed) for resolution in resolutions for seed in seeds]
+    pending = [task for task in tasks if (fingerprint,) + task not in partition_cache]
+
+    if pending:
+        sweep_graph = SweepGraph.from_adjacency(adjacency)
+        max_workers = min(max_workers or os.cpu_count() or 1, len(pending))
+        if max_workers == 1:
+            memberships = [sweep_graph.partition(*task) for task in pending]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(sweep_graph,)) as executor:
+                memberships = list(executor.map(_run_worker_task, pending))
+        full_adjacency = sweep_graph.adjacency()
+        for task, membership in zip(pending, memberships):
+            partition_cache[(fingerprint,) + task] = {
+                'algorithm': task[0],
+                'resolution': task[1],
+                'seed': task[2],
+                'modularity': modularity(full_adjacency, membership),
+                'num_communities': int(membership.max()) + 1 if len(membership) else 0,
+                'membership': membership,
+            }
+    return [partition_cache[(fingerprint,) + task] for task in tasks]
@@ -6,6 +6,11 @@ class FeatureConfig:
         self.features = {name: self.Feature(feature['distribution'], feature['parameters'], feature.get('weight'))
                          for name, feature in config.items()}
 
+    def to_dict(self):
+        # Plain dict in the same shape as the FeatureConfig section of the YAML configuration
+        return {name: {'distribution': feature.distribution, 'parameters': dict(feature.parameters), 'weight': feature.weight}
+                for name, feature in self.features.items()}
+
     class Feature:
         def __init__(self, distribution, parameters, weight=None):
             # Initialize thoughtseed feature with distribution, parameters, and weight
@@ -18,4 +23,34 @@ class ThoughtseedNetworkConfig:
         # Initialize thoughtseed network configuration
         self.num_thoughtseeds = network_config['num_thoughtseeds']
         self.global_energy_value = network_config['global_energy_value']
-        self.feature_config = feature_config
\ No newline at end of file
+        # 'batch' draws each feature for the whole population in one vectorized call, 'sequential' samples seed by seed
+        self.generation_mode = network_config.get('generation_mode', 'batch')
+        # Maximum number of thoughtseed pairs whose edge weights are computed together in one vectorized tile
+        self.edge_block_size = network_config.get('edge_block_size', 1 << 20)
+        # 'complete' connects every pair, 'knn' keeps the edge_k heaviest edges of each thoughtseed and
+        # 'threshold' keeps only edges whose normalized weight is above edge_threshold
+        self.edge_mode = network_config.get('edge_mode', 'complete')
+        self.edge_k = network_config.get('edge_k', 10)
+        self.edge_threshold = network_config.get('edge_threshold', 0.5)
+        # Mix of normalized valence and complexity weights in the combined edge weight
+        self.valence_mix = network_config.get('valence_mix', 0.7)
+        self.complexity_mix = network_config.get('complexity_mix', 0.3)
+        # 'networkx' stores the network in an nx.Graph, 'csr' in a compact array-backed CSRGraph
+        self.graph_backend = network_config.get('graph_backend', 'networkx')
+        # Seed of all random draws (None draws fresh entropy). Batch generation splits the population into shards of
+        # generation_shard_size thoughtseeds with one independent random stream each, so the result for a seed does not
+        # depend on the number of build_processes generating the shards.
+        self.seed = network_config.get('seed')
+        self.generation_shard_size = network_config.get('generation_shard_size', 1 << 16)
+        # Worker processes generating shards and, for complete and threshold networks larger than one edge block,
+        # building and normalizing the edges (see parallel_build)
+        self.build_processes = network_config.get('build_processes', 1)
+        self.feature_config = feature_config
+
+    def __setstate__(self, state):
+        # Configurations pickled before an option existed get its default
+        self.__init__(state, state['feature_config'])
+
+    def to_dict(self):
+        # Plain dict in the same shape as the ThoughtseedNetworkConfig section of the YAML configuration
+        return {name: value for name, value in vars(self).items() if name != 'feature_config'}
@@ -0,0 +1,102 @@
+import numpy as np
+
+class EdgeList:
+    # Column arrays describing the edges of a thoughtseed network: endpoints, valence and complexity weights and the
+    # combined normalized weight. Blocks of edges are appended as they are produced and only concatenated into
+    # contiguous arrays when a column is read, so growing the list never copies the edges already stored. The extremes
+    # of the valence and complexity weights are kept up to date block by block.
+    columns = ('source', 'target', 'valence_weight', 'complexity_weight', 'weight')
+    extreme_columns = ('valence_weight', 'complexity_weight')
+
+    def __init__(self, float_dtype=np.float64):
+        self.dtypes = {'source': np.int32, 'target': np.int32, 'valence_weight': np.uint8,
+                       'complexity_weight': float_dtype, 'weight': float_dtype}
+        self.chunks = {column: [] for column in self.columns}
+        self.extremes = {}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if 'extremes' not in state:
+            # Pickled before the extremes were kept
+            self.extremes = {}
+            if len(self):
+                self.update_extremes(self.valence_weight, self.complexity_weight)
+
+    @classmethod
+    def from_graph(cls, graph, float_dtype=np.float64):
+        # Collect the edges of a networkx graph in a single pass over its edge data
+        edge_list = cls(float_dtype)
+        edges = list(graph.edges(data=True))
+        edge_list.append([u for u, v, data in edges], [v for u, v, data in edges],
+                         [data['valence_weight'] for u, v, data in edges], [data['complexity_weight'] for u, v, data in edges],
+                         [data.get('weight', 0) for u, v, data in edges])
+        return edge_list
+
+    def append(self, sources, targets, valence_weights, complexity_weights, weights=None):
+        # Append a block of edges; the combined weight defaults to 0 until the network is normalized
+        if weights is None:
+            weights = np.zeros(len(sources))
+        for column, values in zip(self.columns, (sources, targets, valence_weights, complexity_weights, weights)):
+            self.chunks[column].append(np.asarray(values, dtype=self.dtypes[column]))
+        if len(sources):
+            self.update_extremes(self.chunks['valence_weight'][-1], self.chunks['complexity_weight'][-1])
+
+    def update_extremes(self, valence_weights, complexity_weights):
+        for column, values in zip(self.extreme_columns, (valence_weights, complexity_weights)):
+            low, high = values.min().item(), values.max().item()
+            if column in self.extremes:
+                low, high = min(low, self.extremes[column][0]), max(high, self.extremes[column][1])
+            self.extremes[column] = (low, high)
+
+    def column(self, name):
+        # Return a column as one contiguous array, concatenating any pending blocks first
+        chunks = self.chunks[name]
+        if len(chunks) != 1:
+            chunks[:] = [np.concatenate(chunks) if chunks else np.empty(0, dtype=self.dtypes[name])]
+        return chunks[0]
+
+    def set_column(self, name, values):
+        self.chunks[name] = [np.asarray(values, dtype=self.dtypes[name])]
+        if name in self.extreme_columns:
+            self.extremes = {}
+            if len(self):
+                self.update_extremes(self.valence_weight, self.complexity_weight)
+
+    @property
+    def source(self):
+        return self.column('source')
+
+    @property
+    def target(self):
+        return self.column('target')
+
+    @property
+    def valence_weight(self):
+        return self.column('valence_weight')
+
+    @property
+    def complexity_weight(self):
+        return self.column('complexity_weight')
+
+    @property
+    def weight(self):
+        return self.column('weight')
+
+    def weight_extremes(self):
+        # Minimum and maximum valence and complexity weights of the stored edges, (0, 0) without edges
+        return {column: self.extremes.get(column, (0, 0)) for column in self.extreme_columns}
+
+    def adjacency(self, num_nodes, weight='weight'):
+        # Symmetric CSR adjacency matrix of an edge column, or of ones when weight is None
+        import scipy.sparse as sp
+        values = np.ones(len(self), dtype=np.float32) if weight is None else self.column(weight)
+        rows = np.concatenate([self.source, self.target])
+        columns = np.concatenate([self.target, self.source])
+        return sp.csr_array((np.concatenate([values, values]), (rows, columns)), shape=(num_nodes, num_nodes))
+
+    @property
+    def nbytes(self):
+        return sum(chunk.nbytes for chunks in self.chunks.values() for chunk in chunks)
+
+    def __len__(self):
+        return sum(len(chunk) for chunk in self.chunks['source'])
@@ -0,0 +1,114 @@
+import math
+import numpy as np
+
+from thought_lifecycle.graph_backend import adjacency_matrix
+
+class ActivationEvents:
+    # Compact record of activation state changes: one (step, thoughtseed index, activated) row per change, so a run
+    # costs memory proportional to the number of changes rather than steps * thoughtseeds
+    def __init__(self, steps, ids, activated, num_steps):
+        self.steps = steps
+        self.ids = ids
+        self.activated = activated
+        self.num_steps = num_steps
+
+    def __len__(self):
+        return len(self.steps)
+
+    def activations_per_step(self):
+        # Number of thoughtseeds that became active at each step
+        return np.bincount(self.steps[self.activated], minlength=self.num_steps)
+
+    def active_counts(self, initial_active=0):
+        # Number of active thoughtseeds after each step
+        changes = np.bincount(self.steps, weights=np.where(self.activated, 1, -1), minlength=self.num_steps)
+        return initial_active + np.cumsum(changes).astype(np.int64)
+
+    def first_activation(self, num_thoughtseeds):
+        # Step at which each thoughtseed first became active, -1 if it never did
+        first = np.full(num_thoughtseeds, -1, dtype=np.int64)
+        ids = self.ids[self.activated][::-1]
+        first[ids] = self.steps[self.activated][::-1]  # Later duplicates are written first and overwritten by earlier ones
+        return first
+
+class EnergyPropagation:
+    # Time-stepped energy propagation over the weighted thoughtseed graph. Every step, each thoughtseed keeps
+    # (1 - decay) of its energy and receives coupling * the summed edge weights of its active neighbours:
+    #     energy[t + 1] = (1 - decay) * energy[t] + coupling * W @ active[t]
+    # where a thoughtseed is active when sigmoid(energy) > threshold, as in Thoughtseed.is_activated.
+    # The input W @ active is kept up to date from the state changes only, which touches the edges of the thoughtseeds
+    # that switched instead of the whole adjacency matrix every step.
+    def __init__(self, adjacency, decay=0.1, threshold=0.8, coupling=None, full_update_fraction=0.1):
+        if not 0 <= decay <= 1:
+            raise ValueError(f"Decay must be between 0 and 1, got {decay}")
+        if not 0 < threshold < 1:
+            raise ValueError(f"Threshold must be between 0 and 1, got {threshold}")
+        self.adjacency = adjacency.tocsr().astype(np.float64)
+        self.num_thoughtseeds = self.adjacency.shape[0]
+        self.decay = decay
+        self.threshold = threshold
+        # By default scale the input so a thoughtseed with all neighbours active receives about one unit on average
+        if coupling is None:
+            mean_strength = self.adjacency.sum() / max(self.num_thoughtseeds, 1)
+            coupling = 1.0 / mean_strength if mean_strength > 0 else 0.0
+        self.coupling = coupling
+        # sigmoid(energy) > threshold is evaluated as energy > logit(threshold), avoiding an exp per thoughtseed per step
+        self.energy_threshold = math.log(threshold / (1 - threshold))
+        # Above this fraction of switching thoughtseeds a full matrix-vector product is cheaper than the incremental one
+        self.full_update_fraction = full_update_fraction
+
+    @classmethod
+    def from_network(cls, thoughtseed_network, **options):
+        # Engine over the normalized weight adjacency of a ThoughtseedNetwork
+        thoughtseed_network.ensure_normalized()
+        return cls(adjacency_matrix(thoughtseed_network.graph, 'weight', thoughtseed_network.edges), **options)
+
+    def is_active(self, energy):
+        return energy > self.energy_threshold
+
+    def run(self, energy, num_steps, stimulus=None):
+        # Advance the energies for num_steps steps. stimulus is an optional constant per-step energy input.
+        # Returns the final energies, the final activation status and the ActivationEvents of the run.
+        energy = np.array(energy, dtype=np.float64)
+        if len(energy) != self.num_thoughtseeds:
+            raise ValueError(f"Expected {self.num_thoughtseeds} energy levels, got {len(energy)}")
+        active = self.is_active(energy)
+        synaptic_input = self.adjacency @ active.astype(np.float64)
+        retention = 1 - self.decay
+        full_update_threshold = self.full_update_fraction * self.num_thoughtseeds
+
+        event_steps, event_ids, event_activated = [], [], []
+        for step in range(num_steps):
+            energy *= retention
+            energy += self.coupling * synaptic_input
+            if stimulus is not None:
+                energy += stimulus
+
+            new_active = self.is_active(energy)
+            changed = np.flatnonzero(new_active != active)
+            if len(changed) == 0:
+                continue
+            event_steps.append(np.full(len(changed), step, dtype=np.int32))
+            event_ids.append(changed.astype(np.int32))
+            event_activated.append(new_active[changed])
+
+            if len(changed) > full_update_threshold:
+                synaptic_input = self.adjacency @ new_active.astype(np.float64)
+            else:
+                # W is symmetric, so the rows of the switched thoughtseeds are their columns
+                delta = np.where(new_active[changed], 1.0, -1.0)
+                synaptic_input += self.adjacency[changed].T @ delta
+            active = new_active
+
+        events = ActivationEvents(np.concatenate(event_steps) if event_steps else np.empty(0, dtype=np.int32),
+                                  np.concatenate(event_ids) if event_ids else np.empty(0, dtype=np.int32),
+                                  np.concatenate(event_activated) if event_activated else np.empty(0, dtype=bool),
+                                  num_steps)
+        return energy, active, events
+
+    def run_population(self, population, num_steps, stimulus=None):
+        # Run from the energies of a ThoughtseedPopulation and write the final energies and activation status back
+        energy, active, events = self.run(population.energy_level, num_steps, stimulus)
+        population.energy_level[:] = energy
+        population.activation_status[:] = active
+        return events
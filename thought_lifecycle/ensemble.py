@@ -0,0 +1,193 @@
+import argparse
+import copy
+import hashlib
+import itertools
+import json
+import os
+import time
+import traceback
+import numpy as np
+import yaml
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from thought_lifecycle.config import FeatureConfig, ThoughtseedNetworkConfig
+from thought_lifecycle.thoughtseed_network import ThoughtseedNetwork
+from thought_lifecycle.thoughtseed_network_analytics import ThoughtseedNetworkAnalytics
+from thought_lifecycle.community_sweep import modularity
+from thought_lifecycle.thoughtpool import ThoughtPoolAssigner, ThoughtSproutOrchestrator, ThoughtsproutTracker
+
+# Ensemble of full generate -> analyze -> pool runs over a grid of configuration overrides. A sweep spec looks like
+#
+#     base: test_config.yaml          # YAML file or inline dict with FeatureConfig and ThoughtseedNetworkConfig sections
+#     replicas: 5
+#     seed: 0                         # Replica r uses seed + r for its network and community detection
+#     sweep:
+#       FeatureConfig.Valence.parameters.sigma: [0.1, 0.2, 0.3]
+#       ThoughtseedNetworkConfig.num_thoughtseeds: [500, 1000]
+#       analysis.resolution: [1.0, 1.125]
+#
+# Keys are dotted paths into the configuration; the 'analysis' section holds the community detection parameters.
+# Every combination of sweep values is run replicas times. Each finished run appends one JSON line to the output file,
+# so an interrupted or partially failed ensemble is resumed by running it again: only runs without an 'ok' line rerun.
+
+DEFAULT_ANALYSIS = {'algorithm': 'louvain', 'resolution': 1.125, 'min_community_size': 3}
+
+def load_spec(spec):
+    # Sweep spec from a YAML file or a dict, with the base configuration loaded
+    if isinstance(spec, str):
+        with open(spec, 'r') as f:
+            spec = yaml.safe_load(f)
+    spec = dict(spec)
+    base = spec.get('base', 'test_config.yaml')
+    if isinstance(base, str):
+        with open(base, 'r') as f:
+            base = yaml.safe_load(f)
+    spec['base'] = {'FeatureConfig': base['FeatureConfig'], 'ThoughtseedNetworkConfig': base['ThoughtseedNetworkConfig'],
+                    'analysis': dict(DEFAULT_ANALYSIS, **base.get('analysis', {}))}
+    return spec
+
+def set_path(config, path, value):
+    # Set a dotted path such as 'FeatureConfig.Valence.parameters.sigma' in a nested dict
+    *parents, name = path.split('.')
+    for parent in parents:
+        if parent not in config:
+            raise ValueError(f"Unknown configuration path: {path}")
+        config = config[parent]
+    config[name] = value
+
+def run_id(config, seed, replica):
+    # Stable identifier of a run, independent of the order in which the sweep is expanded. It covers the fully resolved
+    # configuration and the seed, so results of a changed base configuration or spec seed are never resumed as finished.
+    key = json.dumps({'config': config, 'seed': seed, 'replica': replica}, sort_keys=True)
+    return hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+
+def expand_runs(spec):
+    # One task per combination of sweep values and replica
+    sweep = spec.get('sweep', {})
+    paths = list(sweep)
+    runs = []
+    for values in itertools.product(*(sweep[path] for path in paths)):
+        params = dict(zip(paths, values))
+        config = copy.deepcopy(spec['base'])
+        for path, value in params.items():
+            set_path(config, path, value)
+        for replica in range(spec.get('replicas', 1)):
+            seed = spec.get('seed', 0) + replica
+            runs.append({'run_id': run_id(config, seed, replica), 'params': params, 'replica': replica, 'seed': seed, 'config': config})
+    return runs
+
+def run_replica(run):
+    # Generate, analyze and pool one network. Returns a flat summary; failures are reported instead of raised so the
+    # rest of the ensemble keeps going.
+    summary = {'run_id': run['run_id'], 'params': run['params'], 'replica': run['replica'], 'seed': run['seed']}
+    timings = {}
+    try:
+        config = run['config']
+        analysis = config['analysis']
+
+        # The replica seed drives every random draw of the run, so results don't depend on the worker it ran on
+        start = time.perf_counter()
+        feature_config = FeatureConfig(config['FeatureConfig'])
+        network = ThoughtseedNetwork(ThoughtseedNetworkConfig(dict(config['ThoughtseedNetworkConfig'], seed=run['seed']), feature_config))
+        network.initialize()
+        timings['generate'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        analytics = ThoughtseedNetworkAnalytics(network)
+        analytics.calculate_degree_centrality()
+        analytics.calculate_pagerank()
+        analytics.detect_communities(analysis['algorithm'], analysis['resolution'], seed=run['seed'])
+        community_index = analytics.get_community_index()
+        timings['analyze'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        assigner = ThoughtPoolAssigner(feature_config)
+        thoughtsprouts = ThoughtSproutOrchestrator(assigner, ThoughtsproutTracker(capacity=1024)).orchestrate_batch(network.thoughtseeds)
+        timings['pool'] = time.perf_counter() - start
+
+        summary.update({
+            'status': 'ok',
+            'num_thoughtseeds': len(network.thoughtseeds),
+            'num_edges': int(network.graph.number_of_edges()),
+            'num_communities': len(community_index),
+            'num_large_communities': int(community_index.count_large_communities(analysis['min_community_size'])),
+            'modularity': float(modularity(analytics.adjacency('weight'), community_index.membership)),
+            'max_pagerank': float(analytics.pagerank_array.max()),
+            'mean_energy': float(network.thoughtseeds.energy_level.mean()),
+            'num_activated': len(thoughtsprouts),
+            'num_pools': {pool_key: len(pools) for pool_key, pools in assigner.thought_pools.items()},
+            'timings': timings,
+        })
+    except Exception as e:
+        summary.update({'status': 'failed', 'error': f"{type(e).__name__}: {e}", 'traceback': traceback.format_exc(), 'timings': timings})
+    return summary
+
+def load_results(output_path):
+    # Latest result line of every run in an ensemble output file
+    results = {}
+    if os.path.exists(output_path):
+        with open(output_path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    result = json.loads(line)
+                    results[result['run_id']] = result
+    return results
+
+def run_ensemble(spec, output_path, max_workers=None, max_pending=None):
+    # Run every run of the spec that has no 'ok' result in output_path yet, at most max_workers at a time, appending
+    # each summary to output_path as soon as it finishes. Returns the latest results of all runs of the spec.
+    runs = expand_runs(load_spec(spec))
+    finished = {run_id for run_id, result in load_results(output_path).items() if result['status'] == 'ok'}
+    pending_runs = iter([run for run in runs if run['run_id'] not in finished])
+
+    max_workers = max_workers or os.cpu_count() or 1
+    # Only a bounded number of runs is submitted at a time, so huge sweeps don't queue every config up front
+    max_pending = max_pending or 2 * max_workers
+    with ProcessPoolExecutor(max_workers=max_workers) as executor, open(output_path, 'a') as output:
+        futures = set()
+        for run in itertools.islice(pending_runs, max_pending):
+            futures.add(executor.submit(run_replica, run))
+        while futures:
+            done, futures = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                output.write(json.dumps(future.result()) + '\n')
+                output.flush()
+            for run in itertools.islice(pending_runs, len(done)):
+                futures.add(executor.submit(run_replica, run))
+
+    results = load_results(output_path)
+    return [results[run['run_id']] for run in runs if run['run_id'] in results]
+
+def aggregate_results(results, metrics=('num_communities', 'num_large_communities', 'modularity', 'max_pagerank', 'num_activated')):
+    # One row per parameter combination with the replica count and the mean and standard deviation of each metric over
+    # its successful replicas
+    groups = {}
+    for result in results:
+        if result['status'] == 'ok':
+            groups.setdefault(json.dumps(result['params'], sort_keys=True), []).append(result)
+    table = []
+    for key, group in groups.items():
+        row = dict(json.loads(key), replicas=len(group))
+        for metric in metrics:
+            values = np.array([result[metric] for result in group], dtype=np.float64)
+            row[f'{metric}_mean'] = float(values.mean())
+            row[f'{metric}_std'] = float(values.std(ddof=1)) if len(values) > 1 else 0.0
+        table.append(row)
+    return table
+
+def main():
+    parser = argparse.ArgumentParser(description="Run an ensemble of thoughtseed lifecycle experiments over a parameter sweep")
+    parser.add_argument('spec', help="YAML sweep spec")
+    parser.add_argument('output', help="JSON lines file the run summaries are appended to; rerun to resume")
+    parser.add_argument('--max-workers', type=int, default=None)
+    args = parser.parse_args()
+
+    results = run_ensemble(args.spec, args.output, args.max_workers)
+    failed = [result for result in results if result['status'] != 'ok']
+    for row in aggregate_results(results):
+        print(json.dumps(row))
+    print(f"{len(results) - len(failed)} runs finished, {len(failed)} failed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import networkx as nx
+import numpy as np
+
+from thought_lifecycle.edge_list import EdgeList
+
+class CSRGraph:
+    # Compact undirected graph for large thoughtseed networks. Edges are kept in an EdgeList of int32 endpoints and
+    # float32 weights (about 17 bytes per edge instead of several hundred for networkx dict-of-dicts). A symmetric
+    # scipy.sparse CSR adjacency, an igraph graph or a networkx graph are only built, and then cached, when asked for.
+    def __init__(self):
+        self.num_nodes = 0
+        self.population = None
+        self.edges = EdgeList(np.float32)
+        self._cache = {}
+
+    def add_nodes(self, num_nodes, population=None):
+        # Add num_nodes nodes labelled 0..num_nodes-1, optionally backed by the thoughtseed population for node attributes
+        self.num_nodes += num_nodes
+        self.population = population
+        self.invalidate()
+
+    def set_edges(self, edges):
+        self.edges = edges
+        self.invalidate()
+
+    def invalidate(self):
+        # Drop the cached adjacency and graph views after the nodes, edges or weights changed
+        self._cache.clear()
+
+    def number_of_nodes(self):
+        return self.num_nodes
+
+    def number_of_edges(self):
+        return len(self.edges)
+
+    @property
+    def nodes(self):
+        return range(self.num_nodes)
+
+    def adjacency(self, weight='weight'):
+        # Symmetric CSR adjacency matrix of an edge attribute, or of ones when weight is None
+        key = ('adjacency', weight)
+        if key not in self._cache:
+            self._cache[key] = self.edges.adjacency(self.num_nodes, weight)
+        return self._cache[key]
+
+    def degree(self):
+        # Number of neighbours of every node as an array
+        indptr = self.adjacency(weight=None).indptr
+        return np.diff(indptr)
+
+    def subgraph(self, nodes):
+        # Induced networkx subgraph on a set of nodes, built from the adjacency rows of those nodes only
+        nodes = np.asarray(list(nodes), dtype=np.int64)
+        community = nx.from_scipy_sparse_array(self.adjacency()[nodes][:, nodes])
+        return nx.relabel_nodes(community, dict(enumerate(nodes.tolist())))
+
+    def to_igraph(self):
+        # igraph view built directly from the edge arrays, without a networkx round-trip
+        if 'igraph' not in self._cache:
+            import igraph as ig
+            graph = ig.Graph(n=self.num_nodes, edges=np.column_stack([self.edges.source, self.edges.target]))
+            for column in ('valence_weight', 'complexity_weight', 'weight'):
+                graph.es[column] = self.edges.column(column)
+            self._cache['igraph'] = graph
+        return self._cache['igraph']
+
+    def to_networkx(self):
+        # Full networkx view with the same node and edge attributes as the networkx backend. Only for callers that need it.
+        if 'networkx' not in self._cache:
+            graph = nx.Graph()
+            if self.population is not None:
+                graph.add_nodes_from((i, {'feature_values': thoughtseed.feature_values, 'memory_pattern': thoughtseed.memory_pattern})
+                                     for i, thoughtseed in enumerate(self.population))
+            else:
+                graph.add_nodes_from(range(self.num_nodes))
+            graph.add_edges_from((u, v, {'valence_weight': valence_weight, 'complexity_weight': complexity_weight, 'weight': weight})
+                                 for u, v, valence_weight, complexity_weight, weight in zip(self.edges.source.tolist(), self.edges.target.tolist(),
+                                                                                           self.edges.valence_weight.tolist(), self.edges.complexity_weight.tolist(),
+                                                                                           self.edges.weight.tolist()))
+            self._cache['networkx'] = graph
+        return self._cache['networkx']
+
+    @property
+    def nbytes(self):
+        return self.edges.nbytes
+
+    def __getstate__(self):
+        # Cached views are rebuilt on demand and are not worth pickling
+        state = self.__dict__.copy()
+        state['_cache'] = {}
+        return state
+
+def create_graph(backend):
+    # Create an empty graph for the configured backend
+    if backend == 'networkx':
+        return nx.Graph()
+    elif backend == 'csr':
+        return CSRGraph()
+    else:
+        raise ValueError(f"Unknown graph backend: {backend}")
+
+def as_networkx(graph):
+    # Return a networkx graph for either backend
+    return graph if isinstance(graph, nx.Graph) else graph.to_networkx()
+
+def as_igraph(graph):
+    # Return an igraph graph for either backend, converting networkx graphs only when unavoidable
+    if isinstance(graph, nx.Graph):
+        import igraph as ig
+        return ig.Graph.from_networkx(graph)
+    return graph.to_igraph()
+
+def adjacency_matrix(graph, weight='weight', edges=None):
+    # Sparse adjacency matrix of either backend, rows and columns aligned to thoughtseed indices. For networkx graphs the
+    # network's EdgeList is used when it describes the graph, which avoids walking the networkx edge dicts.
+    if isinstance(graph, CSRGraph):
+        return graph.adjacency(weight)
+    if edges is not None and len(edges) == graph.number_of_edges() and all(node == i for i, node in enumerate(graph)):
+        return edges.adjacency(graph.number_of_nodes(), weight)
+    return nx.to_scipy_sparse_array(graph, nodelist=list(graph), weight=weight, format='csr')
@@ -0,0 +1,144 @@
+import json
+import time
+import tracemalloc
+
+# Lightweight per-stage instrumentation for the lifecycle pipeline. Pipeline code wraps each stage in
+#
+#     with get_instrumentation().stage('add_edges_to_graph') as stage:
+#         ...
+#         stage.count(edges=num_edges)
+#
+# and every finished stage produces one record with its wall time, CPU time, optional tracemalloc peak and counts,
+# passed to each sink. Sinks are callables taking the record; InMemorySink and JsonLinesSink cover the common cases.
+# Instrumentation is disabled until enable() installs sinks, and a disabled stage() costs one attribute lookup.
+
+class InMemorySink:
+    # Collects the records in a list
+    def __init__(self):
+        self.records = []
+
+    def __call__(self, record):
+        self.records.append(record)
+
+    def by_stage(self, name):
+        return [record for record in self.records if record['stage'] == name]
+
+class JsonLinesSink:
+    # Appends each record as one JSON line to a file
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'a')
+
+    def __call__(self, record):
+        self.file.write(json.dumps(record) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+class _DisabledStage:
+    # Shared no-op stage handed out while instrumentation is disabled
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def count(self, **counts):
+        pass
+
+_DISABLED_STAGE = _DisabledStage()
+
+class Stage:
+    def __init__(self, instrumentation, name, counts):
+        self.instrumentation = instrumentation
+        self.record = {'stage': name}
+        self.record.update(instrumentation.labels)
+        self.counts = dict(counts)
+        self.child_peak = 0
+
+    def count(self, **counts):
+        # Record item counts such as seeds, edges, sprouts or pools for this stage
+        self.counts.update(counts)
+
+    def __enter__(self):
+        instrumentation = self.instrumentation
+        if instrumentation.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            # The peak is reset for this stage; keep what the enclosing stage had seen so far
+            if instrumentation.stack:
+                instrumentation.stack[-1].child_peak = max(instrumentation.stack[-1].child_peak, peak)
+            tracemalloc.reset_peak()
+            self.start_memory = current
+        instrumentation.stack.append(self)
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        wall_time = time.perf_counter() - self.start_wall
+        cpu_time = time.process_time() - self.start_cpu
+        instrumentation = self.instrumentation
+        instrumentation.stack.pop()
+        self.record.update(wall_time=wall_time, cpu_time=cpu_time)
+        if instrumentation.trace_memory:
+            peak = max(tracemalloc.get_traced_memory()[1], self.child_peak)
+            self.record['peak_allocated'] = peak - self.start_memory
+            if instrumentation.stack:
+                instrumentation.stack[-1].child_peak = max(instrumentation.stack[-1].child_peak, peak)
+        if exc_type is not None:
+            self.record['error'] = f"{exc_type.__name__}: {exc_value}"
+        self.record.update(self.counts)
+        instrumentation.emit(self.record)
+        return False
+
+class Instrumentation:
+    def __init__(self, sinks=(), trace_memory=False, labels=None):
+        # trace_memory records the peak traced allocation of every stage with tracemalloc, which slows allocation
+        # heavy code noticeably; labels are added to every record (e.g. a run id)
+        self.sinks = list(sinks)
+        self.trace_memory = trace_memory
+        self.labels = dict(labels or {})
+        self.stack = []
+        self.started_tracemalloc = False
+        if trace_memory and self.sinks and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracemalloc = True
+
+    @property
+    def enabled(self):
+        return bool(self.sinks)
+
+    def stage(self, name, **counts):
+        # Context manager measuring one stage
+        if not self.sinks:
+            return _DISABLED_STAGE
+        return Stage(self, name, counts)
+
+    def emit(self, record):
+        for sink in self.sinks:
+            sink(record)
+
+    def close(self):
+        # Stop tracemalloc if this instrumentation started it; sinks belong to the caller and stay open
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+            self.started_tracemalloc = False
+
+# Process-wide instrumentation used by the pipeline stages
+_instrumentation = Instrumentation()
+
+def get_instrumentation():
+    return _instrumentation
+
+def enable(*sinks, trace_memory=False, labels=None):
+    # Send stage records to the given sinks (an InMemorySink if none are given) and return the new Instrumentation
+    global _instrumentation
+    _instrumentation.close()
+    _instrumentation = Instrumentation(sinks or (InMemorySink(),), trace_memory, labels)
+    return _instrumentation
+
+def disable():
+    global _instrumentation
+    _instrumentation.close()
+    _instrumentation = Instrumentation()
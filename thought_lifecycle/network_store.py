@@ -0,0 +1,152 @@
+import json
+import os
+import numpy as np
+
+from thought_lifecycle.config import FeatureConfig, ThoughtseedNetworkConfig
+from thought_lifecycle.edge_list import EdgeList
+from thought_lifecycle.thoughtseed import ThoughtseedPopulation
+
+# Columnar on-disk format for thoughtseed networks and analytics results. A store is a directory of .npy arrays plus a
+# small metadata.json, so every column can be memory-mapped and read on its own:
+#
+#   metadata.json                  format name and version, configuration, feature file names, weight extremes, state of
+#                                  the network's random generator
+#   population/feature_<i>.npy     one float64 array per feature
+#   population/energy_level.npy, activation_status.npy, memory_pattern.npy
+#   edges/<column>.npy             source, target, valence_weight, complexity_weight, weight
+#
+# metadata.json is written last, so a directory without it is an incomplete store.
+FORMAT_VERSION = 1
+METADATA_FILENAME = 'metadata.json'
+POPULATION_COLUMNS = ('energy_level', 'activation_status', 'memory_pattern')
+
+def is_store(path):
+    # Whether path is a directory written by save_network or save_analytics
+    return os.path.isfile(os.path.join(path, METADATA_FILENAME))
+
+def read_metadata(directory, expected_format):
+    with open(os.path.join(directory, METADATA_FILENAME), 'r') as f:
+        metadata = json.load(f)
+    if metadata.get('format') != expected_format:
+        raise ValueError(f"{directory} is not a {expected_format} store")
+    if metadata.get('version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported {expected_format} store version {metadata.get('version')} in {directory}, expected {FORMAT_VERSION}")
+    return metadata
+
+def write_metadata(directory, metadata):
+    with open(os.path.join(directory, METADATA_FILENAME), 'w') as f:
+        json.dump(metadata, f, indent=2)
+
+def load_column(path, mmap_mode='c'):
+    # Memory-map a .npy column. Empty arrays cannot be mapped and are read normally.
+    try:
+        return np.load(path, mmap_mode=mmap_mode)
+    except ValueError:
+        return np.load(path)
+
+def rng_state(rng):
+    # JSON-serializable state of a np.random.Generator: its bit generator state and the seed sequence it was created
+    # from, including how many child streams it has spawned
+    seed_seq = rng.bit_generator.seed_seq
+    entropy = seed_seq.entropy
+    return {
+        'bit_generator': rng.bit_generator.state,
+        'entropy': entropy.tolist() if isinstance(entropy, np.ndarray) else entropy,
+        'spawn_key': list(seed_seq.spawn_key),
+        'pool_size': seed_seq.pool_size,
+        'n_children_spawned': seed_seq.n_children_spawned,
+    }
+
+def restore_rng(state):
+    # Rebuild the generator saved by rng_state, so it continues its random stream and spawns new child streams
+    seed_seq = np.random.SeedSequence(state['entropy'], spawn_key=tuple(state['spawn_key']), pool_size=state['pool_size'],
+                                      n_children_spawned=state['n_children_spawned'])
+    bit_generator = getattr(np.random, state['bit_generator']['bit_generator'])(seed_seq)
+    bit_generator.state = state['bit_generator']
+    return np.random.Generator(bit_generator)
+
+def save_population(population, directory):
+    # Write every population column to directory and return the feature name -> file name mapping
+    os.makedirs(directory, exist_ok=True)
+    feature_files = {}
+    for i, (feature, values) in enumerate(population.features.items()):
+        feature_files[feature] = f'feature_{i}.npy'
+        np.save(os.path.join(directory, feature_files[feature]), np.ascontiguousarray(values))
+    for column in POPULATION_COLUMNS:
+        np.save(os.path.join(directory, f'{column}.npy'), np.ascontiguousarray(getattr(population, column)))
+    return feature_files
+
+def save_network(network, directory):
+    # Save a ThoughtseedNetwork as a columnar store: population columns, edge arrays and configuration
+    network.ensure_normalized()
+    os.makedirs(os.path.join(directory, 'edges'), exist_ok=True)
+    feature_files = save_population(network.thoughtseeds, os.path.join(directory, 'population'))
+    for column in EdgeList.columns:
+        np.save(os.path.join(directory, 'edges', f'{column}.npy'), network.edges.column(column))
+    write_metadata(directory, {
+        'format': 'thoughtseed_network',
+        'version': FORMAT_VERSION,
+        'num_thoughtseeds': len(network.thoughtseeds),
+        'num_edges': len(network.edges),
+        'feature_files': feature_files,
+        'weight_extremes': network.weight_extremes,
+        'rng': rng_state(network.rng),
+        'network_config': network.config.to_dict(),
+        'feature_config': network.config.feature_config.to_dict(),
+    })
+
+def load_population(directory, features=None, mmap_mode='c'):
+    # Load the thoughtseed population of a network store. Columns are memory-mapped (copy-on-write by default, so changes
+    # such as activation updates never reach the files) and only the requested features are opened.
+    metadata = read_metadata(directory, 'thoughtseed_network')
+    population_directory = os.path.join(directory, 'population')
+    feature_files = metadata['feature_files']
+    features = list(feature_files) if features is None else list(features)
+    columns = {column: load_column(os.path.join(population_directory, f'{column}.npy'), mmap_mode) for column in POPULATION_COLUMNS}
+    return ThoughtseedPopulation({feature: load_column(os.path.join(population_directory, feature_files[feature]), mmap_mode) for feature in features},
+                                 columns['memory_pattern'], columns['energy_level'], columns['activation_status'])
+
+def load_config(directory):
+    # Rebuild the ThoughtseedNetworkConfig a network store was created with
+    metadata = read_metadata(directory, 'thoughtseed_network')
+    return ThoughtseedNetworkConfig(metadata['network_config'], FeatureConfig(metadata['feature_config']))
+
+def load_network(directory, mmap_mode='c'):
+    # Load a ThoughtseedNetwork from a network store, rebuilding its graph from the edge arrays
+    from thought_lifecycle.thoughtseed_network import ThoughtseedNetwork
+
+    metadata = read_metadata(directory, 'thoughtseed_network')
+    # The generator continues where the saved network left off, so growing it draws new thoughtseeds rather than
+    # repeating the first ones. Stores written without its state start a fresh generator from the configured seed.
+    rng = restore_rng(metadata['rng']) if metadata.get('rng') is not None else None
+    network = ThoughtseedNetwork(load_config(directory), rng)
+    network.thoughtseeds = load_population(directory, mmap_mode=mmap_mode)
+    if metadata['weight_extremes'] is not None:
+        network.weight_extremes = {name: tuple(extremes) for name, extremes in metadata['weight_extremes'].items()}
+
+    edges = EdgeList()
+    edges.append(*(load_column(os.path.join(directory, 'edges', f'{column}.npy'), mmap_mode) for column in EdgeList.columns))
+    network.rebuild_graph(edges)
+    return network
+
+def save_analytics(analytics, directory):
+    # Save the array results of a ThoughtseedNetworkAnalytics object; the network itself is not duplicated
+    os.makedirs(directory, exist_ok=True)
+    arrays = {
+        'degree_centrality': analytics.degree_centrality_array,
+        'pagerank': analytics.pagerank_array,
+        'membership': analytics.get_community_index().membership if analytics.communities is not None else None,
+    }
+    for name, values in arrays.items():
+        if values is not None:
+            np.save(os.path.join(directory, f'{name}.npy'), np.ascontiguousarray(values))
+    write_metadata(directory, {
+        'format': 'thoughtseed_network_analytics',
+        'version': FORMAT_VERSION,
+        'arrays': [name for name, values in arrays.items() if values is not None],
+    })
+
+def load_analytics(directory, mmap_mode='c'):
+    # Load the arrays saved by save_analytics as {name: array}
+    metadata = read_metadata(directory, 'thoughtseed_network_analytics')
+    return {name: load_column(os.path.join(directory, f'{name}.npy'), mmap_mode) for name in metadata['arrays']}
@@ -0,0 +1,161 @@
+import math
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from thought_lifecycle.thoughtseed_network import iter_upper_triangle_blocks, normalize_edge_weights
+
+# Network construction on a pool of worker processes. The thoughtseed features and edge weight columns are placed in
+# multiprocessing.shared_memory blocks, so tasks only carry block names and index ranges:
+#
+# - iter_parallel_edge_blocks splits the upper triangle of the pair matrix into row tiles holding about the same
+#   number of pairs (row i has n-1-i of them). Each worker builds the edges of its tiles, keeping only those above
+#   edge_threshold in threshold mode, and writes them into a shared block of its own; the parent copies the blocks
+#   into the edge list in tile order, so the edges come out exactly as the serial build produces them.
+# - normalize_parallel normalizes the weight columns in equal slices written into one shared output array.
+#
+# The global weight extremes that thresholding and normalization need are computed in O(n) by the network beforehand.
+
+TILES_PER_PROCESS = 4  # More tiles than processes evens out the workers' speeds
+MAX_TILE_BLOCKS = 4    # A tile holds at most this many edge_block_size blocks, bounding every shared output block
+
+EDGE_COLUMNS = (('complexity_weight', np.float64), ('source', np.int32), ('target', np.int32), ('valence_weight', np.uint8))
+
+def _layout(count, columns):
+    # Byte offsets of count values of every (name, dtype) column packed into one buffer, and the buffer size. Columns
+    # are listed from the widest dtype down, so every column stays aligned.
+    offsets, size = {}, 0
+    for name, dtype in columns:
+        offsets[name] = size
+        size += count * np.dtype(dtype).itemsize
+    return offsets, max(size, 1)  # Shared memory blocks cannot be empty
+
+def _views(block, count, columns):
+    offsets, _ = _layout(count, columns)
+    return {name: np.ndarray(count, dtype=dtype, buffer=block.buf, offset=offsets[name]) for name, dtype in columns}
+
+def create_shared_arrays(arrays):
+    # Copy a {name: array} mapping of equally long arrays into a new shared memory block. Returns the block and the
+    # descriptor (block name, length, columns) workers attach with.
+    columns = tuple(sorted(((name, np.asarray(values).dtype) for name, values in arrays.items()), key=lambda column: -column[1].itemsize))
+    count = len(next(iter(arrays.values())))
+    block = shared_memory.SharedMemory(create=True, size=_layout(count, columns)[1])
+    for name, view in _views(block, count, columns).items():
+        view[:] = arrays[name]
+    return block, (block.name, count, columns)
+
+def attach_shared_arrays(descriptor):
+    # Open the block of a descriptor in this process and return it with its column views
+    name, count, columns = descriptor
+    block = shared_memory.SharedMemory(name=name)
+    return block, _views(block, count, columns)
+
+def release(block, unlink=False):
+    block.close()
+    if unlink:
+        block.unlink()
+
+def pairs_before_rows(num_thoughtseeds):
+    # Number of upper triangle pairs in the rows before each row
+    rows = np.arange(num_thoughtseeds, dtype=np.int64)
+    return rows * (num_thoughtseeds - 1) - rows * (rows - 1) // 2
+
+def balanced_row_tiles(num_thoughtseeds, num_tiles):
+    # Split the rows of the upper triangle into at most num_tiles contiguous (row_start, row_stop) ranges holding about
+    # the same number of pairs. Early rows are long, so the first tiles have few rows and the last ones many.
+    if num_thoughtseeds < 2:
+        return []
+    pairs_before = pairs_before_rows(num_thoughtseeds)
+    total_pairs = num_thoughtseeds * (num_thoughtseeds - 1) // 2
+    targets = np.arange(1, num_tiles) * total_pairs / num_tiles
+    boundaries = np.unique(np.concatenate([[0], np.searchsorted(pairs_before, targets), [num_thoughtseeds - 1]]))
+    return [(int(start), int(stop)) for start, stop in zip(boundaries[:-1], boundaries[1:])]
+
+def _build_tile(task):
+    # Process pool task: the edges of one row tile, written into a new shared block whose descriptor is returned
+    features, row_start, row_stop, settings = task
+    block, arrays = attach_shared_arrays(features)
+    blocks = []
+    for sources, targets, valence_weights, complexity_weights in iter_upper_triangle_blocks(arrays['valence'], arrays['complexity'], settings['mean_valence'],
+                                                                                              settings['std_dev_valence'], settings['edge_block_size'], row_start, row_stop):
+        if settings['edge_threshold'] is not None:
+            keep = normalize_edge_weights(valence_weights, complexity_weights, settings['weight_extremes'], *settings['weight_mix']) > settings['edge_threshold']
+            sources, targets, valence_weights, complexity_weights = sources[keep], targets[keep], valence_weights[keep], complexity_weights[keep]
+        blocks.append({'source': sources, 'target': targets, 'valence_weight': valence_weights, 'complexity_weight': complexity_weights})
+    del arrays
+    release(block)
+
+    count = sum(len(edges['source']) for edges in blocks)
+    output = shared_memory.SharedMemory(create=True, size=_layout(count, EDGE_COLUMNS)[1])
+    views = _views(output, count, EDGE_COLUMNS)
+    position = 0
+    for edges in blocks:
+        for name in views:
+            views[name][position:position + len(edges['source'])] = edges[name]
+        position += len(edges['source'])
+    del views
+    release(output)
+    return (output.name, count, EDGE_COLUMNS)
+
+def iter_parallel_edge_blocks(network, processes):
+    # Edge blocks of a complete or threshold network, built on processes worker processes. Yields the same
+    # (sources, targets, valence_weights, complexity_weights) blocks as iter_mode_edge_blocks, one per tile.
+    config = network.config
+    num_thoughtseeds = len(network.thoughtseeds)
+    total_pairs = num_thoughtseeds * (num_thoughtseeds - 1) // 2
+    num_tiles = max(processes * TILES_PER_PROCESS, math.ceil(total_pairs / (MAX_TILE_BLOCKS * config.edge_block_size)))
+    settings = {
+        'mean_valence': config.feature_config.features['Valence'].parameters['mu'],
+        'std_dev_valence': config.feature_config.features['Valence'].parameters['sigma'],
+        'edge_block_size': config.edge_block_size,
+        'edge_threshold': config.edge_threshold if config.edge_mode == 'threshold' else None,
+        'weight_extremes': network.weight_extremes,
+        'weight_mix': (config.valence_mix, config.complexity_mix),
+    }
+    features_block, features = create_shared_arrays({'valence': np.asarray(network.thoughtseeds.features['Valence'], dtype=np.float64),
+                                                     'complexity': np.asarray(network.thoughtseeds.features['Complexity'], dtype=np.float64)})
+    executor = ProcessPoolExecutor(max_workers=processes)
+    futures, merged = [], 0
+    try:
+        futures = [executor.submit(_build_tile, (features, row_start, row_stop, settings))
+                   for row_start, row_stop in balanced_row_tiles(num_thoughtseeds, num_tiles)]
+        for future in futures:
+            block, edges = attach_shared_arrays(future.result())
+            # Copy out of the shared block so it can be freed as soon as the tile is merged
+            copied = (edges['source'].copy(), edges['target'].copy(), edges['valence_weight'].copy(), edges['complexity_weight'].copy())
+            del edges
+            release(block, unlink=True)
+            merged += 1
+            yield copied
+    finally:
+        # Free the blocks of tiles that were never merged, because a tile failed or the consumer stopped early
+        executor.shutdown(cancel_futures=True)
+        for future in futures[merged:]:
+            if not future.cancelled() and future.exception() is None:
+                release(shared_memory.SharedMemory(name=future.result()[0]), unlink=True)
+        release(features_block, unlink=True)
+
+def _normalize_slice(task):
+    # Process pool task: normalize the weights of edges start..stop-1 into the shared output column
+    columns, output, start, stop, weight_extremes, weight_mix = task
+    columns_block, arrays = attach_shared_arrays(columns)
+    output_block, weights = attach_shared_arrays(output)
+    weights['weight'][start:stop] = normalize_edge_weights(arrays['valence_weight'][start:stop], arrays['complexity_weight'][start:stop], weight_extremes, *weight_mix)
+    del arrays, weights
+    release(columns_block)
+    release(output_block)
+
+def normalize_parallel(valence_weights, complexity_weights, weight_extremes, weight_mix, processes):
+    # normalize_edge_weights over the edge columns, in equal slices on processes worker processes
+    columns_block, columns = create_shared_arrays({'valence_weight': valence_weights, 'complexity_weight': complexity_weights})
+    output_block, output = create_shared_arrays({'weight': np.zeros(len(valence_weights))})
+    try:
+        bounds = np.linspace(0, len(valence_weights), processes * TILES_PER_PROCESS + 1).astype(np.int64)
+        tasks = [(columns, output, int(start), int(stop), weight_extremes, weight_mix) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            list(executor.map(_normalize_slice, tasks))
+        weights = _views(output_block, len(valence_weights), output[2])['weight'].copy()
+    finally:
+        release(columns_block, unlink=True)
+        release(output_block, unlink=True)
+    return weights
@@ -0,0 +1,140 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+from thought_lifecycle.thoughtseed import popcount, pack_memory_pattern
+
+# Substring values grouped by their number of set bits, per substring width: XOR-ing a substring with the group for s
+# enumerates the substrings at Hamming distance s
+_masks_by_distance = {}
+
+def masks_by_distance(bits):
+    if bits not in _masks_by_distance:
+        values = np.arange(1 << bits, dtype=np.int64)
+        counts = popcount(values.astype(np.uint32))
+        _masks_by_distance[bits] = [values[counts == s] for s in range(bits + 1)]
+    return _masks_by_distance[bits]
+
+def _bucket_members(order, starts, buckets):
+    # Concatenated members of the given buckets of a table stored as ids sorted by key plus bucket start offsets
+    lengths = starts[buckets + 1] - starts[buckets]
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    offsets = np.repeat(starts[buckets] - np.cumsum(lengths) + lengths, lengths)
+    return order[offsets + np.arange(total)]
+
+def _top_k(ids, distances, k):
+    # The k smallest distances, ties broken by thoughtseed index
+    order = np.lexsort((ids, distances))[:k]
+    return ids[order], distances[order]
+
+class RecallIndex:
+    # Associative recall over a ThoughtseedPopulation: the k thoughtseeds nearest to a cue memory pattern (Hamming
+    # distance) or to a cue point in feature space (Euclidean distance).
+    # Patterns use multi-index hashing: the 32 bits are split into m substrings with one hash table each. Any pattern
+    # within distance m(s+1)-1 of the cue has a substring within distance s of the cue's, so probing the tables at
+    # growing substring distances s finds the exact top-k after touching only nearby buckets. Substrings are bytes for
+    # small populations and 16 bits beyond 4096 thoughtseeds (unless substring_bits is given), keeping buckets small.
+    # Features use a KD-tree. Thoughtseeds appended to the population after the index was built are kept in a small
+    # buffer that is searched exhaustively until it is large enough to rebuild. The index refers to thoughtseeds by
+    # position, so it has to be rebuilt after thoughtseeds are removed.
+    def __init__(self, population, features=None, rebuild_fraction=0.1, min_rebuild_size=1024, substring_bits=None):
+        if substring_bits not in (None, 8, 16):
+            raise ValueError(f"Substrings must be 8 or 16 bits, got {substring_bits}")
+        self.population = population
+        self.features = list(population.features) if features is None else list(features)
+        self.fixed_substring_bits = substring_bits
+        self.rebuild_fraction = rebuild_fraction
+        self.min_rebuild_size = min_rebuild_size
+        self.rebuild()
+
+    @classmethod
+    def from_network(cls, thoughtseed_network, **options):
+        return cls(thoughtseed_network.thoughtseeds, **options)
+
+    def rebuild(self):
+        # Index every thoughtseed of the population and empty the buffer
+        self.num_indexed = len(self.population)
+        memory_patterns = self.population.memory_pattern[:self.num_indexed]
+        self.substring_bits = self.fixed_substring_bits or (8 if self.num_indexed <= 1 << 12 else 16)
+        self.shifts = tuple(range(32 - self.substring_bits, -1, -self.substring_bits))
+        self.tables = []
+        for shift in self.shifts:
+            keys = ((memory_patterns >> shift) & ((1 << self.substring_bits) - 1)).astype(np.int64)
+            order = np.argsort(keys, kind='stable')
+            starts = np.zeros((1 << self.substring_bits) + 1, dtype=np.int64)
+            starts[1:] = np.cumsum(np.bincount(keys, minlength=1 << self.substring_bits))
+            self.tables.append((order, starts))
+        self.tree = cKDTree(self.feature_matrix(np.arange(self.num_indexed))) if self.num_indexed else None
+        self.buffer = np.empty(0, dtype=np.int64)
+
+    def feature_matrix(self, ids):
+        return np.column_stack([self.population.features[feature][ids] for feature in self.features])
+
+    def update(self):
+        # Pick up thoughtseeds appended to the population since the last update, rebuilding once the buffer is large
+        num_thoughtseeds = len(self.population)
+        if num_thoughtseeds < self.num_indexed + len(self.buffer):
+            raise ValueError("The population shrank; build a new RecallIndex after removing thoughtseeds")
+        self.buffer = np.arange(self.num_indexed, num_thoughtseeds)
+        if len(self.buffer) > max(self.min_rebuild_size, self.rebuild_fraction * self.num_indexed):
+            self.rebuild()
+
+    def __len__(self):
+        return self.num_indexed + len(self.buffer)
+
+    def query_pattern(self, cues, k=10):
+        # k nearest thoughtseeds by memory pattern Hamming distance, for one cue (pattern string or packed integer) or a
+        # batch of cues. Returns (ids, distances), with one row per cue for a batch.
+        if np.isscalar(cues):
+            ids, distances = self.query_pattern([cues], k)
+            return ids[0], distances[0]
+        cues = [pack_memory_pattern(cue) for cue in cues]
+        k = min(k, len(self))
+        results = [self._query_one_pattern(cue, k) for cue in cues]
+        return (np.array([ids for ids, distances in results], dtype=np.int64).reshape(len(cues), k),
+                np.array([distances for ids, distances in results], dtype=np.int64).reshape(len(cues), k))
+
+    def _query_one_pattern(self, cue, k):
+        memory_patterns = self.population.memory_pattern
+        masks = masks_by_distance(self.substring_bits)
+        substring_mask = (1 << self.substring_bits) - 1
+        candidates = self.buffer
+        distances = popcount(memory_patterns[candidates] ^ np.uint32(cue)).astype(np.int64)
+        for s in range(self.substring_bits + 1):
+            probed = np.concatenate([_bucket_members(order, starts, ((cue >> shift) & substring_mask) ^ masks[s])
+                                     for (order, starts), shift in zip(self.tables, self.shifts)])
+            probed = np.setdiff1d(probed, candidates)  # Also drops duplicates found in several tables
+            candidates = np.concatenate([candidates, probed])
+            distances = np.concatenate([distances, popcount(memory_patterns[probed] ^ np.uint32(cue)).astype(np.int64)])
+            # Every thoughtseed within m(s+1)-1 bits has been found, so the search can stop once k of them are
+            if np.count_nonzero(distances <= len(self.tables) * (s + 1) - 1) >= k:
+                break
+        return _top_k(candidates, distances, k)
+
+    def query_features(self, points, k=10):
+        # k nearest thoughtseeds in feature space, for one point or a batch of points. A point is a mapping from feature
+        # name to value or a sequence in the order of self.features. Returns (ids, distances) like query_pattern.
+        single = isinstance(points, dict) or np.ndim(points) == 1
+        if isinstance(points, dict):
+            points = [[points[feature] for feature in self.features]]
+        points = np.atleast_2d(np.asarray(points, dtype=np.float64))
+        k = min(k, len(self))
+
+        all_ids, all_distances = [], []
+        if self.tree is not None:
+            distances, ids = self.tree.query(points, k=min(k, self.num_indexed))
+            all_ids.append(np.asarray(ids, dtype=np.int64).reshape(len(points), -1))
+            all_distances.append(np.asarray(distances).reshape(len(points), -1))
+        if len(self.buffer):
+            buffered = self.feature_matrix(self.buffer)
+            distances = np.sqrt(((points[:, None, :] - buffered[None, :, :]) ** 2).sum(axis=2))
+            all_ids.append(np.broadcast_to(self.buffer, distances.shape))
+            all_distances.append(distances)
+        ids = np.concatenate(all_ids, axis=1)
+        distances = np.concatenate(all_distances, axis=1)
+
+        results = [_top_k(row_ids, row_distances, k) for row_ids, row_distances in zip(ids, distances)]
+        ids = np.array([row_ids for row_ids, row_distances in results], dtype=np.int64).reshape(len(points), k)
+        distances = np.array([row_distances for row_ids, row_distances in results]).reshape(len(points), k)
+        return (ids[0], distances[0]) if single else (ids, distances)
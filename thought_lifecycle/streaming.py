@@ -0,0 +1,139 @@
+import argparse
+import asyncio
+import yaml
+
+from thought_lifecycle.config import FeatureConfig, ThoughtseedNetworkConfig
+from thought_lifecycle.instrumentation import get_instrumentation
+from thought_lifecycle.thoughtseed import ThoughtseedGenerator
+from thought_lifecycle.thoughtpool import ThoughtPoolAssigner, ThoughtSproutOrchestrator, ThoughtsproutTracker
+
+# Streaming form of the lifecycle: thoughtseeds flow in chunks from generation through the activation check and the
+# ThoughtPoolAssigner to the ThoughtsproutTracker, with the stages running concurrently
+#
+#     generate --seeds--> activate --sprouts--> assign --thoughtsprouts--> track
+#
+# and connected by asyncio queues holding at most queue_depth chunks. A stage that gets ahead blocks on its full output
+# queue, so pool assignment starts as soon as the first chunk is generated and at most about queue_depth + 2 chunks of
+# thoughtseeds exist at any time, whatever the population size. Only the activated sprouts are kept, by their pools.
+# Chunks are the generator's shards (generation_shard_size thoughtseeds), drawn on a worker thread so the pooling
+# stages keep running meanwhile; the streamed sprouts are the ones orchestrate_batch gives for the whole population.
+
+_END = object()  # Follows the last chunk on every queue
+
+class StreamingPipeline:
+    def __init__(self, generator, orchestrator, queue_depth=2, num_thoughtseeds=None):
+        if queue_depth < 1:
+            raise ValueError(f"Queue depth must be at least 1, got {queue_depth}")
+        self.generator = generator
+        self.orchestrator = orchestrator
+        self.queue_depth = queue_depth
+        self.num_thoughtseeds = num_thoughtseeds  # Defaults to the generator's configured number
+        self.num_generated = 0
+        self.num_chunks = 0
+        self.num_activated_chunks = 0
+        self.max_chunks_in_flight = 0  # Most chunks of thoughtseeds generated but not yet through the activation check
+        self.num_sprouts = 0
+
+    @classmethod
+    def from_config(cls, thoughtseed_network_config, tracker_capacity=None, rng=None, **options):
+        # Pipeline with a new generator, assigner and tracker (a ring buffer of tracker_capacity sprouts if given)
+        assigner = ThoughtPoolAssigner(thoughtseed_network_config.feature_config)
+        orchestrator = ThoughtSproutOrchestrator(assigner, ThoughtsproutTracker(tracker_capacity))
+        return cls(ThoughtseedGenerator(thoughtseed_network_config, rng), orchestrator, **options)
+
+    @property
+    def thoughtpool_assigner(self):
+        return self.orchestrator.thoughtpool_assigner
+
+    @property
+    def thoughtsprout_tracker(self):
+        return self.orchestrator.thoughtsprout_tracker
+
+    async def generate(self, seeds):
+        loop = asyncio.get_running_loop()
+        shards = self.generator.iter_shards(self.num_thoughtseeds)
+        while True:
+            shard = await loop.run_in_executor(None, next, shards, None)
+            if shard is None:
+                break
+            self.num_generated += len(shard)
+            self.num_chunks += 1
+            self.max_chunks_in_flight = max(self.max_chunks_in_flight, self.num_chunks - self.num_activated_chunks)
+            await seeds.put(shard)
+        await seeds.put(_END)
+
+    async def activate(self, seeds, sprouts):
+        while True:
+            population = await seeds.get()
+            if population is _END:
+                break
+            activated = self.orchestrator.activate_batch(population)
+            self.num_activated_chunks += 1
+            await sprouts.put(activated)
+        await sprouts.put(_END)
+
+    async def assign(self, sprouts, thoughtsprouts):
+        while True:
+            chunk = await sprouts.get()
+            if chunk is _END:
+                break
+            population, key_codes = chunk
+            await thoughtsprouts.put((self.orchestrator.assign_batch(population, key_codes), key_codes))
+        await thoughtsprouts.put(_END)
+
+    async def track(self, thoughtsprouts):
+        while True:
+            chunk = await thoughtsprouts.get()
+            if chunk is _END:
+                break
+            self.orchestrator.track_batch(*chunk)
+            self.num_sprouts += len(chunk[0])
+
+    async def run_async(self):
+        # Run every stage until the last chunk is tracked and return the tracker. If a stage fails, the others are
+        # cancelled and its exception is raised.
+        seeds, sprouts, thoughtsprouts = (asyncio.Queue(maxsize=self.queue_depth) for _ in range(3))
+        tasks = [asyncio.create_task(stage) for stage in (self.generate(seeds), self.activate(seeds, sprouts),
+                                                         self.assign(sprouts, thoughtsprouts), self.track(thoughtsprouts))]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        return self.thoughtsprout_tracker
+
+    def run(self):
+        with get_instrumentation().stage('streaming_pipeline') as stage:
+            tracker = asyncio.run(self.run_async())
+            stage.count(seeds=self.num_generated, chunks=self.num_chunks, sprouts=self.num_sprouts)
+        return tracker
+
+    def print_status(self):
+        print(f"Streamed {self.num_generated} thoughtseeds in {self.num_chunks} chunks, {self.num_sprouts} sprouted")
+        self.thoughtpool_assigner.print_status()
+        self.thoughtsprout_tracker.print_status()
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream generated thoughtseeds into thought pools")
+    parser.add_argument('--config', default='test_config.yaml')
+    parser.add_argument('--num-thoughtseeds', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=None, help="Thoughtseeds per chunk (default generation_shard_size)")
+    parser.add_argument('--queue-depth', type=int, default=2)
+    parser.add_argument('--tracker-capacity', type=int, default=1024, help="Most recent sprouts kept by the tracker")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        config_data = yaml.safe_load(f)
+    network_config = dict(config_data['ThoughtseedNetworkConfig'])
+    for key, value in (('num_thoughtseeds', args.num_thoughtseeds), ('generation_shard_size', args.chunk_size), ('seed', args.seed)):
+        if value is not None:
+            network_config[key] = value
+    config = ThoughtseedNetworkConfig(network_config, FeatureConfig(config_data['FeatureConfig']))
+
+    pipeline = StreamingPipeline.from_config(config, tracker_capacity=args.tracker_capacity, queue_depth=args.queue_depth)
+    pipeline.run()
+    pipeline.print_status()
+
+if __name__ == "__main__":
+    main()
@@ -6,16 +6,19 @@ import pickle
 import yaml
 import sys
 import os
-import statistics
+import math
+import heapq
 
-from thought_lifecycle.thoughtseed import Thoughtseed, ThoughtseedGenerator
-from thought_lifecycle.thoughtseed_network import ThoughtseedNetwork
-from thought_lifecycle.config import FeatureConfig, ThoughtseedNetworkConfig
+from thought_lifecycle.thoughtseed import Thoughtseed, ThoughtseedPopulation, sigmoid
+from thought_lifecycle.config import FeatureConfig
+from thought_lifecycle.instrumentation import get_instrumentation
+from thought_lifecycle.network_store import is_store, load_population
 
 class LoadThoughtseedNetwork:
     def __init__(self, filename):
         self.filename = filename
         self.thoughtseed_network = None
+        self.thoughtseeds = None
         self.num_activated = None
         self.num_not_activated = None
 
@@ -23,7 +26,13 @@ class LoadThoughtseedNetwork:
         # Add the parent directory to the Python path
         sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-        # Load the ThoughtseedNetwork object
+        # Columnar stores are read without the graph: only the memory-mapped population columns are opened
+        if is_store(self.filename):
+            self.thoughtseeds = load_population(self.filename)
+            return
+
+        # Load the ThoughtseedNetwork object; unpickling imports thought_lifecycle.thoughtseed_network itself, so the
+        # pool-only pipeline never pays for the network and graph modules when it reads a columnar store
         try:
             with open(self.filename, 'rb') as f:
                 self.thoughtseed_network = pickle.load(f)
@@ -32,51 +41,119 @@ class LoadThoughtseedNetwork:
             return
     
     def get_thoughtseeds(self):
-        # Return the thoughtseeds from the ThoughtseedNetwork object
+        # Return the thoughtseeds from the columnar store or the ThoughtseedNetwork object
+        if self.thoughtseeds is not None:
+            return self.thoughtseeds
         return self.thoughtseed_network.thoughtseeds if self.thoughtseed_network else None
 
 class Thoughtsprout(Thoughtseed):
+    __slots__ = ('time_activated',)
+
     def __init__(self, feature_values, memory_pattern, energy_level, energy_change):
         super().__init__(feature_values, memory_pattern)
         self.energy_level = self.calculate_energy_level(energy_level, energy_change)  # Calculate the energy level
         self.time_activated = time.time()  # Set the activation time to the current time
 
+    @classmethod
+    def views(cls, population, time_activated):
+        # Create Thoughtsprouts for every row of a population of sprouts, all activated at the same time
+        thoughtsprouts = [cls.view(population, index) for index in range(len(population))]
+        for thoughtsprout in thoughtsprouts:
+            thoughtsprout.time_activated = time_activated
+        return thoughtsprouts
+
     def calculate_energy_level(self, energy_level, energy_change):
         # Calculate the energy level based on the energy level of the Thoughtseed and the energy change
         return energy_level + energy_change
 
 class ThoughtSproutOrchestrator:
+    # Energy adjustments for each pool
+    energy_adjustments = {
+        'positive': 0.1,
+        'negative': -0.1,
+        'neutral': 0,
+        'positive_saliency': 0.2,
+        'negative_saliency': -0.2
+    }
+    energy_change = 0.1  # Energy gained by a Thoughtseed when it sprouts
+    activation_threshold = 0.8
+
     def __init__(self, thoughtpool_assigner, thoughtsprout_tracker):
         self.thoughtpool_assigner = thoughtpool_assigner
         self.thoughtsprout_tracker = thoughtsprout_tracker
 
     def orchestrate(self, thoughtseeds):
         for thoughtseed in thoughtseeds:
-            if thoughtseed.is_activated():
+            if thoughtseed.is_activated(self.activation_threshold):
                 # Create a Thoughtsprout from an active Thoughtseed
-                thoughtsprout = Thoughtsprout(thoughtseed.feature_values, thoughtseed.memory_pattern, thoughtseed.energy_level, 0.1)
-                
-                # Assign the Thoughtsprout to a ThoughtPool
-                pool_key = self.thoughtpool_assigner.assign_to_pool(thoughtsprout)
-                
-                # Assign energy level to the Thoughtsprout based on the assigned pool
+                thoughtsprout = Thoughtsprout(thoughtseed.feature_values, thoughtseed.memory_pattern, thoughtseed.energy_level, self.energy_change)
+
+                # Choose a ThoughtPool and assign the energy level based on it before the Thoughtsprout joins the pool,
+                # since pools keep their Thoughtsprouts ordered by energy level
+                pool_key = self.thoughtpool_assigner.classify(thoughtsprout)
                 thoughtsprout.energy_level = self.calculate_energy_level(thoughtsprout.energy_level, pool_key)
-                
+                self.thoughtpool_assigner.add_sprout_to_pool(thoughtsprout, pool_key)
+
                 # Track the new thoughtsprout
-                self.thoughtsprout_tracker.track(thoughtsprout)
+                self.thoughtsprout_tracker.track(thoughtsprout, pool_key)
+
+    def orchestrate_batch(self, population):
+        # Same as orchestrate for a whole ThoughtseedPopulation, with activation, classification and energy adjustment
+        # computed as array operations. Returns the Thoughtsprouts in population order.
+        sprouts, key_codes = self.activate_batch(population)
+        thoughtsprouts = self.assign_batch(sprouts, key_codes)
+        self.track_batch(thoughtsprouts, key_codes)
+        return thoughtsprouts
+
+    def activate_batch(self, population):
+        # Activation check, pool classification and energy adjustment of a population. Activation status is written
+        # back like Thoughtseed.is_activated does. Returns the sprouts, in their own population like a Thoughtsprout
+        # owns a copy of its Thoughtseed's values, and the pool key code of every sprout.
+        activated = sigmoid(population.energy_level) > self.activation_threshold
+        population.activation_status[:] = activated
+        sprouts = population.take(np.flatnonzero(activated))
+        key_codes = self.thoughtpool_assigner.classify_array(sprouts.features['Valence'])
+        adjustments = np.array([self.energy_adjustments[pool_key] for pool_key in self.thoughtpool_assigner.pool_keys])
+        sprouts.energy_level = (sprouts.energy_level + self.energy_change) + adjustments[key_codes]
+        return sprouts, key_codes
+
+    def assign_batch(self, sprouts, key_codes):
+        # Add the sprouts returned by activate_batch to their pools and return them as Thoughtsprouts
+        thoughtsprouts = Thoughtsprout.views(sprouts, time.time())
+        pool_keys = self.thoughtpool_assigner.pool_keys
+        for thoughtsprout, key_code in zip(thoughtsprouts, key_codes.tolist()):
+            self.thoughtpool_assigner.add_sprout_to_pool(thoughtsprout, pool_keys[key_code])
+        return thoughtsprouts
+
+    def track_batch(self, thoughtsprouts, key_codes):
+        pool_keys = self.thoughtpool_assigner.pool_keys
+        for thoughtsprout, key_code in zip(thoughtsprouts, key_codes.tolist()):
+            self.thoughtsprout_tracker.track(thoughtsprout, pool_keys[key_code])
 
     def calculate_energy_level(self, base_energy, pool_key):
-        # Define energy adjustments for each pool
-        energy_adjustments = {
-            'positive': 0.1,
-            'negative': -0.1,
-            'neutral': 0,
-            'positive_saliency': 0.2,
-            'negative_saliency': -0.2
-        }
-        
         # Calculate the new energy level based on the base energy and the adjustment for the assigned pool
-        return base_energy + energy_adjustments[pool_key]
+        return base_energy + self.energy_adjustments[pool_key]
+
+class RunningStats:
+    # Streaming count, min, max, mean and sample standard deviation (Welford's algorithm) in constant memory
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def std_dev(self):
+        # Sample standard deviation, like statistics.stdev
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0
 
 class ThoughtPool:
     def __init__(self, valence):
@@ -91,6 +168,9 @@ class ThoughtPool:
             self.thoughtsprouts.pop(0)
             self.thoughtsprouts.add(sprout)
 
+    def is_full(self):
+        return len(self.thoughtsprouts) >= self.capacity
+
 class ThoughtPoolAssigner:
     def __init__(self, feature_config):
         # Fetch the mean and standard deviation of the valence from the feature configuration
@@ -106,75 +186,170 @@ class ThoughtPoolAssigner:
             'negative_saliency': [ThoughtPool('negative_saliency')]
         }
 
-    def assign_to_pool(self, sprout):
+        self.pool_keys = list(self.thought_pools)
+
+        # Min-heap of the indices of pools with free capacity for each key, so a sprout goes to the first pool with
+        # room without scanning all pools
+        self.open_pools = {pool_key: [0] for pool_key in self.thought_pools}
+
+        # Per-key statistics, maintained as sprouts are added
+        self.pool_size_totals = {pool_key: 0 for pool_key in self.thought_pools}
+        self.pool_size_squares = {pool_key: 0 for pool_key in self.thought_pools}
+        self.energy_stats = {pool_key: RunningStats() for pool_key in self.thought_pools}
+
+    def classify(self, sprout):
         # Determine the valence of the sprout
         valence = sprout.feature_values['Valence']
-        
-        # Assign the sprout to a valence pool based on its valence
-        if np.abs(valence - self.mean_valence) < self.std_dev_valence:
-            valence_key = 'neutral'
-        elif valence - self.mean_valence > self.std_dev_valence:
-            valence_key = 'positive'
-        else:
-            valence_key = 'negative'
 
         # If the sprout's valence is more than 2 standard deviations away from the mean,
-        # assign it to a saliency pool
+        # it belongs to a saliency pool
         if np.abs(valence - self.mean_valence) > 2 * self.std_dev_valence:
-            saliency_key = 'positive_saliency' if valence - self.mean_valence > 0 else 'negative_saliency'
-            self.add_sprout_to_pool(sprout, saliency_key)
-            return saliency_key
+            return 'positive_saliency' if valence - self.mean_valence > 0 else 'negative_saliency'
+
+        # Otherwise it belongs to a valence pool based on its valence
+        if np.abs(valence - self.mean_valence) < self.std_dev_valence:
+            return 'neutral'
+        elif valence - self.mean_valence > self.std_dev_valence:
+            return 'positive'
         else:
-            # If the sprout's valence is within 2 standard deviations of the mean,
-            # assign it to a valence pool
-            self.add_sprout_to_pool(sprout, valence_key)
-            return valence_key
+            return 'negative'
 
-    def add_sprout_to_pool(self, sprout, pool_key):
-        # Add the sprout to the appropriate pool
-        for pool in self.thought_pools[pool_key]:
-            if len(pool.thoughtsprouts) < pool.capacity:
-                pool.add_sprout(sprout)
-                return
+    def classify_array(self, valence):
+        # Vectorized classify: returns, for each valence, the index of its pool key in pool_keys
+        deviation = np.asarray(valence) - self.mean_valence
+        absolute_deviation = np.abs(deviation)
+        saliency = absolute_deviation > 2 * self.std_dev_valence
+        codes = [self.pool_keys.index(pool_key) for pool_key in ('positive_saliency', 'negative_saliency', 'neutral', 'positive', 'negative')]
+        return np.select([saliency & (deviation > 0), saliency, absolute_deviation < self.std_dev_valence, deviation > self.std_dev_valence],
+                         codes[:4], codes[4])
+
+    def assign_to_pool(self, sprout):
+        # Assign the sprout to the pool matching its valence
+        pool_key = self.classify(sprout)
+        self.add_sprout_to_pool(sprout, pool_key)
+        return pool_key
 
-        new_pool = ThoughtPool(pool_key)
-        new_pool.add_sprout(sprout)
-        self.thought_pools[pool_key].append(new_pool)
+    def add_sprout_to_pool(self, sprout, pool_key):
+        # Add the sprout to the first pool with free capacity, or to a new pool if all are full
+        pools = self.thought_pools[pool_key]
+        open_pools = self.open_pools[pool_key]
+        while open_pools and pools[open_pools[0]].is_full():
+            heapq.heappop(open_pools)
+        if not open_pools:
+            pools.append(ThoughtPool(pool_key))
+            heapq.heappush(open_pools, len(pools) - 1)
+
+        pool = pools[open_pools[0]]
+        size = len(pool.thoughtsprouts)
+        pool.add_sprout(sprout)
+        if pool.is_full():
+            heapq.heappop(open_pools)
+
+        self.pool_size_totals[pool_key] += 1
+        self.pool_size_squares[pool_key] += 2 * size + 1  # (size + 1)**2 - size**2
+        self.energy_stats[pool_key].add(sprout.energy_level)
+
+    def pool_size_stats(self, pool_key):
+        # Mean and sample standard deviation of the pool sizes of a key
+        num_pools = len(self.thought_pools[pool_key])
+        total = self.pool_size_totals[pool_key]
+        mean = total / num_pools
+        if num_pools < 2:
+            return mean, 0
+        return mean, math.sqrt(max(self.pool_size_squares[pool_key] - total * mean, 0) / (num_pools - 1))
 
     def print_status(self):
         for pool_key, pools in self.thought_pools.items():
             print(f"Status for {pool_key} pools:")
             print(f"Number of pools: {len(pools)}")
-            
-            pool_sizes = [len(pool.thoughtsprouts) for pool in pools]
-            print(f"Average pool size: {sum(pool_sizes) / len(pool_sizes) if pool_sizes else 0}")
-            print(f"Pool size standard deviation: {statistics.stdev(pool_sizes) if len(pool_sizes) > 1 else 0}")
-            
-            all_thoughtsprouts = [sprout for pool in pools for sprout in pool.thoughtsprouts]
-            if all_thoughtsprouts:
-                energies = [sprout.energy_level for sprout in all_thoughtsprouts]
-                print(f"Energy stats: min={min(energies)}, max={max(energies)}, mean={sum(energies)/len(energies)}, std_dev={statistics.stdev(energies) if len(energies) > 1 else 0}")
 
-class ThoughtsproutTracker:
-    def __init__(self):
-        self.thoughtsprouts = []  # Initialize an empty list to store thoughtsprouts
-        self.timestamps = []  # Initialize an empty list to store timestamps
+            mean_size, std_dev_size = self.pool_size_stats(pool_key)
+            print(f"Average pool size: {mean_size}")
+            print(f"Pool size standard deviation: {std_dev_size}")
 
-    def track(self, thoughtsprout):
-        # Add the thoughtsprout to the list
-        self.thoughtsprouts.append(thoughtsprout)
-        # Add the activation time to the timestamps list
-        self.timestamps.append(thoughtsprout.time_activated)
+            energies = self.energy_stats[pool_key]
+            if energies.count:
+                print(f"Energy stats: min={energies.min}, max={energies.max}, mean={energies.mean}, std_dev={energies.std_dev()}")
+
+class ThoughtsproutTracker:
+    def __init__(self, capacity=None):
+        # Without a capacity every tracked Thoughtsprout is kept. With one, only the most recent capacity sprouts are
+        # kept, as compact arrays in a ring buffer, so memory stays bounded however long the simulation runs.
+        # Statistics are running aggregates either way, overall and per pool key.
+        self.capacity = capacity
+        self.count = 0  # Number of thoughtsprouts tracked so far
+        self.timestamp_stats = RunningStats()
+        self.energy_stats = RunningStats()
+        self.pool_stats = {}  # pool_key -> (timestamp RunningStats, energy RunningStats)
+        self.pool_keys = []  # Pool keys by the code stored in the ring buffer
+        self.pool_key_codes = {}
+        if capacity is None:
+            self.thoughtsprouts = []  # Initialize an empty list to store thoughtsprouts
+            self.timestamps = []  # Initialize an empty list to store timestamps
+        else:
+            if capacity < 1:
+                raise ValueError(f"Tracker capacity must be positive, got {capacity}")
+            self.thoughtsprouts = None
+            self.timestamps = None
+            self.recent_time_activated = np.empty(capacity)
+            self.recent_energy_level = np.empty(capacity)
+            self.recent_valence = np.empty(capacity)
+            self.recent_memory_pattern = np.empty(capacity, dtype=np.uint32)
+            self.recent_pool_key = np.empty(capacity, dtype=np.int16)
+
+    def track(self, thoughtsprout, pool_key=None):
+        time_activated = thoughtsprout.time_activated
+        energy_level = float(thoughtsprout.energy_level)
+        self.timestamp_stats.add(time_activated)
+        self.energy_stats.add(energy_level)
+        if pool_key is not None:
+            if pool_key not in self.pool_stats:
+                self.pool_stats[pool_key] = (RunningStats(), RunningStats())
+                self.pool_key_codes[pool_key] = len(self.pool_keys)
+                self.pool_keys.append(pool_key)
+            timestamp_stats, energy_stats = self.pool_stats[pool_key]
+            timestamp_stats.add(time_activated)
+            energy_stats.add(energy_level)
+
+        if self.capacity is None:
+            # Add the thoughtsprout to the list
+            self.thoughtsprouts.append(thoughtsprout)
+            # Add the activation time to the timestamps list
+            self.timestamps.append(time_activated)
+        else:
+            slot = self.count % self.capacity
+            self.recent_time_activated[slot] = time_activated
+            self.recent_energy_level[slot] = energy_level
+            self.recent_valence[slot] = thoughtsprout.feature_values['Valence']
+            self.recent_memory_pattern[slot] = thoughtsprout.packed_memory_pattern
+            self.recent_pool_key[slot] = -1 if pool_key is None else self.pool_key_codes[pool_key]
+        self.count += 1
+
+    def recent(self):
+        # The retained sprouts of a bounded tracker as arrays, oldest first; pool_key holds indices into pool_keys (-1
+        # for sprouts tracked without a key)
+        if self.capacity is None:
+            raise ValueError("Only a tracker with a capacity keeps a ring buffer")
+        size = min(self.count, self.capacity)
+        order = (np.arange(size) + (self.count - size)) % self.capacity
+        return {'time_activated': self.recent_time_activated[order], 'energy_level': self.recent_energy_level[order],
+                'valence': self.recent_valence[order], 'memory_pattern': self.recent_memory_pattern[order],
+                'pool_key': self.recent_pool_key[order]}
 
     def print_status(self):
-        print(f"Total thoughtsprouts tracked: {len(self.thoughtsprouts)}")
-        timestamps = [sprout.time_activated for sprout in self.thoughtsprouts]
-        print(f"Timestamp stats: min={min(timestamps)}, max={max(timestamps)}, mean={sum(timestamps)/len(timestamps)}")
+        print(f"Total thoughtsprouts tracked: {self.count}")
+        if self.count:
+            timestamps = self.timestamp_stats
+            print(f"Timestamp stats: min={timestamps.min}, max={timestamps.max}, mean={timestamps.mean}")
+        for pool_key, (timestamp_stats, energy_stats) in self.pool_stats.items():
+            print(f"{pool_key}: {energy_stats.count} thoughtsprouts, energy mean={energy_stats.mean}, std_dev={energy_stats.std_dev()}, "
+                  f"last activation={timestamp_stats.max}")
 
 class ThoughtSproutManager:
-    def __init__(self, config_filename, thoughtseed_network_filename):
+    def __init__(self, config_filename, thoughtseed_network_filename, tracker_capacity=None):
         self.config_filename = config_filename
         self.thoughtseed_network_filename = thoughtseed_network_filename
+        self.tracker_capacity = tracker_capacity  # Ring buffer size of the ThoughtsproutTracker, None to keep every sprout
         self.feature_config = None
         self.thoughtseeds = None
         self.thoughtpool_assigner = None
@@ -200,23 +375,36 @@ class ThoughtSproutManager:
         self.thoughtpool_assigner = ThoughtPoolAssigner(self.feature_config)
 
         # Create a ThoughtsproutTracker
-        self.thoughtsprout_tracker = ThoughtsproutTracker()
+        self.thoughtsprout_tracker = ThoughtsproutTracker(self.tracker_capacity)
 
         # Create a ThoughtSproutOrchestrator
         thoughtsprout_orchestrator = ThoughtSproutOrchestrator(self.thoughtpool_assigner, self.thoughtsprout_tracker)
 
-        # Orchestrate the activation of thoughtseeds and their assignment to a thoughtpool
-        thoughtsprout_orchestrator.orchestrate(self.thoughtseeds)
+        # Orchestrate the activation of thoughtseeds and their assignment to a thoughtpool, as array operations when
+        # the thoughtseeds are a columnar population
+        if isinstance(self.thoughtseeds, ThoughtseedPopulation):
+            thoughtsprout_orchestrator.orchestrate_batch(self.thoughtseeds)
+        else:
+            thoughtsprout_orchestrator.orchestrate(self.thoughtseeds)
 
     def print_status(self):
         self.thoughtpool_assigner.print_status()
         self.thoughtsprout_tracker.print_status()
 
     def run(self):
-        self.load_config_and_thoughtseeds()
-        self.orchestrate_thoughtsprouts()
-        self.print_status()
+        instrumentation = get_instrumentation()
+        with instrumentation.stage('thoughtsprout_manager') as stage:
+            with instrumentation.stage('load_config_and_thoughtseeds') as load_stage:
+                self.load_config_and_thoughtseeds()
+                load_stage.count(seeds=len(self.thoughtseeds) if self.thoughtseeds is not None else 0)
+            with instrumentation.stage('orchestrate_thoughtsprouts') as orchestrate_stage:
+                self.orchestrate_thoughtsprouts()
+                orchestrate_stage.count(sprouts=self.thoughtsprout_tracker.count,
+                                        pools=sum(len(pools) for pools in self.thoughtpool_assigner.thought_pools.values()))
+            with instrumentation.stage('print_status'):
+                self.print_status()
+            stage.count(sprouts=self.thoughtsprout_tracker.count)
 
 if __name__ == "__main__":
-    manager = ThoughtSproutManager('test_config.yaml', 'thoughtseed_network.pkl')
+    manager = ThoughtSproutManager('test_config.yaml', 'thoughtseed_network')
     manager.run()
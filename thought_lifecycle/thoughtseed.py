@@ -1,21 +1,211 @@
 import numpy as np
-from scipy.stats import truncnorm
 from collections import OrderedDict
+from collections.abc import MutableMapping, Sequence
 
 from thought_lifecycle.config import FeatureConfig
 
 def sigmoid(x):
     return 1 / (1 + np.exp(-x))
 
+def pack_memory_pattern(memory_pattern):
+    # Convert a 32-character bit string (or an integer) into its packed 32-bit value
+    if isinstance(memory_pattern, str):
+        return int(memory_pattern, 2)
+    return int(memory_pattern)
+
+# Number of set bits of every byte value, for popcounts on numpy versions without np.bitwise_count
+_BYTE_POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+def popcount(values):
+    # Number of set bits of each element of an unsigned integer array
+    values = np.asarray(values)
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values)
+    counts = _BYTE_POPCOUNT[np.ascontiguousarray(values).view(np.uint8)]
+    return counts.reshape(values.shape + (values.dtype.itemsize,)).sum(axis=-1, dtype=np.uint8)
+
+def decode_memory_patterns(memory_patterns):
+    # Vectorized Thoughtseed.decode_memory_pattern: split packed patterns into their four bytes, returned as uint8
+    # arrays (location, time_slot, activity, emotion)
+    memory_patterns = np.asarray(memory_patterns, dtype=np.uint32)
+    activity = (memory_patterns >> 24).astype(np.uint8)
+    emotion = ((memory_patterns >> 16) & 0xFF).astype(np.uint8)
+    location = ((memory_patterns >> 8) & 0xFF).astype(np.uint8)
+    time_slot = (memory_patterns & 0xFF).astype(np.uint8)
+    return location, time_slot, activity, emotion
+
+def hamming_distances(memory_patterns, cues):
+    # Number of differing bits between packed patterns and one cue (a 1-D result) or a batch of cues (one row per cue)
+    memory_patterns = np.asarray(memory_patterns, dtype=np.uint32)
+    if isinstance(cues, np.ndarray) and cues.dtype.kind in 'ui':
+        cues = cues.astype(np.uint32)
+    elif np.isscalar(cues):
+        cues = np.uint32(pack_memory_pattern(cues))
+    else:
+        cues = np.array([pack_memory_pattern(cue) for cue in cues], dtype=np.uint32)
+    if np.ndim(cues) == 0:
+        return popcount(memory_patterns ^ cues)
+    return popcount(memory_patterns[None, :] ^ cues[:, None])
+
+class ThoughtseedPopulation(Sequence):
+    # Columnar store for a population of thoughtseeds: one float array per feature plus energy, activation and packed
+    # memory pattern arrays. Indexing or iterating returns Thoughtseed views over single rows, so the population can be
+    # used wherever a list of thoughtseeds was expected.
+    def __init__(self, features, memory_pattern, energy_level=None, activation_status=None):
+        self.memory_pattern = np.asarray(memory_pattern, dtype=np.uint32)
+        size = len(self.memory_pattern)
+        self.features = OrderedDict((name, np.asarray(values, dtype=np.float64)) for name, values in features.items())
+        self.energy_level = np.full(size, 0.5) if energy_level is None else np.asarray(energy_level, dtype=np.float64)
+        self.activation_status = np.zeros(size, dtype=bool) if activation_status is None else np.asarray(activation_status, dtype=bool)
+        for name, values in self.features.items():
+            if len(values) != size:
+                raise ValueError(f"Feature '{name}' has {len(values)} values, expected {size}")
+
+    @classmethod
+    def empty(cls, feature_names):
+        # Create a population without any thoughtseeds
+        return cls(OrderedDict((name, np.empty(0)) for name in feature_names), np.empty(0, dtype=np.uint32))
+
+    @classmethod
+    def from_records(cls, feature_values, memory_patterns):
+        # Build a population from per-seed feature value mappings and memory patterns
+        feature_names = list(feature_values[0]) if feature_values else []
+        features = OrderedDict((name, [values[name] for values in feature_values]) for name in feature_names)
+        return cls(features, [pack_memory_pattern(memory_pattern) for memory_pattern in memory_patterns])
+
+    def extend(self, *others):
+        # Append the rows of other populations in place, so existing Thoughtseed views stay valid
+        populations = (self,) + others
+        for name in self.features:
+            self.features[name] = np.concatenate([population.features[name] for population in populations])
+        self.memory_pattern = np.concatenate([population.memory_pattern for population in populations])
+        self.energy_level = np.concatenate([population.energy_level for population in populations])
+        self.activation_status = np.concatenate([population.activation_status for population in populations])
+
+    def take(self, indices):
+        # Copy the selected rows into a new, independent population
+        return ThoughtseedPopulation(OrderedDict((name, values[indices]) for name, values in self.features.items()),
+                                     self.memory_pattern[indices], self.energy_level[indices], self.activation_status[indices])
+
+    def decode_memory_patterns(self):
+        # Location, time slot, activity and emotion byte arrays of the whole population
+        return decode_memory_patterns(self.memory_pattern)
+
+    def hamming_distances(self, cues):
+        # Hamming distances between every memory pattern and one cue or each of a batch of cues
+        return hamming_distances(self.memory_pattern, cues)
+
+    @property
+    def nbytes(self):
+        # Total size of the population columns in bytes
+        columns = list(self.features.values()) + [self.memory_pattern, self.energy_level, self.activation_status]
+        return sum(column.nbytes for column in columns)
+
+    def __len__(self):
+        return len(self.memory_pattern)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [Thoughtseed.view(self, i) for i in range(*index.indices(len(self)))]
+        index = int(index)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("thoughtseed index out of range")
+        return Thoughtseed.view(self, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield Thoughtseed.view(self, index)
+
+class FeatureValues(MutableMapping):
+    # Dict-like view of the feature values of one row of a ThoughtseedPopulation
+    __slots__ = ('population', 'index')
+
+    def __init__(self, population, index):
+        self.population = population
+        self.index = index
+
+    def __getitem__(self, feature):
+        return self.population.features[feature][self.index]
+
+    def __setitem__(self, feature, value):
+        self.population.features[feature][self.index] = value
+
+    def __delitem__(self, feature):
+        raise TypeError("Features cannot be removed from a single thoughtseed")
+
+    def __iter__(self):
+        return iter(self.population.features)
+
+    def __len__(self):
+        return len(self.population.features)
+
+    def __repr__(self):
+        return repr({feature: float(value) for feature, value in self.items()})
+
 class Thoughtseed:
     # Thoughtseed is a memory construct. Using the axiom, "A thought is a thing, and thoughtseed is the seed of thought."
     # It can represent a single neuronal population or multile neuronal poulations in the memory network. We only have  aminimalist version here.
+    # The state of a thoughtseed lives in one row of a ThoughtseedPopulation; the object itself is only a view of that row.
+    __slots__ = ('population', 'index')
+
     def __init__(self, feature_values, memory_pattern):
         # Initialize Thoughtseed with feature values, memory pattern, energy level, and activation status
-        self.feature_values = feature_values
-        self.memory_pattern = memory_pattern
-        self.energy_level = 0.5
-        self.activation_status = False
+        self.population = ThoughtseedPopulation.from_records([feature_values], [memory_pattern])
+        self.index = 0
+
+    @classmethod
+    def view(cls, population, index):
+        # Create a Thoughtseed backed by an existing population row without copying any data
+        thoughtseed = cls.__new__(cls)
+        thoughtseed.population = population
+        thoughtseed.index = index
+        return thoughtseed
+
+    def __setstate__(self, state):
+        # Pickles written before thoughtseeds became population views hold the attributes in a dict; such a thoughtseed
+        # gets a one-row population of its own, like a newly created one. Current pickles hold the slots.
+        if isinstance(state, dict):
+            self.population = ThoughtseedPopulation.from_records([state['feature_values']], [state['memory_pattern']])
+            self.index = 0
+            self.energy_level = state['energy_level']
+            self.activation_status = state['activation_status']
+            return
+        for name, value in state[1].items():
+            setattr(self, name, value)
+
+    @property
+    def feature_values(self):
+        return FeatureValues(self.population, self.index)
+
+    @property
+    def memory_pattern(self):
+        return format(int(self.population.memory_pattern[self.index]), '032b')
+
+    @memory_pattern.setter
+    def memory_pattern(self, memory_pattern):
+        self.population.memory_pattern[self.index] = pack_memory_pattern(memory_pattern)
+
+    @property
+    def packed_memory_pattern(self):
+        return int(self.population.memory_pattern[self.index])
+
+    @property
+    def energy_level(self):
+        return self.population.energy_level[self.index]
+
+    @energy_level.setter
+    def energy_level(self, energy_level):
+        self.population.energy_level[self.index] = energy_level
+
+    @property
+    def activation_status(self):
+        return self.population.activation_status[self.index]
+
+    @activation_status.setter
+    def activation_status(self, activation_status):
+        self.population.activation_status[self.index] = activation_status
 
     def receive_synapse(self, energy_input):
         # Increase energy level and check activation status.
@@ -27,9 +217,9 @@ class Thoughtseed:
         self.activation_status = sigmoid(self.energy_level) > threshold
         return self.activation_status
 
-    def calculate_firing_cost(self, thoughtseed, feature_config):
-        # Calculate cost of firing a thoughtseed
-        noise = np.random.normal(0, 0.1)
+    def calculate_firing_cost(self, thoughtseed, feature_config, rng=None):
+        # Calculate cost of firing a thoughtseed, with noise from rng (the global numpy random state if not given)
+        noise = (np.random if rng is None else rng).normal(0, 0.1)
         complexity_weight = feature_config.features['Complexity'].weight
         manifestation_strength_weight = feature_config.features['Manifestation Strength'].weight
         activation_energy = thoughtseed.feature_values['Activation Threshold']
@@ -39,55 +229,154 @@ class Thoughtseed:
 
     def decode_memory_pattern(self):
         # Interpret memory pattern into four 8-bit segments
-        activity = int(self.memory_pattern[:8], 2)
-        emotion = int(self.memory_pattern[8:16], 2)
-        location = int(self.memory_pattern[16:24], 2)
-        time_slot = int(self.memory_pattern[24:], 2)
+        memory_pattern = self.packed_memory_pattern
+        activity = memory_pattern >> 24
+        emotion = (memory_pattern >> 16) & 0xFF
+        location = (memory_pattern >> 8) & 0xFF
+        time_slot = memory_pattern & 0xFF
         return location, time_slot, activity, emotion
 
+    def hamming_distance(self, other):
+        # Number of differing bits between this memory pattern and another thoughtseed's or a pattern
+        other = other.packed_memory_pattern if isinstance(other, Thoughtseed) else pack_memory_pattern(other)
+        return bin(self.packed_memory_pattern ^ other).count('1')
+
+def _generate_shard(task):
+    # Process pool task: one shard of a batch generation
+    generator, num_thoughtseeds, rng = task
+    return generator.generate_shard(num_thoughtseeds, rng)
+
 class ThoughtseedGenerator:
-    def __init__(self, thoughtseed_network_config):
-        # Initialize generator with number of thoughtseeds and feature configuration
+    def __init__(self, thoughtseed_network_config, rng=None):
+        # Initialize generator with number of thoughtseeds and feature configuration. All random draws come from rng,
+        # a np.random.Generator, which defaults to one seeded with the configured seed.
         self.num_thoughtseeds = thoughtseed_network_config.num_thoughtseeds
         self.feature_config = thoughtseed_network_config.feature_config
+        self.generation_mode = thoughtseed_network_config.generation_mode
+        self.shard_size = thoughtseed_network_config.generation_shard_size
+        self.build_processes = thoughtseed_network_config.build_processes
+        self.rng = rng if rng is not None else np.random.default_rng(thoughtseed_network_config.seed)
 
     def generate_feature_values(self):
         # Generate feature values based on their distributions
         feature_values = OrderedDict()
         for feature, config in self.feature_config.features.items():
             if config.distribution == 'normal':
-                value = np.random.normal(config.parameters['mu'], config.parameters['sigma'])
+                value = self.rng.normal(config.parameters['mu'], config.parameters['sigma'])
             elif config.distribution == 'beta':
-                value = np.random.beta(config.parameters['alpha'], config.parameters['beta'])
+                value = self.rng.beta(config.parameters['alpha'], config.parameters['beta'])
             elif config.distribution == 'truncated_normal':
+                from scipy.stats import truncnorm  # scipy.stats is slow to import and only needed to generate
                 value = truncnorm.rvs((config.parameters['low'] - config.parameters['mu']) / config.parameters['sigma'], 
                                     (config.parameters['up'] - config.parameters['mu']) / config.parameters['sigma'], 
-                                    loc=config.parameters['mu'], scale=config.parameters['sigma'])
+                                    loc=config.parameters['mu'], scale=config.parameters['sigma'], random_state=self.rng)
             feature_values[feature] = np.round(value, 4)
         return feature_values
 
     def generate_memory_pattern(self, feature_values):
-        # Generate random 8-bit segments for memory pattern
-        memory_pattern = ''         
-        normalized_value = int(255 * feature_values['Complexity'])
-        memory_pattern += format(normalized_value, '08b')
-        normalized_value = int(255 * feature_values['Valence'])
-        memory_pattern += format(normalized_value, '08b')
-        memory_pattern += format(np.random.randint(0, 256), '08b')
-        memory_pattern += format(np.random.randint(0, 256), '08b')
-        return memory_pattern
-
-    def generate_thoughtseeds(self):
-        # Generate thoughtseeds and calculate their energy levels
-        thoughtseeds = []
-        for _ in range(self.num_thoughtseeds):
+        # Generate the packed memory pattern: Complexity and Valence bytes followed by two random 8-bit segments
+        complexity_byte = min(max(int(255 * feature_values['Complexity']), 0), 255)
+        valence_byte = min(max(int(255 * feature_values['Valence']), 0), 255)
+        random_bytes = self.rng.integers(0, 256, size=2)
+        return (complexity_byte << 24) | (valence_byte << 16) | (int(random_bytes[0]) << 8) | int(random_bytes[1])
+
+    def generate_feature_arrays(self, num_thoughtseeds, rng=None):
+        # Generate the values of each feature for the whole population with a single vectorized draw per feature
+        rng = self.rng if rng is None else rng
+        feature_arrays = OrderedDict()
+        for feature, config in self.feature_config.features.items():
+            if config.distribution == 'normal':
+                values = rng.normal(config.parameters['mu'], config.parameters['sigma'], size=num_thoughtseeds)
+            elif config.distribution == 'beta':
+                values = rng.beta(config.parameters['alpha'], config.parameters['beta'], size=num_thoughtseeds)
+            elif config.distribution == 'truncated_normal':
+                from scipy.stats import truncnorm
+                values = truncnorm.rvs((config.parameters['low'] - config.parameters['mu']) / config.parameters['sigma'],
+                                       (config.parameters['up'] - config.parameters['mu']) / config.parameters['sigma'],
+                                       loc=config.parameters['mu'], scale=config.parameters['sigma'], size=num_thoughtseeds, random_state=rng)
+            else:
+                raise ValueError(f"Unknown distribution '{config.distribution}' for feature '{feature}'")
+            feature_arrays[feature] = np.round(values, 4)
+        return feature_arrays
+
+    def generate_memory_patterns(self, feature_arrays, rng=None):
+        # Build all packed memory patterns at once: Complexity and Valence bytes followed by two random bytes.
+        # Bytes are clipped to 0..255 so features drawn outside [0, 1] still give a valid 8-bit segment.
+        num_thoughtseeds = len(feature_arrays['Complexity'])
+        complexity_byte = np.clip((255 * feature_arrays['Complexity']).astype(np.int64), 0, 255)
+        valence_byte = np.clip((255 * feature_arrays['Valence']).astype(np.int64), 0, 255)
+        random_bytes = (self.rng if rng is None else rng).integers(0, 256, size=(2, num_thoughtseeds))
+        packed = (complexity_byte << 24) | (valence_byte << 16) | (random_bytes[0] << 8) | random_bytes[1]
+        return packed.astype(np.uint32)
+
+    def calculate_firing_costs(self, feature_arrays, rng=None):
+        # Vectorized Thoughtseed.calculate_firing_cost over the whole population
+        complexity = feature_arrays['Complexity']
+        noise = (self.rng if rng is None else rng).normal(0, 0.1, size=len(complexity))
+        complexity_weight = self.feature_config.features['Complexity'].weight
+        manifestation_strength_weight = self.feature_config.features['Manifestation Strength'].weight
+        activation_energy = feature_arrays['Activation Threshold']
+        complexity_factor = 1 + complexity
+        return complexity_factor * activation_energy * np.exp(complexity_weight * complexity + manifestation_strength_weight * feature_arrays['Manifestation Strength']) + noise
+
+    def generate_shard(self, num_thoughtseeds, rng):
+        # Generate a population column by column from one random stream
+        feature_arrays = self.generate_feature_arrays(num_thoughtseeds, rng)
+        population = ThoughtseedPopulation(feature_arrays, self.generate_memory_patterns(feature_arrays, rng))
+        population.energy_level += self.calculate_firing_costs(feature_arrays, rng)
+        return population
+
+    def shard_sizes(self, num_thoughtseeds=None):
+        num_thoughtseeds = self.num_thoughtseeds if num_thoughtseeds is None else num_thoughtseeds
+        return [min(self.shard_size, num_thoughtseeds - start) for start in range(0, max(num_thoughtseeds, 1), self.shard_size)]
+
+    def iter_shards(self, num_thoughtseeds=None):
+        # Generate the population one shard at a time. Each shard's child stream is spawned just before it is drawn,
+        # which gives the same streams as spawning them all at once, so the shards concatenate to exactly the
+        # population generate_thoughtseeds_batch returns while only one shard is held here at a time.
+        for shard_size in self.shard_sizes(num_thoughtseeds):
+            yield self.generate_shard(shard_size, self.rng.spawn(1)[0])
+
+    def generate_thoughtseeds_batch(self, num_thoughtseeds=None):
+        # Generate the whole population column by column instead of sampling thoughtseeds one at a time. The population
+        # is split into fixed-size shards, each drawn from its own child stream of self.rng, so generating the shards
+        # serially or on build_processes worker processes gives identical thoughtseeds.
+        shard_sizes = self.shard_sizes(num_thoughtseeds)
+        tasks = [(self, shard_size, rng) for shard_size, rng in zip(shard_sizes, self.rng.spawn(len(shard_sizes)))]
+        try:
+            if self.build_processes > 1 and len(tasks) > 1:
+                from concurrent.futures import ProcessPoolExecutor
+                with ProcessPoolExecutor(max_workers=min(self.build_processes, len(tasks))) as executor:
+                    shards = list(executor.map(_generate_shard, tasks))
+            else:
+                shards = [_generate_shard(task) for task in tasks]
+        except ValueError as e:
+            print(f"Failed to generate thoughtseeds: {e}")
+            return ThoughtseedPopulation.empty(self.feature_config.features)
+        population = shards[0]
+        population.extend(*shards[1:])
+        return population
+
+    def generate_thoughtseeds(self, num_thoughtseeds=None):
+        # Generate thoughtseeds (the configured number unless num_thoughtseeds is given) and calculate their energy levels
+        if self.generation_mode == 'batch':
+            return self.generate_thoughtseeds_batch(num_thoughtseeds)
+        elif self.generation_mode != 'sequential':
+            raise ValueError(f"Unknown generation mode: {self.generation_mode}")
+
+        all_feature_values = []
+        memory_patterns = []
+        for _ in range(self.num_thoughtseeds if num_thoughtseeds is None else num_thoughtseeds):
             try:
                 feature_values = self.generate_feature_values()
                 memory_pattern = self.generate_memory_pattern(feature_values)
-                thoughtseed = Thoughtseed(feature_values, memory_pattern)
-                thoughtseeds.append(thoughtseed)
+                all_feature_values.append(feature_values)
+                memory_patterns.append(memory_pattern)
             except ValueError as e:
                 print(f"Failed to generate thoughtseed: {e}")
+        if not all_feature_values:
+            return ThoughtseedPopulation.empty(self.feature_config.features)
+        thoughtseeds = ThoughtseedPopulation.from_records(all_feature_values, memory_patterns)
         for thoughtseed in thoughtseeds:
-            thoughtseed.energy_level += thoughtseed.calculate_firing_cost(thoughtseed, self.feature_config)
+            thoughtseed.energy_level += thoughtseed.calculate_firing_cost(thoughtseed, self.feature_config, self.rng)
         return thoughtseeds
\ No newline at end of file
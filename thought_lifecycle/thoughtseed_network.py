@@ -4,23 +4,101 @@ import math
 import random
 import pickle
 
-from thought_lifecycle.thoughtseed import ThoughtseedGenerator
+from thought_lifecycle.thoughtseed import ThoughtseedGenerator, ThoughtseedPopulation
 from thought_lifecycle.config import FeatureConfig, ThoughtseedNetworkConfig
+from thought_lifecycle.edge_list import EdgeList
+from thought_lifecycle.graph_backend import CSRGraph, create_graph
+from thought_lifecycle.instrumentation import get_instrumentation
+from thought_lifecycle.network_store import is_store, load_network, save_network
+
+def compute_edge_weights(valence1, valence2, complexity1, complexity2, mean_valence, std_dev_valence):
+    # Vectorized form of ThoughtseedNetwork.assign_edge_weights for arrays of thoughtseed pairs
+    deviation1 = valence1 - mean_valence
+    deviation2 = valence2 - mean_valence
+    diff_from_mean1 = np.abs(deviation1)
+    diff_from_mean2 = np.abs(deviation2)
+    same_side = deviation1 * deviation2 > 0
+
+    beyond_one_std1 = diff_from_mean1 > std_dev_valence
+    beyond_one_std2 = diff_from_mean2 > std_dev_valence
+    beyond_two_std1 = diff_from_mean1 > 2 * std_dev_valence
+    beyond_two_std2 = diff_from_mean2 > 2 * std_dev_valence
+
+    # Apply the valence bands from the lowest to the highest precedence so that later bands overwrite earlier ones
+    valence_weight = np.where(beyond_one_std1 | beyond_one_std2, 5, 1)
+    one_salient = (beyond_two_std1 & beyond_one_std2) | (beyond_two_std2 & beyond_one_std1)
+    valence_weight = np.where(one_salient, np.where(same_side, 12, 1), valence_weight)
+    valence_weight = np.where(beyond_two_std1 & beyond_two_std2, np.where(same_side, 16, 0), valence_weight)
+
+    complexity_weight = np.maximum(complexity1, complexity2) ** 2
+    return valence_weight, complexity_weight
+
+def normalize_edge_weights(valence_weights, complexity_weights, weight_extremes, valence_mix=0.7, complexity_mix=0.3):
+    # Min-max normalize arrays of valence and complexity weights and combine them with the valence and complexity mix
+    min_valence_weight, max_valence_weight = weight_extremes['valence_weight']
+    min_complexity_weight, max_complexity_weight = weight_extremes['complexity_weight']
+    normalized_valence_weight = ((valence_weights - min_valence_weight) / (max_valence_weight - min_valence_weight)) if max_valence_weight != min_valence_weight else np.zeros(np.shape(valence_weights))
+    normalized_complexity_weight = ((complexity_weights - min_complexity_weight) / (max_complexity_weight - min_complexity_weight)) if max_complexity_weight != min_complexity_weight else np.zeros(np.shape(complexity_weights))
+    return valence_mix * normalized_valence_weight + complexity_mix * normalized_complexity_weight
+
+def iter_upper_triangle_blocks(valence, complexity, mean_valence, std_dev_valence, edge_block_size, row_start=0, row_stop=None):
+    # Edges (sources, targets, valence_weights, complexity_weights) of the upper triangle of the pair matrix whose source
+    # is in rows row_start..row_stop-1, in row blocks of at most edge_block_size pairs
+    num_thoughtseeds = len(valence)
+    row_stop = num_thoughtseeds - 1 if row_stop is None else min(row_stop, num_thoughtseeds - 1)
+    rows_per_block = max(1, edge_block_size // max(num_thoughtseeds, 1))
+    for start in range(row_start, row_stop, rows_per_block):
+        rows = np.arange(start, min(start + rows_per_block, row_stop))
+        columns = np.arange(start + 1, num_thoughtseeds)
+        row_index, column_index = np.nonzero(rows[:, None] < columns[None, :])
+        sources = rows[row_index]
+        targets = columns[column_index]
+        valence_weights, complexity_weights = compute_edge_weights(valence[sources], valence[targets], complexity[sources], complexity[targets],
+                                                                   mean_valence, std_dev_valence)
+        yield sources, targets, valence_weights, complexity_weights
 
 # Intialize the Thoughtseed Network to store and manage thoughtseeds
 class ThoughtseedNetwork:
-    def __init__(self, config):
+    def __init__(self, config, rng=None):
         self.config = config
-        self.graph = nx.Graph()
-        self.thoughtseeds = []
+        # Random stream of everything the network generates, seeded from the configuration unless given
+        self.rng = rng if rng is not None else np.random.default_rng(config.seed)
+        self.graph = create_graph(config.graph_backend)
+        self.thoughtseeds = ThoughtseedPopulation.empty(config.feature_config.features)
+        self.weight_extremes = None
+        self.edges = EdgeList()
+        # Mix used by the last normalization, and whether existing edge weights are out of date because the weight
+        # extremes changed while the network grew or shrank
+        self.weight_mix = (config.valence_mix, config.complexity_mix)
+        self.weights_stale = False
+        # Bumped whenever edges or edge weights change, so analytics can tell when their cached matrices are out of date
+        self.edge_version = 0
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__dict__.setdefault('edge_version', 0)
+        if isinstance(self.thoughtseeds, list):
+            # Pickled before the columnar population: gather the thoughtseeds (each unpickled into a one-row
+            # population) into one population and collect the edge arrays from the graph
+            populations = [thoughtseed.population for thoughtseed in self.thoughtseeds]
+            self.thoughtseeds = populations[0] if populations else ThoughtseedPopulation.empty(self.config.feature_config.features)
+            self.thoughtseeds.extend(*populations[1:])
+            self.rng = np.random.default_rng(self.config.seed)
+            self.weight_extremes = None
+            self.edges = EdgeList.from_graph(self.graph)
+            self.weight_mix = (self.config.valence_mix, self.config.complexity_mix)
+            self.weights_stale = False
 
     def generate_thoughtseeds(self):
         # Generate thoughtseeds based on the network configuration, containing the thoughtseed number and feature configurations of thoughtseed 
-        generator = ThoughtseedGenerator(self.config)
+        generator = ThoughtseedGenerator(self.config, self.rng)
         self.thoughtseeds = generator.generate_thoughtseeds()
 
     def add_nodes_to_graph(self):
-        # Add each thoughtseed as a node to the graph
+        # Add each thoughtseed as a node to the graph. Node attributes are views over the population columns, not copies.
+        if isinstance(self.graph, CSRGraph):
+            self.graph.add_nodes(len(self.thoughtseeds), self.thoughtseeds)
+            return
         for i, thoughtseed in enumerate(self.thoughtseeds):
             self.graph.add_node(i, feature_values=thoughtseed.feature_values, memory_pattern=thoughtseed.memory_pattern)
 
@@ -54,41 +132,343 @@ class ThoughtseedNetwork:
 
         return valence_weight, complexity_weight
 
+    def valence_bands(self):
+        # Label each thoughtseed with its valence band: 0 within one standard deviation of the mean valence, +-1 within
+        # two and +-2 beyond two, signed by the side of the mean. The valence weight of an edge only depends on the bands
+        # of its two endpoints.
+        valence = self.thoughtseeds.features['Valence']
+        mean_valence = self.config.feature_config.features['Valence'].parameters['mu']
+        std_dev_valence = self.config.feature_config.features['Valence'].parameters['sigma']
+        deviation = valence - mean_valence
+        return (np.where(np.abs(deviation) > 2 * std_dev_valence, 2, np.where(np.abs(deviation) > std_dev_valence, 1, 0)) * np.sign(deviation)).astype(np.int8)
+
+    def compute_weight_extremes(self):
+        # Compute the minimum and maximum valence and complexity weights over all thoughtseed pairs in O(n), without
+        # enumerating the pairs. Valence weights are evaluated on one representative thoughtseed per valence band, and
+        # the complexity weight max(c1, c2)**2 over the pair maxima: every complexity except one copy of the smallest.
+        valence = self.thoughtseeds.features['Valence']
+        complexity = self.thoughtseeds.features['Complexity']
+        if len(valence) < 2:
+            return {'valence_weight': (0, 0), 'complexity_weight': (0, 0)}
+        mean_valence = self.config.feature_config.features['Valence'].parameters['mu']
+        std_dev_valence = self.config.feature_config.features['Valence'].parameters['sigma']
+
+        bands, representatives, counts = np.unique(self.valence_bands(), return_index=True, return_counts=True)
+        representative_valence = valence[representatives]
+        valence_weights, _ = compute_edge_weights(representative_valence[:, None], representative_valence[None, :],
+                                                  np.zeros((len(bands), 1)), np.zeros((1, len(bands))), mean_valence, std_dev_valence)
+        realized_pairs = ~np.eye(len(bands), dtype=bool) | (counts >= 2)[:, None]
+        realized_valence_weights = valence_weights[realized_pairs]
+
+        # The square is not monotonic for negative complexities (e.g. a normal distribution), so take the extremes of the
+        # squared pair maxima rather than squaring their extremes. Squared as arrays, like compute_edge_weights, so the
+        # extremes match the edge weights bit for bit.
+        pair_maxima = np.delete(complexity, np.argmin(complexity))
+        complexity_weights = np.asarray(pair_maxima, dtype=np.float64) ** 2
+        min_complexity_weight, max_complexity_weight = complexity_weights.min(), complexity_weights.max()
+        return {
+            'valence_weight': (int(realized_valence_weights.min()), int(realized_valence_weights.max())),
+            'complexity_weight': (float(min_complexity_weight), float(max_complexity_weight)),
+        }
+
+    def iter_edge_blocks(self):
+        # Yield the edges of the upper triangle of the pair matrix as (sources, targets, valence_weights, complexity_weights)
+        # arrays. Rows are processed in blocks so that no tile holds more than edge_block_size pairs.
+        return iter_upper_triangle_blocks(self.thoughtseeds.features['Valence'], self.thoughtseeds.features['Complexity'],
+                                          self.config.feature_config.features['Valence'].parameters['mu'],
+                                          self.config.feature_config.features['Valence'].parameters['sigma'], self.config.edge_block_size)
+
+    def iter_new_edge_blocks(self, first_new):
+        # Yield the edges between the thoughtseeds from first_new onwards and all thoughtseeds before them, in blocks of
+        # at most edge_block_size pairs. Sources are always smaller than targets, like in iter_edge_blocks.
+        num_thoughtseeds = len(self.thoughtseeds)
+        valence = self.thoughtseeds.features['Valence']
+        complexity = self.thoughtseeds.features['Complexity']
+        mean_valence = self.config.feature_config.features['Valence'].parameters['mu']
+        std_dev_valence = self.config.feature_config.features['Valence'].parameters['sigma']
+
+        rows_per_block = max(1, self.config.edge_block_size // max(num_thoughtseeds, 1))
+        for start in range(first_new, num_thoughtseeds, rows_per_block):
+            rows = np.arange(start, min(start + rows_per_block, num_thoughtseeds))
+            columns = np.arange(rows[-1])
+            row_index, column_index = np.nonzero(columns[None, :] < rows[:, None])
+            sources = columns[column_index]
+            targets = rows[row_index]
+            valence_weights, complexity_weights = compute_edge_weights(valence[sources], valence[targets], complexity[sources], complexity[targets],
+                                                                       mean_valence, std_dev_valence)
+            yield sources, targets, valence_weights, complexity_weights
+
+    def iter_threshold_edge_blocks(self, edge_blocks=None):
+        # Yield only the edges whose normalized weight is above edge_threshold, one block of the upper triangle (or of
+        # the given edge blocks) at a time
+        for sources, targets, valence_weights, complexity_weights in (self.iter_edge_blocks() if edge_blocks is None else edge_blocks):
+            keep = normalize_edge_weights(valence_weights, complexity_weights, self.weight_extremes, self.config.valence_mix, self.config.complexity_mix) > self.config.edge_threshold
+            yield sources[keep], targets[keep], valence_weights[keep], complexity_weights[keep]
+
+    def select_knn_edges(self, rows=None):
+        # Keep the edge_k heaviest edges (by normalized weight) of every thoughtseed. Within a valence band the weight of
+        # an edge only grows with the complexity of the other endpoint, so the heaviest edges of any thoughtseed always
+        # lead to the k+1 most complex members of some band. Scoring every thoughtseed against those few candidates gives
+        # the exact top-k (up to ties) in O(n*k) time and memory. That monotonicity needs non-negative complexities; with
+        # negative ones every pair is scored, in O(n**2) time. rows restricts the selection to some thoughtseeds.
+        num_thoughtseeds = len(self.thoughtseeds)
+        rows = np.arange(num_thoughtseeds) if rows is None else np.asarray(rows)
+        valence = self.thoughtseeds.features['Valence']
+        complexity = self.thoughtseeds.features['Complexity']
+        mean_valence = self.config.feature_config.features['Valence'].parameters['mu']
+        std_dev_valence = self.config.feature_config.features['Valence'].parameters['sigma']
+        k = min(self.config.edge_k, num_thoughtseeds - 1)
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+        if complexity.min() < 0:
+            # The complexity weight max(c1, c2)**2 is then no longer monotonic in the other endpoint's complexity, so
+            # every thoughtseed is a candidate and the selection falls back to scoring all pairs, block by block
+            candidates = np.arange(num_thoughtseeds)
+        else:
+            bands = self.valence_bands()
+            candidates = []
+            for band in np.unique(bands):
+                members = np.flatnonzero(bands == band)
+                candidates.append(members[np.argsort(-complexity[members], kind='stable')[:k + 1]])
+            candidates = np.concatenate(candidates)
+
+        rows_per_block = max(1, self.config.edge_block_size // len(candidates))
+        all_sources, all_targets = [], []
+        for start in range(0, len(rows), rows_per_block):
+            block_rows = rows[start:start + rows_per_block]
+            valence_weights, complexity_weights = compute_edge_weights(valence[block_rows, None], valence[None, candidates], complexity[block_rows, None], complexity[None, candidates],
+                                                                       mean_valence, std_dev_valence)
+            weights = normalize_edge_weights(valence_weights, complexity_weights, self.weight_extremes, self.config.valence_mix, self.config.complexity_mix)
+            weights[block_rows[:, None] == candidates[None, :]] = -np.inf  # Exclude self-loops
+            heaviest = np.argpartition(weights, -k, axis=1)[:, -k:]
+            all_sources.append(np.repeat(block_rows, k))
+            all_targets.append(candidates[heaviest].ravel())
+
+        # An edge selected by both of its endpoints must only be added once
+        sources = np.concatenate(all_sources)
+        targets = np.concatenate(all_targets)
+        edge_keys = np.unique(np.minimum(sources, targets) * num_thoughtseeds + np.maximum(sources, targets))
+        return edge_keys // num_thoughtseeds, edge_keys % num_thoughtseeds
+
+    def iter_knn_edge_blocks(self, rows=None):
+        # Yield the k-nearest edges (of the given rows only, if any) in blocks of at most edge_block_size edges
+        sources, targets = self.select_knn_edges(rows)
+        valence = self.thoughtseeds.features['Valence']
+        complexity = self.thoughtseeds.features['Complexity']
+        mean_valence = self.config.feature_config.features['Valence'].parameters['mu']
+        std_dev_valence = self.config.feature_config.features['Valence'].parameters['sigma']
+        for start in range(0, len(sources), self.config.edge_block_size):
+            block_sources = sources[start:start + self.config.edge_block_size]
+            block_targets = targets[start:start + self.config.edge_block_size]
+            valence_weights, complexity_weights = compute_edge_weights(valence[block_sources], valence[block_targets], complexity[block_sources], complexity[block_targets],
+                                                                       mean_valence, std_dev_valence)
+            yield block_sources, block_targets, valence_weights, complexity_weights
+
+    def iter_mode_edge_blocks(self, first_new=None):
+        # Edge blocks of the configured edge mode, either for the whole network or only for the edges of the
+        # thoughtseeds from first_new onwards
+        if self.config.edge_mode == 'complete':
+            return self.iter_edge_blocks() if first_new is None else self.iter_new_edge_blocks(first_new)
+        elif self.config.edge_mode == 'knn':
+            return self.iter_knn_edge_blocks(None if first_new is None else np.arange(first_new, len(self.thoughtseeds)))
+        elif self.config.edge_mode == 'threshold':
+            return self.iter_threshold_edge_blocks(None if first_new is None else self.iter_new_edge_blocks(first_new))
+        else:
+            raise ValueError(f"Unknown edge mode: {self.config.edge_mode}")
+
+    def store_edge_block(self, sources, targets, valence_weights, complexity_weights, weights=None):
+        # Record a block of edges in the edge arrays and, for the networkx backend, in the graph
+        self.edges.append(sources, targets, valence_weights, complexity_weights, weights)
+        self.edge_version += 1
+        if isinstance(self.graph, CSRGraph):
+            return
+        # Add a block of edges between the thoughtseeds to the graph, with the calculated weights as edge attributes
+        if weights is None:
+            self.graph.add_edges_from((i, j, {'valence_weight': valence_weight, 'complexity_weight': complexity_weight})
+                                      for i, j, valence_weight, complexity_weight in zip(sources.tolist(), targets.tolist(),
+                                                                                         valence_weights.tolist(), complexity_weights.tolist()))
+        else:
+            self.graph.add_edges_from((i, j, {'valence_weight': valence_weight, 'complexity_weight': complexity_weight, 'weight': weight})
+                                      for i, j, valence_weight, complexity_weight, weight in zip(sources.tolist(), targets.tolist(), valence_weights.tolist(),
+                                                                                                 complexity_weights.tolist(), weights.tolist()))
+
+    def builds_in_parallel(self, num_items):
+        # Whether work over num_items pairs or edges goes to build_processes worker processes: only when there is more
+        # than one block of it, since starting the workers and copying through shared memory costs more than a block
+        return getattr(self.config, 'build_processes', 1) > 1 and num_items > self.config.edge_block_size
+
     def add_edges_to_graph(self):
-        for i in range(len(self.thoughtseeds)):
-            for j in range(i+1, len(self.thoughtseeds)):
-                # Calculate the edge weights based on the thoughtseeds' features
-                valence_weight, complexity_weight = self.assign_edge_weights(self.thoughtseeds[i], self.thoughtseeds[j])
-                # Add an edge between the thoughtseeds to the graph, with the calculated weights as edge attributes
-                self.graph.add_edge(i, j, valence_weight=valence_weight, complexity_weight=complexity_weight)
-
-    def normalize_weights(self):
-        # Get the maximum and minimum weights for normalization
-        max_valence_weight = max((data['valence_weight'] for u, v, data in self.graph.edges(data=True)), default=0)
-        min_valence_weight = min((data['valence_weight'] for u, v, data in self.graph.edges(data=True)), default=0)
-        max_complexity_weight = max((data['complexity_weight'] for u, v, data in self.graph.edges(data=True)), default=0)
-        min_complexity_weight = min((data['complexity_weight'] for u, v, data in self.graph.edges(data=True)), default=0)
-
-        # Normalize the weights and combine them with the given weights for complexity:0.3 and valence:0.7
-        for u, v, data in self.graph.edges(data=True):
-            normalized_valence_weight = ((data['valence_weight'] - min_valence_weight) / (max_valence_weight - min_valence_weight)) if max_valence_weight != min_valence_weight else 0
-            normalized_complexity_weight = ((data['complexity_weight'] - min_complexity_weight) / (max_complexity_weight - min_complexity_weight)) if max_complexity_weight != min_complexity_weight else 0
-            data['weight'] = 0.7 * normalized_valence_weight + 0.3 * normalized_complexity_weight
+        # Global weight extremes are needed up front to select edges by normalized weight in the sparse modes
+        self.weight_extremes = self.compute_weight_extremes()
+        if self.builds_in_parallel(len(self.thoughtseeds) * (len(self.thoughtseeds) - 1) // 2) and self.config.edge_mode in ('complete', 'threshold'):
+            # Tiles of the pair matrix are built on worker processes; the k-nearest selection is already O(n*k)
+            from thought_lifecycle.parallel_build import iter_parallel_edge_blocks
+            edge_blocks = iter_parallel_edge_blocks(self, self.config.build_processes)
+        else:
+            edge_blocks = self.iter_mode_edge_blocks()
+
+        # The compact backend stores the edge arrays themselves
+        self.edges = EdgeList(np.float32 if isinstance(self.graph, CSRGraph) else np.float64)
+        self.edge_version += 1
+        for sources, targets, valence_weights, complexity_weights in edge_blocks:
+            self.store_edge_block(sources, targets, valence_weights, complexity_weights)
+        if isinstance(self.graph, CSRGraph):
+            self.graph.set_edges(self.edges)
+
+    def normalize_weights(self, valence_mix=None, complexity_mix=None):
+        # Normalize the valence and complexity weights of every edge in one pass over the edge arrays and write the
+        # combined weight back to the graph in bulk. The mix defaults to the configured valence_mix and complexity_mix,
+        # so an existing network can be re-weighted by calling this again with a different mix.
+        if len(self.edges) != self.graph.number_of_edges():
+            # Edges were added to the graph directly, collect them once
+            self.edges = EdgeList.from_graph(self.graph)
+
+        weight_extremes = self.select_weight_extremes()
+        self.weight_mix = (self.config.valence_mix if valence_mix is None else valence_mix,
+                           self.config.complexity_mix if complexity_mix is None else complexity_mix)
+        if self.builds_in_parallel(len(self.edges)):
+            from thought_lifecycle.parallel_build import normalize_parallel
+            weights = normalize_parallel(self.edges.valence_weight, self.edges.complexity_weight, weight_extremes, self.weight_mix, self.config.build_processes)
+        else:
+            weights = normalize_edge_weights(self.edges.valence_weight, self.edges.complexity_weight, weight_extremes, *self.weight_mix)
+        self.edges.set_column('weight', weights)
+        self.weights_stale = False
+        self.edge_version += 1
+        if isinstance(self.graph, CSRGraph):
+            self.graph.invalidate()
+        else:
+            self.graph.add_weighted_edges_from(zip(self.edges.source.tolist(), self.edges.target.tolist(), weights.tolist()))
+
+    def select_weight_extremes(self, *new_edges):
+        # Extremes the edge weights are normalized against, over the stored edges and any edge lists about to be stored.
+        # Sparse networks are normalized against the extremes over all thoughtseed pairs, which add_edges_to_graph
+        # records, rather than over the edges that were kept. Those closed-form extremes are only used while they bracket
+        # the edges (edges added to the graph directly need not follow the generator's features); otherwise the edges'
+        # own extremes keep every weight within [0, valence_mix + complexity_mix].
+        edge_lists = [edges for edges in (self.edges,) + new_edges if len(edges)]
+        if not edge_lists:
+            return self.weight_extremes if self.weight_extremes is not None else self.edges.weight_extremes()
+        extremes = [edges.weight_extremes() for edges in edge_lists]
+        edge_extremes = {column: (min(extreme[column][0] for extreme in extremes), max(extreme[column][1] for extreme in extremes))
+                         for column in EdgeList.extreme_columns}
+        if self.weight_extremes is not None and all(self.weight_extremes[column][0] <= low and high <= self.weight_extremes[column][1]
+                                                    for column, (low, high) in edge_extremes.items()):
+            return self.weight_extremes
+        return edge_extremes
+
+    def ensure_normalized(self):
+        # Re-normalize all edges with the last used mix if the weight extremes changed since the last normalization
+        if getattr(self, 'weights_stale', False):  # Networks pickled before incremental growth have no such flag
+            self.normalize_weights(*self.weight_mix)
+
+    def add_thoughtseeds(self, num_new):
+        # Grow the network by num_new freshly generated thoughtseeds. Only the new thoughtseeds are generated and only
+        # their edges are computed, O(n*k) instead of rebuilding the O((n+k)**2) network. New edges are normalized right
+        # away; existing edges are only re-normalized (lazily, see ensure_normalized) if the global weight extremes moved.
+        # In knn mode the new thoughtseeds pick their k heaviest edges, existing thoughtseeds keep their edges.
+        # Returns the indices of the new thoughtseeds.
+        first_new = len(self.thoughtseeds)
+        previous_extremes = self.select_weight_extremes()
+        generator = ThoughtseedGenerator(self.config, self.rng)
+        self.thoughtseeds.extend(generator.generate_thoughtseeds(num_new))
+        new_ids = np.arange(first_new, len(self.thoughtseeds))
+
+        if isinstance(self.graph, CSRGraph):
+            self.graph.add_nodes(len(new_ids), self.thoughtseeds)
+        else:
+            for i in new_ids.tolist():
+                thoughtseed = self.thoughtseeds[i]
+                self.graph.add_node(i, feature_values=thoughtseed.feature_values, memory_pattern=thoughtseed.memory_pattern)
+
+        self.update_weight_extremes()
+        new_edges = EdgeList(self.edges.dtypes['weight'])
+        for block in self.iter_mode_edge_blocks(first_new):
+            new_edges.append(*block)
+        # New edges are normalized against the same extremes a full normalize_weights would pick. When those are the
+        # edges' own extremes, the new edges may have moved them and the existing weights are re-normalized lazily.
+        weight_extremes = self.select_weight_extremes(new_edges)
+        if weight_extremes != previous_extremes and len(self.edges):
+            self.weights_stale = True
+        if len(new_edges):
+            weights = normalize_edge_weights(new_edges.valence_weight, new_edges.complexity_weight, weight_extremes, *self.weight_mix)
+            self.store_edge_block(new_edges.source, new_edges.target, new_edges.valence_weight, new_edges.complexity_weight, weights)
+        if isinstance(self.graph, CSRGraph):
+            self.graph.invalidate()
+        return new_ids
+
+    def remove_thoughtseeds(self, ids):
+        # Remove thoughtseeds and their edges. The remaining thoughtseeds are renumbered to stay contiguous; the returned
+        # array maps every old index to its new index, or -1 for removed thoughtseeds. This costs O(E) however few
+        # thoughtseeds are removed: renumbering touches the edges of every later thoughtseed, so the kept edges are
+        # filtered and the graph is rebuilt from them.
+        num_thoughtseeds = len(self.thoughtseeds)
+        previous_extremes = self.select_weight_extremes()
+        keep = np.ones(num_thoughtseeds, dtype=bool)
+        keep[np.asarray(ids, dtype=np.int64)] = False
+        mapping = np.full(num_thoughtseeds, -1, dtype=np.int64)
+        mapping[keep] = np.arange(np.count_nonzero(keep))
+
+        self.thoughtseeds = self.thoughtseeds.take(np.flatnonzero(keep))
+        kept_edges = keep[self.edges.source] & keep[self.edges.target]
+        edges = EdgeList(self.edges.dtypes['weight'])
+        edges.append(mapping[self.edges.source[kept_edges]], mapping[self.edges.target[kept_edges]], self.edges.valence_weight[kept_edges],
+                     self.edges.complexity_weight[kept_edges], self.edges.weight[kept_edges])
+        self.rebuild_graph(edges)
+        self.update_weight_extremes()
+        if self.select_weight_extremes() != previous_extremes and len(self.edges):
+            # The removed edges may have held the extremes the remaining weights were normalized against
+            self.weights_stale = True
+        return mapping
+
+    def update_weight_extremes(self):
+        # Recompute the global weight extremes in O(n) and mark existing edge weights stale if they changed
+        weight_extremes = self.compute_weight_extremes()
+        if weight_extremes != self.weight_extremes:
+            self.weights_stale = self.weights_stale or len(self.edges) > 0
+            self.weight_extremes = weight_extremes
+
+    def rebuild_graph(self, edges):
+        # Replace the graph with one holding the current thoughtseeds and the given edges, including their weights
+        self.graph = create_graph(self.config.graph_backend)
+        self.edges = EdgeList(np.float32 if isinstance(self.graph, CSRGraph) else np.float64)
+        self.edge_version += 1
+        self.add_nodes_to_graph()
+        if len(edges):
+            self.store_edge_block(edges.source, edges.target, edges.valence_weight, edges.complexity_weight, edges.weight)
+        if isinstance(self.graph, CSRGraph):
+            self.graph.set_edges(self.edges)
 
     def initialize(self):
         #Initializes the memory network by performing the following steps:
-        self.generate_thoughtseeds()  # Generate thoughtseeds based on the configuration
-        self.add_nodes_to_graph()     # Add each thoughtseed as a node in the graph
-        self.add_edges_to_graph()     # Add edges between thoughtseeds in the graph based on their similarity
-        self.normalize_weights()      # Normalize the weights of the edges in the graph
+        instrumentation = get_instrumentation()
+        with instrumentation.stage('initialize') as stage:
+            with instrumentation.stage('generate_thoughtseeds') as generate_stage:
+                self.generate_thoughtseeds()  # Generate thoughtseeds based on the configuration
+                generate_stage.count(seeds=len(self.thoughtseeds))
+            with instrumentation.stage('add_nodes_to_graph'):
+                self.add_nodes_to_graph()     # Add each thoughtseed as a node in the graph
+            with instrumentation.stage('add_edges_to_graph') as edges_stage:
+                self.add_edges_to_graph()     # Add edges between thoughtseeds in the graph based on their similarity
+                edges_stage.count(edges=len(self.edges))
+            with instrumentation.stage('normalize_weights'):
+                self.normalize_weights()      # Normalize the weights of the edges in the graph
+            stage.count(seeds=len(self.thoughtseeds), edges=len(self.edges))
 
-    def save_state(self,filename):
-        # Save the state of the ThoughtseedNetwork object
+    def save_state(self, filename, format='pickle'):
+        # Save the state of the ThoughtseedNetwork object, pickled or as a memory-mappable columnar directory
+        if format == 'columnar':
+            save_network(self, filename)
+            return
+        elif format != 'pickle':
+            raise ValueError(f"Unknown format: {format}")
         with open(filename, 'wb') as f:
             pickle.dump(self, f)
 
     @staticmethod
     def load_state(filename):
-        # Load the state of a ThoughtseedNetwork object from a file
+        # Load the state of a ThoughtseedNetwork object from a pickle file or a columnar directory
+        if is_store(filename):
+            return load_network(filename)
         with open(filename, 'rb') as f:
             return pickle.load(f)
\ No newline at end of file
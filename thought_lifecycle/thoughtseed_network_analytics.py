@@ -2,48 +2,214 @@ import networkx as nx
 import numpy as np
 import math
 import random
-import community as community_louvain
-import leidenalg
-import igraph as ig
 import pickle
 
 from thought_lifecycle.config import ThoughtseedNetworkConfig
 from thought_lifecycle.thoughtseed_network import ThoughtseedNetwork
+from thought_lifecycle.graph_backend import adjacency_matrix, as_igraph, as_networkx
+from thought_lifecycle.community_sweep import sweep_communities
+from thought_lifecycle.community_profile import profile_communities, profile_community
+from thought_lifecycle.network_store import is_store, load_analytics, save_analytics
+
+class CommunityIndex:
+    # Inverted index of a partition, built once per detection: community id of every node as an int array, member arrays
+    # and sizes of every community. Member lookups are O(1) slices and size queries work on the sizes array. Nodes
+    # without a community have id -1 in membership and belong to no community.
+    def __init__(self, membership):
+        self.membership = np.asarray(membership, dtype=np.int64)
+        self.nodes_by_community = np.argsort(self.membership, kind='stable')
+        community_ids, starts, sizes = np.unique(self.membership[self.nodes_by_community], return_index=True, return_counts=True)
+        assigned = community_ids >= 0
+        self.community_ids, self.starts, self.sizes = community_ids[assigned], starts[assigned], sizes[assigned]
+        self.positions = {community_id: position for position, community_id in enumerate(self.community_ids.tolist())}
+
+    @classmethod
+    def from_partition(cls, communities):
+        # Build the index from a {node: community_id} dict whose nodes are the thoughtseed indices
+        nodes = np.fromiter(communities.keys(), dtype=np.int64, count=len(communities))
+        membership = np.full(nodes.max() + 1 if len(nodes) else 0, -1, dtype=np.int64)
+        membership[nodes] = np.fromiter(communities.values(), dtype=np.int64, count=len(communities))
+        return cls(membership)
+
+    def members(self, community_id):
+        # Nodes of a community in ascending order
+        position = self.positions[community_id]
+        return self.nodes_by_community[self.starts[position]:self.starts[position] + self.sizes[position]]
+
+    def size(self, community_id):
+        return int(self.sizes[self.positions[community_id]])
+
+    def community_of(self, node):
+        return int(self.membership[node])
+
+    def large_communities(self, min_size=3):
+        # Ids of the communities with at least min_size members
+        return self.community_ids[self.sizes >= min_size]
+
+    def count_large_communities(self, min_size=3):
+        return int(np.count_nonzero(self.sizes >= min_size))
+
+    def top_k(self, k):
+        # Ids of the k largest communities, largest first
+        k = min(k, len(self.sizes))
+        if k == 0:
+            return self.community_ids[:0]
+        largest = np.argpartition(-self.sizes, k - 1)[:k]
+        return self.community_ids[largest[np.argsort(-self.sizes[largest], kind='stable')]]
+
+    def items(self):
+        for community_id in self.community_ids.tolist():
+            yield community_id, self.members(community_id)
+
+    def __len__(self):
+        return len(self.community_ids)
 
 # Perform network analytics and print communities
 class ThoughtseedNetworkAnalytics:
-    def __init__(self, thoughtseed_network):
+    def __init__(self, thoughtseed_network, rng=None):
+        # Edge weights must be up to date before they are analyzed
+        thoughtseed_network.ensure_normalized()
+        # Random stream that seeds community detection and sampling when no explicit seed is given
+        self.rng = rng
+        self.network = thoughtseed_network
         self.graph = thoughtseed_network.graph
+        self.edges = thoughtseed_network.edges
         self.degree_centrality = {}
         self.pagerank = {}
         self.communities = None
+        self.community_index = None
+        self._indexed_communities = None
+        # Array results, aligned to thoughtseed indices
+        self.degree_centrality_array = None
+        self.pagerank_array = None
+        self.pagerank_iterations = 0
+        self._adjacency = {}
+        self._adjacency_version = (thoughtseed_network.edge_version, self.graph.number_of_nodes())
 
-    def calculate_degree_centrality(self):
-        self.degree_centrality = nx.degree_centrality(self.graph)
+    def __setstate__(self, state):
+        # Analytics pickled by earlier versions hold only the graph and the dict results; the attributes added since
+        # start from their defaults, and the graph is analyzed as pickled since its network was not kept
+        self.__dict__.update({'rng': None, 'network': None, 'edges': None, 'community_index': None, '_indexed_communities': None,
+                              'degree_centrality_array': None, 'pagerank_array': None, 'pagerank_iterations': 0,
+                              '_adjacency': {}, '_adjacency_version': None})
+        self.__dict__.update(state)
 
-    def calculate_pagerank(self):
-        self.pagerank = nx.pagerank(self.graph, alpha = 0.85)
+    def refresh(self):
+        # Follow the network after it was re-weighted, grown or shrunk: re-normalize stale weights, pick up a replaced
+        # graph or edge list, and drop the adjacency matrices built from older edges
+        network = self.network
+        if network is None:  # Unpickled from before analytics kept their network
+            return
+        network.ensure_normalized()
+        self.graph, self.edges = network.graph, network.edges
+        version = (network.edge_version, self.graph.number_of_nodes())
+        if version != self._adjacency_version:
+            self._adjacency = {}
+            self._adjacency_version = version
+
+    def adjacency(self, weight='weight'):
+        # Sparse adjacency matrix of the network for an edge attribute (None for an unweighted matrix), built once per
+        # version of the network's edges
+        self.refresh()
+        if weight not in self._adjacency:
+            self._adjacency[weight] = adjacency_matrix(self.graph, weight, self.edges)
+        return self._adjacency[weight]
+
+    def calculate_degree_centrality(self, weighted=False):
+        # Degree centrality as a single row reduction of the adjacency matrix; weighted=True sums edge weights instead of
+        # counting neighbours. Both are normalized by n-1, like nx.degree_centrality.
+        self.refresh()
+        nodes = list(self.graph.nodes)
+        if len(nodes) <= 1:
+            self.degree_centrality_array = np.ones(len(nodes))
+        else:
+            if weighted:
+                degrees = self.adjacency('weight').sum(axis=1, dtype=np.float64)
+            else:
+                degrees = np.diff(self.adjacency(None).indptr)
+            self.degree_centrality_array = degrees * (1.0 / (len(nodes) - 1))
+        self.degree_centrality = dict(zip(nodes, self.degree_centrality_array.tolist()))
 
-    def detect_communities(self, algorithm='louvain'):
-        print(f"ThoughtseedNetworkAnalytics: type(self.graph) = {type(self.graph)}")
+    def calculate_pagerank(self, alpha=0.85, tol=1e-06, max_iter=100, warm_start=None, weight='weight'):
+        # PageRank by power iteration on the sparse weighted adjacency matrix, with the same dangling node handling and
+        # convergence test as nx.pagerank. A previous pagerank_array can be passed as warm_start to converge faster after
+        # the weights changed.
+        self.refresh()
+        nodes = list(self.graph.nodes)
+        num_nodes = len(nodes)
+        if num_nodes == 0:
+            self.pagerank_array = np.empty(0)
+            self.pagerank = {}
+            return
 
+        adjacency = self.adjacency(weight)
+        out_strength = adjacency.sum(axis=1, dtype=np.float64)
+        inverse_strength = np.divide(1.0, out_strength, out=np.zeros(num_nodes), where=out_strength != 0)
+        dangling = out_strength == 0
+        teleport = np.full(num_nodes, 1.0 / num_nodes)
+
+        ranks = teleport.copy() if warm_start is None else np.asarray(warm_start, dtype=np.float64) / np.sum(warm_start)
+        for iteration in range(1, max_iter + 1):
+            previous_ranks = ranks
+            # The adjacency matrix is symmetric, so A @ v equals the row-vector product v @ A
+            ranks = alpha * (adjacency @ (ranks * inverse_strength) + ranks[dangling].sum() * teleport) + (1 - alpha) * teleport
+            if np.abs(ranks - previous_ranks).sum() < num_nodes * tol:
+                self.pagerank_iterations = iteration
+                self.pagerank_array = ranks
+                self.pagerank = dict(zip(nodes, ranks.tolist()))
+                return
+        raise nx.PowerIterationFailedConvergence(max_iter)
+
+    def random_seed(self, seed=None):
+        # Integer seed for the community libraries: the given seed, or a draw from a np.random.Generator (seed itself
+        # or self.rng). None when there is neither, which leaves the libraries unseeded.
+        if seed is None:
+            seed = self.rng
+        if isinstance(seed, np.random.Generator):
+            return int(seed.integers(2**31 - 1))
+        return seed
+
+    def detect_communities(self, algorithm='louvain', resolution=1.125, seed=None):
+        # resolution only applies to louvain; leiden optimizes unweighted modularity
+        self.refresh()
+        seed = self.random_seed(seed)
+
+        # The community detection packages are imported on first use, keeping them out of every process that imports
+        # this module without detecting communities
         if algorithm == 'louvain':
-            print(type(self.graph))
-            self.communities = community_louvain.best_partition(self.graph, resolution=1.125)
+            import community as community_louvain
+            self.communities = community_louvain.best_partition(as_networkx(self.graph), resolution=resolution, random_state=seed)
 
         elif algorithm == 'leiden':
-            # Convert the NetworkX graph to an igraph graph for use with the leidenalg package
-            ig_graph = ig.Graph.from_networkx(self.graph)
+            # Get an igraph graph for use with the leidenalg package; the compact backend builds it from its edge arrays
+            ig_graph = as_igraph(self.graph)
 
             # Use the Leiden algorithm to detect communities
-            partition = leidenalg.find_partition(ig_graph, leidenalg.ModularityVertexPartition)
+            import leidenalg
+            partition = leidenalg.find_partition(ig_graph, leidenalg.ModularityVertexPartition, seed=seed)
 
             # Convert the partition to a dictionary similar to what community_louvain.best_partition returns
             self.communities = {node: i for i, community in enumerate(partition) for node in community}
 
         else:
             raise ValueError(f"Unknown algorithm: {algorithm}")
+
+        # Index the partition once for all later community queries
+        self.get_community_index()
+
+    def get_community_index(self):
+        # Return the CommunityIndex of self.communities, rebuilding it only if the partition was replaced
+        if self.community_index is None or self._indexed_communities is not self.communities:
+            self.community_index = CommunityIndex.from_partition(self.communities)
+            self._indexed_communities = self.communities
+        return self.community_index
         
+    def sweep_communities(self, algorithm='louvain', resolutions=(1.0,), seeds=(0,), max_workers=None):
+        # Run weighted louvain or leiden over a grid of resolutions and random seeds in parallel. Returns one dict per
+        # (resolution, seed) with the modularity, the number of communities and a membership array aligned to
+        # thoughtseed indices. Partitions are cached, so repeating a sweep on the same graph is instant.
+        return sweep_communities(self.adjacency('weight'), algorithm, resolutions, seeds, max_workers)
+
     def perform_analysis_and_print_communities(self, algorithm='louvain'):
         self.calculate_degree_centrality()
         self.calculate_pagerank()
@@ -51,59 +217,64 @@ class ThoughtseedNetworkAnalytics:
 
         # Print communities
         print("Communities detected using the Louvain algorithm:")
-        communities_dict = {}
-        for node, community_id in self.communities.items():
-            if community_id not in communities_dict:
-                communities_dict[community_id] = []
-            communities_dict[community_id].append(node)
-
-        for community_id, nodes in communities_dict.items():
-            print(f"Community {community_id}: {nodes}")
-
-        print(f"Total communities: {len(communities_dict)}")
+        community_index = self.get_community_index()
+        for community_id, nodes in community_index.items():
+            print(f"Community {community_id}: {nodes.tolist()}")
 
-    def describe_community(self, community_nodes):
-        # Create a subgraph for the community
-        community = self.graph.subgraph(community_nodes)
+        print(f"Total communities: {len(community_index)}")
 
+    def describe_community(self, community_nodes, max_exact_size=2000, num_sources=64, seed=0):
         # Only describe communities of size 3 or more
-        if community.number_of_nodes() < 3:
+        nodes = np.asarray(list(community_nodes), dtype=np.int64)
+        if len(nodes) < 3:
             return None
 
-        # Calculate properties
-        size = community.number_of_nodes()
-        density = nx.density(community)
-        diameter = nx.diameter(community)
-        avg_path_length = nx.average_shortest_path_length(community)
+        # Calculate size, density, diameter and average path length from the community's rows of the unweighted
+        # adjacency matrix. Near-complete communities are answered analytically, large sparse ones by sampled BFS
+        # (see profile_community).
+        return profile_community(self.adjacency(None)[nodes][:, nodes], max_exact_size, num_sources, seed)
 
-        # Return properties
-        return {
-            'size': size,
-            'density': density,
-            'diameter': diameter,
-            'average_path_length': avg_path_length,
-        }
-
-    def count_large_communities(self):
-        # Get a list of all community IDs
-        community_ids = set(self.communities.values())
+    def describe_communities(self, min_size=3, max_exact_size=2000, num_sources=64, seed=0, max_workers=None):
+        # Describe every detected community of at least min_size thoughtseeds in one call, searching the ones that need
+        # BFS in parallel. Returns {community_id: properties}.
+        community_index = self.get_community_index()
+        communities = {community_id: community_index.members(community_id) for community_id in community_index.large_communities(max(min_size, 3)).tolist()}
+        return profile_communities(self.adjacency(None), communities, max_exact_size, num_sources, seed, max_workers)
 
+    def count_large_communities(self, min_size=3):
         # Count the number of communities of size 3 or more
-        large_communities = 0
-        for community_id in community_ids:
-            community_nodes = [node for node, id in self.communities.items() if id == community_id]
-            if len(community_nodes) >= 3:
-                large_communities += 1
-
-        return large_communities
+        return self.get_community_index().count_large_communities(min_size)
     
     @staticmethod
-    def load_state(filename):
-        # Load the ThoughtseedNetwork object from a file
-        with open(filename, 'rb') as f:
-            return pickle.load(f)
+    def load_state(filename, thoughtseed_network=None):
+        # Load the ThoughtseedNetworkAnalytics object from a pickle file or a columnar directory. Columnar stores only
+        # hold the results, so the network they were computed on has to be passed in.
+        if not is_store(filename):
+            with open(filename, 'rb') as f:
+                return pickle.load(f)
+        if thoughtseed_network is None:
+            raise ValueError("Loading columnar analytics results requires the ThoughtseedNetwork they were computed on")
+
+        results = load_analytics(filename)
+        analytics = ThoughtseedNetworkAnalytics(thoughtseed_network)
+        if 'degree_centrality' in results:
+            analytics.degree_centrality_array = results['degree_centrality']
+            analytics.degree_centrality = dict(enumerate(analytics.degree_centrality_array.tolist()))
+        if 'pagerank' in results:
+            analytics.pagerank_array = results['pagerank']
+            analytics.pagerank = dict(enumerate(analytics.pagerank_array.tolist()))
+        if 'membership' in results:
+            analytics.communities = {node: community_id for node, community_id in enumerate(results['membership'].tolist()) if community_id >= 0}
+            analytics.get_community_index()
+        return analytics
         
-    def save_state(self, filename):
-        # Save the state of the ThoughtseedNetworkAnalytics object
+    def save_state(self, filename, format='pickle'):
+        # Save the state of the ThoughtseedNetworkAnalytics object. The columnar format stores only the result arrays,
+        # not another copy of the network.
+        if format == 'columnar':
+            save_analytics(self, filename)
+            return
+        elif format != 'pickle':
+            raise ValueError(f"Unknown format: {format}")
         with open(filename, 'wb') as f:
             pickle.dump(self, f)
\ No newline at end of file